@@ -136,3 +136,39 @@ SIMPLE_JWT = {
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'petfinder',
+    }
+}
+
+# Seconds a facet count response is cached per normalized filter set
+ANNOUNCEMENT_FACETS_CACHE_SECONDS = 30
+# Seconds an anonymous announcement list/detail response may be served from
+# cache; data changes invalidate entries earlier through a generation bump
+ANNOUNCEMENT_RESPONSE_CACHE_SECONDS = 300
+# Largest number of ids accepted by /api/announcements/batch/
+ANNOUNCEMENT_BATCH_MAX_SIZE = 100
+# Seconds a geocoded address (or a failed lookup) is reused by the bulk importer
+GEOCODE_CACHE_SECONDS = 7 * 24 * 3600
+# Post views are buffered in memory and written in bulk by a background
+# thread every POST_VIEW_FLUSH_SECONDS, or once POST_VIEW_BUFFER_MAX are queued
+POST_VIEW_BUFFER_ENABLED = True
+POST_VIEW_FLUSH_SECONDS = 5
+POST_VIEW_BUFFER_MAX = 500
+# Count anonymous unique views with a per-announcement HyperLogLog sketch
+# (~2.3% standard error, 2 KB each) instead of one PostView row per visitor
+ANONYMOUS_VIEW_SKETCH_ENABLED = True
+# Reunited or inactive announcements untouched for this many days are moved
+# to the archive tables by manage.py archive_announcements
+ARCHIVE_AFTER_DAYS = 180
+# Announcements younger than this many days appear in "near me" feeds
+NEAR_ME_FEED_DAYS = 30
+# Half-life of an engagement event in the trending score (sort=trending);
+# run manage.py rebuild_trending_scores after changing it
+TRENDING_HALF_LIFE_HOURS = 24
+# Matches stored and served per announcement (/api/announcements/<id>/matches/);
+# run manage.py rebuild_matches after changing it
+MATCHES_PER_ANNOUNCEMENT = 10
@@ -0,0 +1,128 @@
+"""Hot/cold archival of reunited and inactive announcements."""
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Q
+from django.utils import timezone
+
+ARCHIVE_BATCH_SIZE = 200
+
+# rendered fields that only make sense for the viewer of a live announcement,
+# and the owner's contact details, which a closed post no longer publishes
+SNAPSHOT_EXCLUDED_FIELDS = ('is_saved', 'distance_m', 'phone_number', 'email')
+
+
+def archivable_announcements(days):
+    # deleting an announcement would delete its legacy Message rows, so
+    # those stay live
+    from .models import Announcement, Message
+
+    cutoff = timezone.now() - timedelta(days=days)
+    return Announcement.objects.filter(
+        Q(is_reunited=True) | Q(is_active=False),
+        updated_at__lt=cutoff,
+    ).exclude(
+        Exists(Message.objects.filter(announcement_id=OuterRef('pk'))),
+    )
+
+
+def archive_announcements(days, batch_size=ARCHIVE_BATCH_SIZE, limit=None):
+    """Archive everything eligible, in batches; returns the number archived."""
+    archived = 0
+    while limit is None or archived < limit:
+        size = batch_size if limit is None else min(batch_size, limit - archived)
+        ids = list(archivable_announcements(days).order_by('id').values_list('id', flat=True)[:size])
+        if not ids:
+            break
+        archived += archive_batch(ids)
+    return archived
+
+
+def archive_batch(announcement_ids):
+    from .models import (
+        Announcement,
+        ArchivedAnnouncement,
+        ArchivedComment,
+        ArchivedPostView,
+        ArchivedReaction,
+        Comment,
+        Conversation,
+        Location,
+        Pet,
+        PostView,
+        Reaction,
+    )
+    from .serializers import AnnouncementSerializer
+
+    with transaction.atomic():
+        announcements = list(Announcement.objects.filter(id__in=announcement_ids).select_related(
+            'pet', 'location', 'owner', 'owner__profile',
+        ).prefetch_related('photos', 'reaction_counts'))
+        if not announcements:
+            return 0
+        ids = [ann.id for ann in announcements]
+        rendered = AnnouncementSerializer(announcements, many=True, context={}).data
+
+        archives = ArchivedAnnouncement.objects.bulk_create([
+            ArchivedAnnouncement(
+                original_id=ann.id,
+                owner_id=ann.owner_id,
+                status=ann.status,
+                is_active=ann.is_active,
+                is_reunited=ann.is_reunited,
+                created_at=ann.created_at,
+                updated_at=ann.updated_at,
+                views_count=ann.views_count,
+                saves_count=ann.saves_count,
+                data={key: value for key, value in data.items() if key not in SNAPSHOT_EXCLUDED_FIELDS},
+            )
+            for ann, data in zip(announcements, rendered)
+        ])
+        archive_for = {archive.original_id: archive for archive in archives}
+
+        comment_rows = list(Comment.objects.filter(announcement_id__in=ids).values_list(
+            'id', 'announcement_id', 'user_id', 'parent_id', 'text', 'created_at',
+        ))
+        ArchivedComment.objects.bulk_create([
+            ArchivedComment(
+                archived_announcement=archive_for[ann_id], original_id=comment_id, user_id=user_id,
+                parent_original_id=parent_id, text=text, created_at=created_at,
+            )
+            for comment_id, ann_id, user_id, parent_id, text, created_at in comment_rows
+        ], batch_size=1000)
+
+        comment_announcement = {row[0]: row[1] for row in comment_rows}
+        reaction_rows = Reaction.objects.filter(
+            Q(announcement_id__in=ids) | Q(comment_id__in=list(comment_announcement)),
+        ).values_list('announcement_id', 'comment_id', 'user_id', 'kind', 'created_at')
+        ArchivedReaction.objects.bulk_create([
+            ArchivedReaction(
+                archived_announcement=archive_for[ann_id or comment_announcement[comment_id]],
+                user_id=user_id, comment_original_id=comment_id, kind=kind, created_at=created_at,
+            )
+            for ann_id, comment_id, user_id, kind, created_at in reaction_rows
+        ], batch_size=1000)
+
+        ArchivedPostView.objects.bulk_create([
+            ArchivedPostView(
+                archived_announcement=archive_for[ann_id], user_id=user_id,
+                session_key=session_key, created_at=created_at,
+            )
+            for ann_id, user_id, session_key, created_at in PostView.objects.filter(
+                announcement_id__in=ids,
+            ).values_list('announcement_id', 'user_id', 'session_key', 'created_at')
+        ], batch_size=1000)
+
+        Conversation.objects.filter(announcement_id__in=ids).update(announcement=None)
+        pet_ids = [ann.pet_id for ann in announcements]
+        location_ids = [ann.location_id for ann in announcements if ann.location_id]
+        # the usual delete path, so search, clusters and caches are updated
+        # by their receivers
+        Announcement.objects.filter(id__in=ids).delete()
+        Location.objects.filter(id__in=location_ids).delete()
+        Pet.objects.filter(id__in=pet_ids, announcements__isnull=True).delete()
+    return len(ids)
+
+
+def archived_snapshot(archive):
+    return {**archive.data, 'archived': True, 'archived_at': archive.archived_at}
@@ -0,0 +1,254 @@
+"""Server-side map clustering over per-geohash MapCell buckets."""
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import F, Q
+
+from .geo import box_prefixes, geohash_prefix_q
+
+CLUSTER_PRECISIONS = range(1, 9)
+
+# map zoom level -> geohash precision of the clusters returned for it
+ZOOM_PRECISION = [1, 1, 1, 2, 2, 3, 3, 4, 4, 4, 5, 5, 6, 6, 6, 7, 7, 8]
+
+
+def precision_for_zoom(zoom):
+    zoom = max(0, int(zoom))
+    if zoom >= len(ZOOM_PRECISION):
+        return ZOOM_PRECISION[-1]
+    return ZOOM_PRECISION[zoom]
+
+
+def _contribution(announcement_id):
+    """Return the entry fields ``announcement_id`` should contribute, or None."""
+    from .models import Announcement
+
+    row = Announcement.objects.filter(
+        id=announcement_id,
+        is_active=True,
+        location__isnull=False,
+    ).values_list(
+        'location__geohash', 'location__latitude', 'location__longitude', 'status', 'pet__pet_type',
+    ).first()
+    if row is None or not row[0]:
+        return None
+    geohash, lat, lng, status, pet_type = row
+    return {
+        'geohash': geohash,
+        'latitude': lat,
+        'longitude': lng,
+        'status': status,
+        'pet_type': pet_type,
+    }
+
+
+def _apply(entry, sign):
+    from .models import MapCell
+
+    cells = [(precision, entry['geohash'][:precision]) for precision in CLUSTER_PRECISIONS]
+    if sign > 0:
+        MapCell.objects.bulk_create([
+            MapCell(precision=precision, geohash=cell, status=entry['status'], pet_type=entry['pet_type'])
+            for precision, cell in cells
+        ], ignore_conflicts=True)
+
+    cell_q = Q()
+    for precision, cell in cells:
+        cell_q |= Q(precision=precision, geohash=cell)
+    buckets = MapCell.objects.filter(cell_q, status=entry['status'], pet_type=entry['pet_type'])
+    # the delta is the same at every precision, so one UPDATE covers them all
+    buckets.update(
+        count=F('count') + sign,
+        lat_sum=F('lat_sum') + sign * entry['latitude'],
+        lng_sum=F('lng_sum') + sign * entry['longitude'],
+    )
+    if sign < 0:
+        buckets.filter(count__lte=0).delete()
+
+
+def sync_announcement(announcement_id):
+    """Bring the cluster counts in line with the announcement's current state."""
+    from .models import MapCellEntry
+
+    with transaction.atomic():
+        entry = MapCellEntry.objects.select_for_update().filter(announcement_id=announcement_id).first()
+        wanted = _contribution(announcement_id)
+        current = None
+        if entry is not None:
+            current = {field: getattr(entry, field) for field in ('geohash', 'latitude', 'longitude', 'status', 'pet_type')}
+        if current == wanted:
+            return
+
+        if current is not None:
+            _apply(current, -1)
+        if wanted is None:
+            if entry is not None:
+                entry.delete()
+            return
+
+        _apply(wanted, 1)
+        MapCellEntry.objects.update_or_create(announcement_id=announcement_id, defaults=wanted)
+
+
+def sync_announcements(announcement_ids):
+    """
+    Batch form of sync_announcement for many announcements, e.g. after a bulk
+    import. Announcements without an entry yet are aggregated in memory and
+    written in bulk; the rest are synced one by one.
+    """
+    from .models import Announcement, MapCell, MapCellEntry
+
+    announcement_ids = list(announcement_ids)
+    existing = set(MapCellEntry.objects.filter(
+        announcement_id__in=announcement_ids,
+    ).values_list('announcement_id', flat=True))
+    for announcement_id in existing:
+        sync_announcement(announcement_id)
+
+    buckets = defaultdict(lambda: [0, 0.0, 0.0])
+    entries = []
+    rows = Announcement.objects.filter(
+        id__in=[ann_id for ann_id in announcement_ids if ann_id not in existing],
+        is_active=True,
+        location__isnull=False,
+    ).values_list('id', 'location__geohash', 'location__latitude', 'location__longitude', 'status', 'pet__pet_type')
+    for ann_id, geohash, lat, lng, status, pet_type in rows:
+        if not geohash:
+            continue
+        entries.append(MapCellEntry(
+            announcement_id=ann_id, geohash=geohash, latitude=lat, longitude=lng,
+            status=status, pet_type=pet_type,
+        ))
+        for precision in CLUSTER_PRECISIONS:
+            bucket = buckets[(precision, geohash[:precision], status, pet_type)]
+            bucket[0] += 1
+            bucket[1] += lat
+            bucket[2] += lng
+
+    cells_by_precision = defaultdict(set)
+    for precision, cell, _status, _pet_type in buckets:
+        cells_by_precision[precision].add(cell)
+
+    with transaction.atomic():
+        existing_buckets = set()
+        for precision, cells in cells_by_precision.items():
+            cells = sorted(cells)
+            for start in range(0, len(cells), 500):
+                existing_buckets.update(MapCell.objects.filter(
+                    precision=precision, geohash__in=cells[start:start + 500],
+                ).values_list('precision', 'geohash', 'status', 'pet_type'))
+
+        MapCellEntry.objects.bulk_create(entries, batch_size=1000)
+        # buckets seen for the first time are inserted with their totals; only
+        # the ones that already exist need an UPDATE each
+        MapCell.objects.bulk_create([
+            MapCell(
+                precision=precision, geohash=cell, status=status, pet_type=pet_type,
+                count=count, lat_sum=lat_sum, lng_sum=lng_sum,
+            )
+            for (precision, cell, status, pet_type), (count, lat_sum, lng_sum) in buckets.items()
+            if (precision, cell, status, pet_type) not in existing_buckets
+        ], batch_size=1000)
+        for key in existing_buckets:
+            count, lat_sum, lng_sum = buckets[key]
+            precision, cell, status, pet_type = key
+            MapCell.objects.filter(precision=precision, geohash=cell, status=status, pet_type=pet_type).update(
+                count=F('count') + count,
+                lat_sum=F('lat_sum') + lat_sum,
+                lng_sum=F('lng_sum') + lng_sum,
+            )
+    return len(entries)
+
+
+def remove_announcement(announcement_id):
+    from .models import MapCellEntry
+
+    with transaction.atomic():
+        entry = MapCellEntry.objects.select_for_update().filter(announcement_id=announcement_id).first()
+        if entry is None:
+            return
+        _apply({field: getattr(entry, field) for field in ('geohash', 'latitude', 'longitude', 'status', 'pet_type')}, -1)
+        entry.delete()
+
+
+def rebuild_clusters(Announcement, MapCell, MapCellEntry):
+    """Recompute every MapCell and MapCellEntry row from scratch."""
+    buckets = defaultdict(lambda: [0, 0.0, 0.0])
+    entries = []
+    rows = Announcement.objects.filter(is_active=True, location__isnull=False).values_list(
+        'id', 'location__geohash', 'location__latitude', 'location__longitude', 'status', 'pet__pet_type',
+    )
+    for ann_id, geohash, lat, lng, status, pet_type in rows.iterator(chunk_size=2000):
+        if not geohash:
+            continue
+        entries.append(MapCellEntry(
+            announcement_id=ann_id, geohash=geohash, latitude=lat, longitude=lng,
+            status=status, pet_type=pet_type,
+        ))
+        for precision in CLUSTER_PRECISIONS:
+            bucket = buckets[(precision, geohash[:precision], status, pet_type)]
+            bucket[0] += 1
+            bucket[1] += lat
+            bucket[2] += lng
+
+    with transaction.atomic():
+        MapCellEntry.objects.all().delete()
+        MapCell.objects.all().delete()
+        MapCellEntry.objects.bulk_create(entries, batch_size=1000)
+        MapCell.objects.bulk_create([
+            MapCell(
+                precision=precision, geohash=cell, status=status, pet_type=pet_type,
+                count=count, lat_sum=lat_sum, lng_sum=lng_sum,
+            )
+            for (precision, cell, status, pet_type), (count, lat_sum, lng_sum) in buckets.items()
+        ], batch_size=1000)
+    return len(entries)
+
+
+def clusters_in_box(min_lat, max_lat, min_lng, max_lng, zoom):
+    """
+    Return the clusters whose centroid falls inside the box at ``zoom``. A box
+    crossing the antimeridian has ``min_lng`` greater than ``max_lng``.
+    """
+    from .models import MapCell
+
+    precision = precision_for_zoom(zoom)
+    if min_lng > max_lng:
+        max_lng += 360.0
+
+    queryset = MapCell.objects.filter(precision=precision, count__gt=0)
+    prefixes = box_prefixes(min_lat, max_lat, min_lng, max_lng)
+    if prefixes is not None:
+        # the cover may be finer than the cluster cells, so clip prefixes to
+        # the cluster precision before turning them into ranges
+        prefixes = {prefix[:precision] for prefix in prefixes}
+        queryset = queryset.filter(geohash_prefix_q(prefixes, field='geohash'))
+
+    clusters = {}
+    for cell, status, pet_type, count, lat_sum, lng_sum in queryset.values_list(
+        'geohash', 'status', 'pet_type', 'count', 'lat_sum', 'lng_sum',
+    ):
+        cluster = clusters.setdefault(cell, {
+            'geohash': cell, 'count': 0, 'lat_sum': 0.0, 'lng_sum': 0.0,
+            'status': defaultdict(int), 'pet_type': defaultdict(int),
+        })
+        cluster['count'] += count
+        cluster['lat_sum'] += lat_sum
+        cluster['lng_sum'] += lng_sum
+        cluster['status'][status] += count
+        cluster['pet_type'][pet_type] += count
+
+    results = []
+    for cluster in clusters.values():
+        lat = cluster.pop('lat_sum') / cluster['count']
+        lng = cluster.pop('lng_sum') / cluster['count']
+        lng_in_box = min_lng <= lng <= max_lng or min_lng <= lng + 360.0 <= max_lng
+        if not (min_lat <= lat <= max_lat and lng_in_box):
+            continue
+        cluster['latitude'] = lat
+        cluster['longitude'] = lng
+        cluster['status'] = dict(cluster['status'])
+        cluster['pet_type'] = dict(cluster['pet_type'])
+        results.append(cluster)
+    results.sort(key=lambda c: c['count'], reverse=True)
+    return precision, results
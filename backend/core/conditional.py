@@ -0,0 +1,71 @@
+"""ETag / Last-Modified validators for announcement responses, derived from updated_at."""
+import hashlib
+
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date
+
+
+def sorted_query_params(request):
+    return sorted(
+        (key, value)
+        for key, values in request.query_params.lists()
+        for value in values
+        if value != ''
+    )
+
+
+def announcement_validators(request, ids, extra='', user_state=None, detail=False):
+    """
+    Return (etag, last_modified) for a response rendering announcements
+    ``ids`` in that order, or (None, None) when none of them exist.
+    ``last_modified`` is a POSIX timestamp, given for ``detail`` responses
+    only. ``user_state`` is the result of user_announcement_state() when the
+    caller has it already.
+    """
+    from .models import Announcement
+    from .serializers import user_announcement_state
+
+    stamps = dict(Announcement.objects.filter(id__in=ids).values_list('id', 'updated_at'))
+    if not stamps and ids:
+        return None, None
+
+    digest = hashlib.sha256()
+    digest.update(f"{request.path}?{sorted_query_params(request)}|{extra}".encode())
+    for ann_id in ids:
+        stamp = stamps.get(ann_id)
+        digest.update(f"{ann_id}:{stamp.isoformat() if stamp else '-'};".encode())
+
+    last_modified = None
+    user = request.user
+    if user.is_authenticated:
+        if user_state is None:
+            user_state = user_announcement_state(user, ids)
+        saved = sorted(user_state['saved_ids'])
+        reactions = sorted(user_state['user_reactions'].items())
+        digest.update(f"user:{user.id}|saved:{saved}|reactions:{reactions}".encode())
+    elif detail and stamps:
+        # a row leaving a list does not move the newest updated_at on it,
+        # and un-saving does not move it for a user, so only anonymous
+        # detail responses get Last-Modified
+        last_modified = int(max(stamps.values()).timestamp())
+
+    return f'"{digest.hexdigest()[:40]}"', last_modified
+
+
+def not_modified_response(request, etag, last_modified):
+    """Return a 304 response when the request's validators still match."""
+    if etag is None:
+        return None
+    response = get_conditional_response(request._request, etag=etag, last_modified=last_modified)
+    if response is not None:
+        apply_validators(response, etag, last_modified)
+    return response
+
+
+def apply_validators(response, etag, last_modified):
+    if etag is not None:
+        response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified)
+    patch_vary_headers(response, ['Authorization'])
+    return response
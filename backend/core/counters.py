@@ -0,0 +1,38 @@
+"""Reconciliation of the denormalized Announcement counters with the rows they count."""
+from django.db.models import Count, F, IntegerField, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def _count_of(model):
+    rows = model.objects.filter(
+        announcement_id=OuterRef('pk'),
+    ).order_by().values('announcement_id').annotate(n=Count('id')).values('n')
+    return Coalesce(Subquery(rows, output_field=IntegerField()), Value(0))
+
+
+def reconcile_announcement_counters(Announcement, PostView, Comment, SavedAnnouncement, AnonymousViewSketch=None):
+    """
+    Rewrite the counters of every announcement whose stored values differ
+    from the actual row counts and return how many were fixed. When
+    AnonymousViewSketch is given, views_count includes its estimates.
+    """
+    views = _count_of(PostView)
+    if AnonymousViewSketch is not None:
+        sketch_estimate = AnonymousViewSketch.objects.filter(announcement_id=OuterRef('pk')).values('estimate')
+        views = views + Coalesce(Subquery(sketch_estimate, output_field=IntegerField()), Value(0))
+    expected = {
+        'views_count': views,
+        'comments_count': _count_of(Comment),
+        'saves_count': _count_of(SavedAnnouncement),
+    }
+    drifted = Announcement.objects.annotate(
+        **{f'expected_{field}': expression for field, expression in expected.items()}
+    ).filter(
+        ~Q(views_count=F('expected_views_count'))
+        | ~Q(comments_count=F('expected_comments_count'))
+        | ~Q(saves_count=F('expected_saves_count'))
+    )
+    ids = list(drifted.values_list('id', flat=True))
+    for start in range(0, len(ids), 500):
+        Announcement.objects.filter(id__in=ids[start:start + 500]).update(**expected)
+    return len(ids)
@@ -0,0 +1,106 @@
+"""
+Streaming export of announcements as NDJSON or CSV.
+
+Rows are read with values_list through QuerySet.iterator(), so memory stays
+flat however large the table is, and written one line at a time. Rows come
+ordered by (updated_at, id); an incremental pull passes the ``updated_since``
+of its previous run. Changes to the pet, location, photos, comments and
+reactions touch ``updated_at`` (see the receivers in models.py), so they are
+picked up as well. Deleted announcements are not reported.
+"""
+import csv
+import io
+from datetime import datetime, time
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+EXPORT_FORMATS = ('ndjson', 'csv')
+
+# output column -> Announcement lookup
+EXPORT_COLUMNS = [
+    ('id', 'id'),
+    ('status', 'status'),
+    ('is_active', 'is_active'),
+    ('is_reunited', 'is_reunited'),
+    ('created_at', 'created_at'),
+    ('updated_at', 'updated_at'),
+    ('owner_id', 'owner_id'),
+    ('description', 'description'),
+    ('pet_id', 'pet_id'),
+    ('pet_name', 'pet__name'),
+    ('pet_type', 'pet__pet_type'),
+    ('breed', 'pet__breed'),
+    ('color', 'pet__color'),
+    ('gender', 'pet__gender'),
+    ('pet_description', 'pet__description'),
+    ('address', 'location__address'),
+    ('latitude', 'location__latitude'),
+    ('longitude', 'location__longitude'),
+    ('search_radius', 'location__search_radius'),
+]
+
+EXPORT_CHUNK_SIZE = 2000
+
+
+def parse_updated_since(value):
+    """
+    Parse an ISO date or datetime; naive values are taken in the current
+    timezone. Raises ValueError for anything else.
+    """
+    moment = parse_datetime(value)
+    if moment is None:
+        day = parse_date(value)
+        if day is None:
+            raise ValueError(f"Invalid updated_since {value!r}")
+        moment = datetime.combine(day, time.min)
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+def export_rows(updated_since=None, chunk_size=EXPORT_CHUNK_SIZE):
+    """Yield one dict per announcement, oldest update first."""
+    from .models import Announcement
+
+    queryset = Announcement.objects.all()
+    if updated_since is not None:
+        queryset = queryset.filter(updated_at__gt=updated_since)
+    names = [name for name, _ in EXPORT_COLUMNS]
+    rows = queryset.order_by('updated_at', 'id').values_list(*[lookup for _, lookup in EXPORT_COLUMNS])
+    for row in rows.iterator(chunk_size=chunk_size):
+        yield dict(zip(names, row))
+
+
+def ndjson_lines(rows):
+    encoder = DjangoJSONEncoder(ensure_ascii=False)
+    for row in rows:
+        yield encoder.encode(row) + '\n'
+
+
+def csv_lines(rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def flush():
+        line = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return line
+
+    writer.writerow([name for name, _ in EXPORT_COLUMNS])
+    yield flush()
+    for row in rows:
+        writer.writerow([
+            value.isoformat() if hasattr(value, 'isoformat') else ('' if value is None else value)
+            for value in row.values()
+        ])
+        yield flush()
+
+
+def export_lines(output_format, updated_since=None, chunk_size=EXPORT_CHUNK_SIZE):
+    rows = export_rows(updated_since, chunk_size)
+    if output_format == 'csv':
+        return csv_lines(rows)
+    return ndjson_lines(rows)
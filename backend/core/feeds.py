@@ -0,0 +1,133 @@
+"""Materialized "near me" feeds (NearbyFeedEntry) for alert subscribers."""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .geo import bounding_box, covering_prefixes, geohash_prefix_q
+from .utils import haversine_meters
+
+DEFAULT_ALERT_RADIUS_M = 1000.0
+
+
+def feed_cutoff():
+    return timezone.now() - timedelta(days=getattr(settings, 'NEAR_ME_FEED_DAYS', 30))
+
+
+def alert_subscribers(Profile=None):
+    if Profile is None:
+        from .models import Profile
+
+    return Profile.objects.filter(
+        alerts_enabled=True,
+        alert_latitude__isnull=False,
+        alert_longitude__isnull=False,
+    )
+
+
+def _radius(profile_radius):
+    return float(profile_radius) if profile_radius is not None else DEFAULT_ALERT_RADIUS_M
+
+
+def sync_announcement_feeds(announcement_ids):
+    """Bring every feed in line with the current state of ``announcement_ids``."""
+    from .models import Announcement, NearbyFeedEntry
+
+    announcement_ids = list(announcement_ids)
+    rows = Announcement.objects.filter(
+        id__in=announcement_ids,
+        is_active=True,
+        is_reunited=False,
+        location__isnull=False,
+        created_at__gte=feed_cutoff(),
+    ).values_list('id', 'owner_id', 'created_at', 'location__latitude', 'location__longitude')
+
+    subscribers = alert_subscribers()
+    max_radius = subscribers.aggregate(
+        radius=Max(Coalesce('alerts_radius', Value(DEFAULT_ALERT_RADIUS_M))),
+    )['radius']
+
+    entries = []
+    for ann_id, owner_id, created_at, lat, lng in rows:
+        if max_radius is None:
+            break
+        min_lat, max_lat, min_lng, max_lng = bounding_box(lat, lng, max_radius)
+        candidates = subscribers.exclude(user_id=owner_id).filter(
+            alert_latitude__gte=min_lat, alert_latitude__lte=max_lat,
+        )
+        if -180.0 <= min_lng and max_lng <= 180.0:
+            candidates = candidates.filter(alert_longitude__gte=min_lng, alert_longitude__lte=max_lng)
+        for user_id, alert_lat, alert_lng, radius in candidates.values_list(
+            'user_id', 'alert_latitude', 'alert_longitude', 'alerts_radius',
+        ):
+            distance = haversine_meters(lat, lng, alert_lat, alert_lng)
+            if distance is not None and distance <= _radius(radius):
+                entries.append(NearbyFeedEntry(
+                    user_id=user_id, announcement_id=ann_id,
+                    created_at=created_at, distance_m=distance,
+                ))
+
+    with transaction.atomic():
+        NearbyFeedEntry.objects.filter(announcement_id__in=announcement_ids).delete()
+        NearbyFeedEntry.objects.bulk_create(entries, batch_size=1000)
+    return len(entries)
+
+
+def _feed_entries(profile, Announcement, NearbyFeedEntry):
+    """Unsaved feed rows of one subscriber, found with a geohash radius scan."""
+    lat, lng = profile.alert_latitude, profile.alert_longitude
+    radius = _radius(profile.alerts_radius)
+    candidates = Announcement.objects.filter(
+        is_active=True,
+        is_reunited=False,
+        location__isnull=False,
+        created_at__gte=feed_cutoff(),
+    ).exclude(owner_id=profile.user_id)
+    prefixes = covering_prefixes(lat, lng, radius)
+    if prefixes is not None:
+        candidates = candidates.filter(geohash_prefix_q(prefixes))
+    entries = []
+    for ann_id, created_at, c_lat, c_lng in candidates.values_list(
+        'id', 'created_at', 'location__latitude', 'location__longitude',
+    ):
+        distance = haversine_meters(lat, lng, c_lat, c_lng)
+        if distance is not None and distance <= radius:
+            entries.append(NearbyFeedEntry(
+                user_id=profile.user_id, announcement_id=ann_id,
+                created_at=created_at, distance_m=distance,
+            ))
+    return entries
+
+
+def rebuild_user_feed(user_id):
+    """Recompute one subscriber's feed from scratch."""
+    from .models import Announcement, NearbyFeedEntry
+
+    profile = alert_subscribers().filter(user_id=user_id).first()
+    entries = [] if profile is None else _feed_entries(profile, Announcement, NearbyFeedEntry)
+
+    with transaction.atomic():
+        NearbyFeedEntry.objects.filter(user_id=user_id).delete()
+        NearbyFeedEntry.objects.bulk_create(entries, batch_size=1000)
+    return len(entries)
+
+
+def rebuild_feeds(Announcement, Profile, NearbyFeedEntry):
+    """Recompute every subscriber's feed and return the number of entries stored."""
+    NearbyFeedEntry.objects.all().delete()
+    stored = 0
+    for profile in alert_subscribers(Profile).iterator():
+        entries = _feed_entries(profile, Announcement, NearbyFeedEntry)
+        stored += len(NearbyFeedEntry.objects.bulk_create(entries, batch_size=1000))
+    return stored
+
+
+def prune_feeds():
+    """Drop entries that aged out of the feed window; returns how many."""
+    from .models import NearbyFeedEntry
+
+    deleted, _ = NearbyFeedEntry.objects.filter(created_at__lt=feed_cutoff()).delete()
+    return deleted
@@ -0,0 +1,211 @@
+"""
+Geohash helpers used to index Location rows for radius lookups.
+
+Every Location stores the geohash of its point (see Location.save). A radius
+query is turned into a handful of geohash prefixes covering the circle's
+bounding box; each prefix becomes an indexed range lookup on the geohash
+column and only those candidates get the exact haversine check.
+"""
+from math import cos, degrees, floor, radians
+
+from django.db.models import Q
+
+from .utils import haversine_meters
+
+GEOHASH_PRECISION = 9
+GEOHASH_BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+EARTH_RADIUS_M = 6371000.0
+
+# Upper bound of cells used to cover a search area. Fewer, coarser cells mean
+# fewer range lookups but more candidates to refine.
+MAX_COVERING_CELLS = 16
+
+
+def encode_geohash(lat, lng, precision=GEOHASH_PRECISION):
+    if lat is None or lng is None:
+        return ""
+    lat_lo, lat_hi = -90.0, 90.0
+    lng_lo, lng_hi = -180.0, 180.0
+    chars = []
+    bits = 0
+    ch = 0
+    even = True
+    while len(chars) < precision:
+        if even:
+            mid = (lng_lo + lng_hi) / 2
+            if lng >= mid:
+                ch = (ch << 1) | 1
+                lng_lo = mid
+            else:
+                ch = ch << 1
+                lng_hi = mid
+        else:
+            mid = (lat_lo + lat_hi) / 2
+            if lat >= mid:
+                ch = (ch << 1) | 1
+                lat_lo = mid
+            else:
+                ch = ch << 1
+                lat_hi = mid
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(GEOHASH_BASE32[ch])
+            bits = 0
+            ch = 0
+    return ''.join(chars)
+
+
+def cell_size(precision):
+    """Return (lat_degrees, lng_degrees) spanned by a geohash cell."""
+    total_bits = precision * 5
+    lng_bits = (total_bits + 1) // 2
+    lat_bits = total_bits // 2
+    return 180.0 / (2 ** lat_bits), 360.0 / (2 ** lng_bits)
+
+
+def bounding_box(lat, lng, radius_m):
+    """
+    Return (min_lat, max_lat, min_lng, max_lng) enclosing the circle.
+    Longitudes are not wrapped, so they may fall outside [-180, 180].
+    """
+    dlat = degrees(radius_m / EARTH_RADIUS_M)
+    min_lat = max(-90.0, lat - dlat)
+    max_lat = min(90.0, lat + dlat)
+    if min_lat <= -90.0 or max_lat >= 90.0:
+        return min_lat, max_lat, -180.0, 180.0
+    dlng = dlat / max(cos(radians(lat)), 1e-9)
+    if dlng >= 180.0:
+        return min_lat, max_lat, -180.0, 180.0
+    return min_lat, max_lat, lng - dlng, lng + dlng
+
+
+def covering_prefixes(lat, lng, radius_m, max_cells=MAX_COVERING_CELLS):
+    """
+    Return the set of geohash prefixes whose cells cover the circle, using the
+    finest precision that needs at most ``max_cells`` cells. Returns None when
+    even single-character cells cannot cover it, i.e. no cell filter applies.
+    """
+    return box_prefixes(*bounding_box(lat, lng, radius_m), max_cells=max_cells)
+
+
+def box_prefixes(min_lat, max_lat, min_lng, max_lng, max_cells=MAX_COVERING_CELLS):
+    """
+    Same as covering_prefixes for a lat/lng box. ``max_lng`` may exceed 180
+    for boxes crossing the antimeridian.
+    """
+    for precision in range(GEOHASH_PRECISION, 0, -1):
+        prefixes = box_cells(min_lat, max_lat, min_lng, max_lng, precision, max_cells)
+        if prefixes is not None:
+            return prefixes
+    return None
+
+
+def box_cells(min_lat, max_lat, min_lng, max_lng, precision, max_cells=None):
+    """
+    Return the geohash cells of ``precision`` intersecting the box, or None
+    when there are more than ``max_cells`` of them.
+    """
+    cell_lat, cell_lng = cell_size(precision)
+    rows = int(round(180.0 / cell_lat))
+    cols = int(round(360.0 / cell_lng))
+
+    row_lo = max(0, int(floor((min_lat + 90.0) / cell_lat)))
+    row_hi = min(rows - 1, int(floor((max_lat + 90.0) / cell_lat)))
+    col_lo = int(floor((min_lng + 180.0) / cell_lng))
+    col_hi = int(floor((max_lng + 180.0) / cell_lng))
+    if col_hi - col_lo + 1 >= cols:
+        col_lo, col_hi = 0, cols - 1
+
+    if max_cells is not None and (row_hi - row_lo + 1) * (col_hi - col_lo + 1) > max_cells:
+        return None
+
+    cells = set()
+    for row in range(row_lo, row_hi + 1):
+        cell_center_lat = -90.0 + (row + 0.5) * cell_lat
+        for col in range(col_lo, col_hi + 1):
+            cell_center_lng = -180.0 + ((col % cols) + 0.5) * cell_lng
+            cells.add(encode_geohash(cell_center_lat, cell_center_lng, precision))
+    return cells
+
+
+def geohash_prefix_q(prefixes, field='location__geohash'):
+    """Build an OR of indexed range lookups, one per geohash prefix."""
+    query = Q()
+    for prefix in sorted(prefixes):
+        # "{" sorts right after "z", the last geohash character
+        query |= Q(**{f'{field}__gte': prefix, f'{field}__lt': prefix + '{'})
+    return query
+
+
+def ids_within_radius(queryset, lat, lng, radius_m):
+    """
+    Return ids of announcements in ``queryset`` whose location lies within
+    ``radius_m`` meters of (lat, lng). Candidates come from the geohash index,
+    only their coordinates are loaded and checked with haversine.
+    """
+    prefixes = covering_prefixes(lat, lng, radius_m)
+    candidates = queryset.filter(location__isnull=False)
+    if prefixes is not None:
+        candidates = candidates.filter(geohash_prefix_q(prefixes))
+
+    ids = []
+    for ann_id, c_lat, c_lng in candidates.values_list('id', 'location__latitude', 'location__longitude'):
+        if c_lat is None or c_lng is None:
+            continue
+        d = haversine_meters(lat, lng, c_lat, c_lng)
+        if d is not None and d <= radius_m:
+            ids.append(ann_id)
+    return ids
+
+
+NEAREST_START_RADIUS_M = 500.0
+
+
+def nearest_ids(queryset, lat, lng, limit, after=None, max_radius=None):
+    """
+    Return up to ``limit`` (distance, id) pairs from ``queryset`` nearest to
+    (lat, lng), ordered by distance then id. ``after`` is the last pair of the
+    previous page; only pairs strictly after it are returned.
+
+    The search grows ring by ring: every round doubles the radius and only
+    scans geohash cells that the previous rounds did not cover, so the cost
+    depends on how far the nearest results are, not on the table size.
+    """
+    base = queryset.filter(location__isnull=False)
+    radius = NEAREST_START_RADIUS_M + (after[0] if after else 0.0)
+    scanned = None
+    distances = {}
+
+    while True:
+        if max_radius is not None:
+            radius = min(radius, max_radius)
+        prefixes = covering_prefixes(lat, lng, radius)
+
+        ring = base
+        if prefixes is not None:
+            ring = ring.filter(geohash_prefix_q(prefixes))
+        if scanned is not None:
+            ring = ring.exclude(scanned)
+
+        for ann_id, c_lat, c_lng in ring.values_list('id', 'location__latitude', 'location__longitude'):
+            if c_lat is None or c_lng is None:
+                continue
+            d = haversine_meters(lat, lng, c_lat, c_lng)
+            if d is None:
+                continue
+            if after is not None and (d, ann_id) <= tuple(after):
+                continue
+            distances[ann_id] = d
+
+        # everything within ``radius`` has been seen, farther hits may still
+        # be missing, so only those count towards the page
+        hits = sorted((d, ann_id) for ann_id, d in distances.items() if d <= radius)
+        exhausted = prefixes is None or (max_radius is not None and radius >= max_radius)
+        if len(hits) >= limit or exhausted:
+            return hits[:limit]
+
+        # coarser covers always contain the finer ones, so the latest cover
+        # is the whole area scanned so far
+        scanned = geohash_prefix_q(prefixes)
+        radius *= 2
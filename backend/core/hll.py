@@ -0,0 +1,59 @@
+"""
+HyperLogLog distinct counter, used for anonymous unique views.
+
+A sketch is 2 ** HLL_PRECISION one-byte registers (2 KB), whatever the
+number of visitors. The estimate has a relative standard error of
+1.04 / sqrt(2 ** HLL_PRECISION), about 2.3%, so roughly 95% of estimates are
+within 4.6% of the true count; small counts are close to exact thanks to the
+linear counting correction. Sketches merge by taking the register-wise max.
+"""
+import hashlib
+import math
+
+HLL_PRECISION = 11
+
+
+class HyperLogLog:
+    def __init__(self, registers=None, precision=HLL_PRECISION):
+        self.precision = precision
+        self.size = 1 << precision
+        if registers:
+            if len(registers) != self.size:
+                raise ValueError(f"Expected {self.size} registers, got {len(registers)}")
+            self.registers = bytearray(registers)
+        else:
+            self.registers = bytearray(self.size)
+
+    @property
+    def standard_error(self):
+        return 1.04 / math.sqrt(self.size)
+
+    def add(self, value):
+        """Add ``value`` (a string); returns True if the sketch changed."""
+        hashed = int.from_bytes(hashlib.blake2b(value.encode(), digest_size=8).digest(), 'big')
+        index = hashed >> (64 - self.precision)
+        rest_bits = 64 - self.precision
+        rest = hashed & ((1 << rest_bits) - 1)
+        rank = rest_bits - rest.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+            return True
+        return False
+
+    def merge(self, other):
+        if other.size != self.size:
+            raise ValueError("Cannot merge sketches of different precision")
+        self.registers = bytearray(max(a, b) for a, b in zip(self.registers, other.registers))
+
+    def estimate(self):
+        m = self.size
+        alpha = 0.7213 / (1 + 1.079 / m)
+        raw = alpha * m * m / sum(2.0 ** -register for register in self.registers)
+        zeros = self.registers.count(0)
+        if raw <= 2.5 * m and zeros:
+            # linear counting is far more accurate while most registers are empty
+            return round(m * math.log(m / zeros))
+        return round(raw)
+
+    def to_bytes(self):
+        return bytes(self.registers)
@@ -0,0 +1,31 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.archive import ARCHIVE_BATCH_SIZE, archivable_announcements, archive_announcements
+
+
+class Command(BaseCommand):
+    help = (
+        "Move reunited or inactive announcements that have not changed for N days, "
+        "with their comments, reactions and views, into the archive tables."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=getattr(settings, 'ARCHIVE_AFTER_DAYS', 180))
+        parser.add_argument('--batch-size', type=int, default=ARCHIVE_BATCH_SIZE)
+        parser.add_argument('--limit', type=int, help='Archive at most this many announcements')
+        parser.add_argument('--dry-run', action='store_true', help='Only report how many are eligible')
+
+    def handle(self, *args, **options):
+        if options['dry_run']:
+            count = archivable_announcements(options['days']).count()
+            self.stdout.write(f"{count} announcements eligible for archiving")
+            return
+
+        started = time.monotonic()
+        count = archive_announcements(options['days'], max(1, options['batch_size']), options['limit'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Archived {count} announcements in {time.monotonic() - started:.1f}s"
+        ))
@@ -0,0 +1,86 @@
+import random
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core.management.commands.benchmark_matching import populate
+from core.models import Announcement
+from core.scoring import candidate_features, rank_candidates
+from core.trigrams import similarities
+from core.utils import MATCH_CHUNK_SIZE, match_score
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the vectorized match scorer with scoring candidates one by "
+        "one, without any pre-filtering, on synthetic announcements. Data is "
+        "created inside a transaction that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=100000, help='Number of candidates scored per query')
+        parser.add_argument('--queries', type=int, default=3)
+        parser.add_argument('--threshold', type=float, default=0.25)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        count = options['count']
+        threshold = options['threshold']
+
+        with transaction.atomic():
+            owner = User.objects.create(username=f'bench-scoring-{rng.random()}')
+            populate(owner, count + options['queries'], rng)
+            all_ids = list(Announcement.objects.filter(owner=owner).order_by('id').values_list('id', flat=True))
+            query_ids, candidate_ids = all_ids[:options['queries']], all_ids[options['queries']:]
+            queries = list(Announcement.objects.filter(id__in=query_ids).select_related('pet', 'location'))
+            candidates = Announcement.objects.filter(owner=owner)
+
+            loop_time, loop = self._timed(lambda: [
+                self._loop_ranking(ann, candidates, candidate_ids, threshold) for ann in queries
+            ])
+            batch_time, batch = self._timed(lambda: [
+                rank_candidates(ann, candidate_features(candidates, candidate_ids), threshold, None) for ann in queries
+            ])
+            transaction.set_rollback(True)
+
+        scored = count * len(queries)
+        self.stdout.write(f"candidates: {count}, queries: {len(queries)}")
+        self.stdout.write(f"one by one: {scored / loop_time:10.0f} candidates/s")
+        self.stdout.write(f"vectorized: {scored / batch_time:10.0f} candidates/s")
+        self.stdout.write(f"speedup: {loop_time / batch_time:.1f}x")
+
+        same_ranking = all([ann_id for ann_id, _ in a] == [ann_id for ann_id, _ in b] for a, b in zip(loop, batch))
+        max_diff = max(
+            (abs(x[1] - y[1]) for a, b in zip(loop, batch) for x, y in zip(a, b)),
+            default=0.0,
+        )
+        if same_ranking:
+            self.stdout.write(self.style.SUCCESS(f"same ranking for all queries (largest score difference {max_diff:.1e})"))
+        else:
+            self.stderr.write("rankings differ")
+
+    def _loop_ranking(self, announcement, candidates, ids, threshold):
+        texts = {'breed': announcement.pet.breed or '', 'description': announcement.description or ''}
+        results = []
+        for start in range(0, len(ids), MATCH_CHUNK_SIZE):
+            chunk_ids = ids[start:start + MATCH_CHUNK_SIZE]
+            sims = similarities(texts, chunk_ids)
+            chunk = candidates.filter(id__in=chunk_ids).select_related('pet', 'location', 'owner').order_by('id')
+            for c in chunk:
+                score = match_score(
+                    announcement, c,
+                    breed_sim=sims['breed'].get(c.id, 0.0),
+                    desc_sim=sims['description'].get(c.id, 0.0),
+                )
+                if score >= threshold:
+                    results.append((c.id, score))
+        results.sort(key=lambda x: x[1], reverse=True)
+        return results
+
+    def _timed(self, fn):
+        start = time.perf_counter()
+        result = fn()
+        return time.perf_counter() - start, result
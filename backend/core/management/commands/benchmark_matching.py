@@ -0,0 +1,135 @@
+import random
+import time
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from core.geo import encode_geohash
+from core.models import Announcement, Location, Pet
+from core.trigrams import index_announcements
+from core.utils import find_matches_for_announcement, match_score
+
+BREEDS = {
+    'dog': ['labrador', 'husky', 'german shepherd', 'beagle', 'poodle', 'mixed', ''],
+    'cat': ['siamese', 'persian', 'maine coon', 'british shorthair', 'mixed', ''],
+    'bird': ['parrot', 'budgie', 'canary', ''],
+    'other': ['rabbit', 'hamster', 'ferret', ''],
+}
+COLORS = ['black', 'white', 'brown', 'grey', 'ginger', 'black and white', 'tabby', '']
+DESCRIPTIONS = [
+    'Seen near the park in the evening',
+    'Lost during the walk, very friendly',
+    'Found near the bus stop, wearing a red collar',
+    'Shy, does not come when called',
+    'Small and scared, was hiding under a car',
+    '',
+]
+
+
+def populate(owner, count, rng):
+    """Create ``count`` synthetic announcements with varied features, dates and places."""
+    pet_types = list(BREEDS)
+    pets = []
+    for i in range(count):
+        pet_type = rng.choice(pet_types)
+        pets.append(Pet(
+            name=f'Pet {i}',
+            pet_type=pet_type,
+            breed=rng.choice(BREEDS[pet_type]),
+            color=rng.choice(COLORS),
+        ))
+    pets = Pet.objects.bulk_create(pets)
+    locations = []
+    for _ in range(count):
+        # synthetic points scattered over roughly Ukraine
+        lat = rng.uniform(44.0, 52.0)
+        lng = rng.uniform(22.0, 40.0)
+        locations.append(Location(latitude=lat, longitude=lng, geohash=encode_geohash(lat, lng)))
+    locations = Location.objects.bulk_create(locations)
+    announcements = Announcement.objects.bulk_create([
+        Announcement(
+            pet=pet,
+            owner=owner,
+            location=loc,
+            status=rng.choice(['lost', 'found']),
+            description=rng.choice(DESCRIPTIONS),
+        )
+        for pet, loc in zip(pets, locations)
+    ])
+    # created_at is set on insert, so spread it over two years afterwards
+    now = timezone.now()
+    for ann in announcements:
+        ann.created_at = now - timedelta(days=rng.uniform(0, 730))
+    Announcement.objects.bulk_update(announcements, ['created_at'], batch_size=500)
+    index_announcements([ann.id for ann in announcements])
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare find_matches_for_announcement with scoring every candidate, at "
+        "growing table sizes, on synthetic announcements. Data is created "
+        "inside a transaction that is rolled back, so nothing is left behind."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--counts', default='1000,5000,20000', help='Comma-separated table sizes')
+        parser.add_argument('--queries', type=int, default=10)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        counts = sorted(int(value) for value in options['counts'].split(','))
+
+        mismatches = 0
+        with transaction.atomic():
+            owner = User.objects.create(username=f'bench-matching-{rng.random()}')
+            populated = 0
+            for count in counts:
+                populate(owner, count - populated, rng)
+                populated = count
+
+                found = list(Announcement.objects.filter(owner=owner, status='found').values_list('id', flat=True))
+                queries = list(Announcement.objects.filter(
+                    id__in=rng.sample(found, min(options['queries'], len(found))),
+                ).select_related('pet', 'location'))
+
+                legacy_time, legacy = self._timed(lambda: [self._legacy_matches(ann) for ann in queries])
+                current_time, current = self._timed(lambda: [find_matches_for_announcement(ann) for ann in queries])
+                for a, b in zip(legacy, current):
+                    if [(c.id, score) for c, score in a] != [(c.id, score) for c, score in b]:
+                        mismatches += 1
+
+                per_query_legacy = legacy_time / len(queries) * 1000
+                per_query_current = current_time / len(queries) * 1000
+                speedup = per_query_legacy / per_query_current if per_query_current > 0 else 0.0
+                self.stdout.write(
+                    f"{count:>8} announcements: score all {per_query_legacy:8.1f} ms/query, "
+                    f"pre-filtered {per_query_current:8.1f} ms/query, {speedup:.1f}x"
+                )
+
+            transaction.set_rollback(True)
+
+        if mismatches:
+            self.stderr.write(f"{mismatches} queries returned different matches")
+        else:
+            self.stdout.write(self.style.SUCCESS("matches identical for all queries"))
+
+    def _legacy_matches(self, announcement, threshold=0.25, limit=10):
+        candidates = Announcement.objects.filter(
+            status='lost' if announcement.status == 'found' else 'found',
+        ).exclude(id=announcement.id).select_related('pet', 'location', 'owner').order_by('id')
+        results = []
+        for c in candidates:
+            score = match_score(announcement, c)
+            if score >= threshold:
+                results.append((c, score))
+        results.sort(key=lambda x: x[1], reverse=True)
+        return results[:limit]
+
+    def _timed(self, fn):
+        start = time.perf_counter()
+        result = fn()
+        return time.perf_counter() - start, result
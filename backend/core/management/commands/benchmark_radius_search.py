@@ -0,0 +1,101 @@
+import random
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core.geo import encode_geohash, ids_within_radius
+from core.models import Announcement, Location, Pet
+from core.utils import haversine_meters
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the geohash radius lookup with the previous full-scan loop on "
+        "synthetic announcements. Data is created inside a transaction that is "
+        "rolled back, so nothing is left behind."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=20000)
+        parser.add_argument('--radius', type=float, default=2000.0, help='Search radius in meters')
+        parser.add_argument('--queries', type=int, default=20)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        count = options['count']
+        radius = options['radius']
+
+        # synthetic points scattered over roughly Ukraine
+        lat_range = (44.0, 52.0)
+        lng_range = (22.0, 40.0)
+
+        with transaction.atomic():
+            owner = User.objects.create(username=f'bench-radius-{rng.random()}')
+            self._populate(owner, count, rng, lat_range, lng_range)
+            centers = [
+                (rng.uniform(*lat_range), rng.uniform(*lng_range))
+                for _ in range(options['queries'])
+            ]
+            base = Announcement.objects.filter(owner=owner)
+
+            legacy_time, legacy_ids = self._timed(lambda: [self._legacy_ids(base, lat, lng, radius) for lat, lng in centers])
+            indexed_time, indexed_ids = self._timed(lambda: [ids_within_radius(base, lat, lng, radius) for lat, lng in centers])
+
+            transaction.set_rollback(True)
+
+        mismatches = sum(1 for a, b in zip(legacy_ids, indexed_ids) if sorted(a) != sorted(b))
+        per_query_legacy = legacy_time / len(centers) * 1000
+        per_query_indexed = indexed_time / len(centers) * 1000
+
+        self.stdout.write(f"announcements: {count}, radius: {radius:.0f} m, queries: {len(centers)}")
+        self.stdout.write(f"full scan loop: {per_query_legacy:.2f} ms/query")
+        self.stdout.write(f"geohash index:  {per_query_indexed:.2f} ms/query")
+        if per_query_indexed > 0:
+            self.stdout.write(f"speedup: {per_query_legacy / per_query_indexed:.1f}x")
+        if mismatches:
+            self.stderr.write(f"{mismatches} queries returned different results")
+        else:
+            self.stdout.write(self.style.SUCCESS("results identical for all queries"))
+
+    def _populate(self, owner, count, rng, lat_range, lng_range):
+        pets = Pet.objects.bulk_create([
+            Pet(name=f'Pet {i}', pet_type=rng.choice(['dog', 'cat', 'bird', 'other']))
+            for i in range(count)
+        ])
+        locations = []
+        for _ in range(count):
+            lat = rng.uniform(*lat_range)
+            lng = rng.uniform(*lng_range)
+            locations.append(Location(latitude=lat, longitude=lng, geohash=encode_geohash(lat, lng)))
+        locations = Location.objects.bulk_create(locations)
+        Announcement.objects.bulk_create([
+            Announcement(
+                pet=pet,
+                owner=owner,
+                location=loc,
+                status=rng.choice(['lost', 'found']),
+            )
+            for pet, loc in zip(pets, locations)
+        ])
+
+    def _legacy_ids(self, queryset, lat, lng, radius):
+        ids = []
+        for ann in list(queryset.select_related('pet', 'location', 'owner', 'owner__profile')):
+            if not ann.location:
+                continue
+            if ann.location.latitude is None or ann.location.longitude is None:
+                continue
+            d = haversine_meters(lat, lng, ann.location.latitude, ann.location.longitude)
+            if d is None:
+                continue
+            if d <= radius:
+                ids.append(ann.id)
+        return ids
+
+    def _timed(self, fn):
+        start = time.perf_counter()
+        result = fn()
+        return time.perf_counter() - start, result
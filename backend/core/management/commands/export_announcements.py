@@ -0,0 +1,48 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.export import EXPORT_CHUNK_SIZE, EXPORT_FORMATS, export_lines, parse_updated_since
+
+
+class Command(BaseCommand):
+    help = (
+        "Stream announcements to a file or stdout as NDJSON or CSV, one row at a "
+        "time. --updated-since limits the dump to rows changed after it."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', default='-', help="Destination file, or '-' for stdout")
+        parser.add_argument('--output-format', choices=EXPORT_FORMATS, help='Defaults to the file extension, else ndjson')
+        parser.add_argument('--updated-since', help='ISO date or datetime')
+        parser.add_argument('--chunk-size', type=int, default=EXPORT_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        path = options['output']
+        output_format = options['output_format']
+        if output_format is None:
+            output_format = 'csv' if path.endswith('.csv') else 'ndjson'
+
+        updated_since = None
+        if options['updated_since']:
+            try:
+                updated_since = parse_updated_since(options['updated_since'])
+            except ValueError as exc:
+                raise CommandError(str(exc))
+
+        if path == '-':
+            stream = open(sys.stdout.fileno(), 'w', encoding='utf-8', newline='', closefd=False)
+        else:
+            try:
+                stream = open(path, 'w', encoding='utf-8', newline='')
+            except OSError as exc:
+                raise CommandError(str(exc))
+
+        count = 0
+        with stream:
+            for line in export_lines(output_format, updated_since, max(1, options['chunk_size'])):
+                stream.write(line)
+                count += 1
+        if output_format == 'csv':
+            count -= 1
+        self.stderr.write(f"Exported {count} announcements")
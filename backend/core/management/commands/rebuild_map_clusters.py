@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from core.clusters import rebuild_clusters
+from core.models import Announcement, MapCell, MapCellEntry
+
+
+class Command(BaseCommand):
+    help = "Recompute the precomputed map cluster buckets from the announcements table."
+
+    def handle(self, *args, **options):
+        count = rebuild_clusters(Announcement, MapCell, MapCellEntry)
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt map clusters for {count} announcements"))
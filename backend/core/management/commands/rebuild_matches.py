@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from core.matches import rebuild_matches
+from core.models import Announcement, Match, TextGram
+
+
+class Command(BaseCommand):
+    help = (
+        "Score every open announcement from scratch and rewrite the match "
+        "table. Needed after changing MATCHES_PER_ANNOUNCEMENT or the match "
+        "weights."
+    )
+
+    def handle(self, *args, **options):
+        stored = rebuild_matches(Announcement, Match, TextGram)
+        self.stdout.write(self.style.SUCCESS(f"Stored {stored} matches"))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from core.feeds import alert_subscribers, prune_feeds, rebuild_user_feed
+
+
+class Command(BaseCommand):
+    help = "Recompute every alert subscriber's materialized near-me feed and drop aged-out entries."
+
+    def handle(self, *args, **options):
+        pruned = prune_feeds()
+        users = list(alert_subscribers().values_list('user_id', flat=True))
+        entries = sum(rebuild_user_feed(user_id) for user_id in users)
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt {len(users)} feeds with {entries} entries, pruned {pruned}"
+        ))
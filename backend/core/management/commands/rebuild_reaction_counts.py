@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from core.models import Reaction, ReactionCount
+from core.reactions import rebuild_reaction_counts
+
+
+class Command(BaseCommand):
+    help = "Recompute the denormalized reaction counters from the Reaction table."
+
+    def handle(self, *args, **options):
+        count = rebuild_reaction_counts(Reaction, ReactionCount)
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt reaction counters from {count} reactions"))
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from core.models import Announcement, GramStat, TextGram
+from core.trigrams import rebuild_text_grams
+
+
+class Command(BaseCommand):
+    help = "Rebuild the trigram index of announcement breeds and descriptions used by matching."
+
+    def handle(self, *args, **options):
+        stored = rebuild_text_grams(Announcement, TextGram, GramStat)
+        self.stdout.write(self.style.SUCCESS(f"Indexed {stored} grams"))
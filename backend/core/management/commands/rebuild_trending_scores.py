@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from core.models import AnonymousViewSketch, Announcement, Comment, PostView, Reaction, SavedAnnouncement
+from core.trending import rebuild_trending_scores
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute every announcement's trending score from its stored views, "
+        "saves, reactions and comments. Needed after changing "
+        "TRENDING_HALF_LIFE_HOURS or the event weights."
+    )
+
+    def handle(self, *args, **options):
+        updated = rebuild_trending_scores(
+            Announcement, PostView, SavedAnnouncement, Reaction, Comment, AnonymousViewSketch,
+        )
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt trending scores for {updated} announcements"))
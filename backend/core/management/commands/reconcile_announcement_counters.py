@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from core.counters import reconcile_announcement_counters
+from core.models import AnonymousViewSketch, Announcement, Comment, PostView, SavedAnnouncement
+
+
+class Command(BaseCommand):
+    help = "Recount views, comments and saves for announcements whose stored counters have drifted."
+
+    def handle(self, *args, **options):
+        fixed = reconcile_announcement_counters(
+            Announcement, PostView, Comment, SavedAnnouncement, AnonymousViewSketch,
+        )
+        self.stdout.write(self.style.SUCCESS(f"Fixed counters on {fixed} announcements"))
@@ -0,0 +1,337 @@
+"""Persistent lost/found matches, stored down to each announcement's match_floor."""
+import threading
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, Q
+
+MATCH_THRESHOLD = 0.25
+# pairs kept beyond MATCHES_PER_ANNOUNCEMENT, so a few closed partners do not
+# force a rescore
+MATCH_RESERVE = 10
+MATCH_CHUNK_SIZE = 500
+# from this many announcements on, refresh_matches() ranks them in one batch
+MATCH_BATCH_MIN = 10
+
+_batch = threading.local()
+
+
+def matches_per_announcement():
+    return getattr(settings, 'MATCHES_PER_ANNOUNCEMENT', 10)
+
+
+def _open(queryset):
+    return queryset.filter(is_active=True, is_reunited=False, location__isnull=False)
+
+
+def _sides(status):
+    """(own side, partner side) of an announcement with ``status`` in Match."""
+    return ('lost', 'found') if status == 'lost' else ('found', 'lost')
+
+
+def stored_matches(announcement_id, status, limit=None):
+    """(partner id, score) of the stored matches, best first and equal scores in id order."""
+    from .models import Match
+
+    side, other = _sides(status)
+    rows = Match.objects.filter(**{f'{side}_id': announcement_id}).order_by('-score', f'{other}_id')
+    return list(rows.values_list(f'{other}_id', 'score')[:limit])
+
+
+def match_partners(announcement_id):
+    """Ids of the announcements stored as a match of ``announcement_id``."""
+    from .models import Match
+
+    partners = set(Match.objects.filter(lost_id=announcement_id).values_list('found_id', flat=True))
+    partners.update(Match.objects.filter(found_id=announcement_id).values_list('lost_id', flat=True))
+    return partners
+
+
+def _short_of_matches(announcement_ids):
+    """
+    Those of ``announcement_ids`` with fewer than MATCHES_PER_ANNOUNCEMENT
+    stored pairs reaching their floor, which need a rescore.
+    """
+    from .models import Announcement, Match
+
+    needed = matches_per_announcement()
+    announcement_ids = list(announcement_ids)
+    short = []
+    for start in range(0, len(announcement_ids), MATCH_CHUNK_SIZE):
+        chunk = announcement_ids[start:start + MATCH_CHUNK_SIZE]
+        # a floor at the threshold means every match is stored already
+        floored = set(_open(Announcement.objects.filter(id__in=chunk, match_floor__gt=MATCH_THRESHOLD)).values_list('id', flat=True))
+        if not floored:
+            continue
+        kept = {}
+        for side in ('lost', 'found'):
+            kept.update(Match.objects.filter(
+                **{f'{side}_id__in': floored, 'score__gte': F(f'{side}__match_floor')},
+            ).values(f'{side}_id').annotate(n=Count('id')).values_list(f'{side}_id', 'n'))
+        short.extend(ann_id for ann_id in floored if kept.get(ann_id, 0) < needed)
+    return short
+
+
+def _raise_floors(announcement_ids, side):
+    """
+    Raise the floor of announcements on ``side`` that gained pairs to their
+    (MATCHES_PER_ANNOUNCEMENT + MATCH_RESERVE)-th best stored score, and
+    drop their pairs that neither side needs any more. Without this an
+    announcement scored while there were few candidates would collect every
+    later pair above the threshold.
+    """
+    from .models import Announcement, Match
+
+    other = 'found' if side == 'lost' else 'lost'
+    depth = matches_per_announcement() + MATCH_RESERVE
+    for announcement_id in announcement_ids:
+        pairs = Match.objects.filter(**{f'{side}_id': announcement_id})
+        scores = list(pairs.order_by('-score', f'{other}_id').values_list('score', flat=True)[depth - 1:depth + 1])
+        if len(scores) <= 1:
+            continue
+        floor = scores[0]
+        if not Announcement.objects.filter(id=announcement_id, match_floor__lt=floor).update(match_floor=floor):
+            continue
+        pairs.filter(
+            Q(**{f'{other}__match_floor__isnull': True}) | Q(score__lt=F(f'{other}__match_floor')),
+            score__lt=floor,
+        ).delete()
+
+
+def _floor(ranked):
+    # pairs scoring at least the floor of either side are stored, so an
+    # announcement's best matches are among its pairs while enough of them
+    # reach its floor
+    depth = matches_per_announcement() + MATCH_RESERVE
+    return ranked[depth - 1][1] if len(ranked) > depth else MATCH_THRESHOLD
+
+
+def _rank_batch(announcements, Announcement, TextGram):
+    """
+    Yield (announcement, ranking) for each of ``announcements`` (open, with
+    pet and location loaded), ranked against every open candidate of the
+    other status. The candidate features, grams included, are read once per
+    status and shared by the whole batch, so no announcement needs a query
+    of its own.
+    """
+    from .scoring import candidate_features, rank_candidates
+
+    by_status = {}
+    for announcement in announcements:
+        by_status.setdefault(announcement.status, []).append(announcement)
+    for status, group in by_status.items():
+        _, other = _sides(status)
+        candidates = _open(Announcement.objects.filter(status=other))
+        features = candidate_features(candidates, candidates.values_list('id', flat=True), TextGram=TextGram)
+        for announcement in group:
+            yield announcement, rank_candidates(announcement, features, MATCH_THRESHOLD, None)
+
+
+def _rescore(announcement_id):
+    """
+    Score one announcement against every open candidate and rewrite its
+    pairs. Returns the former partners that are now short of matches.
+    """
+    from .models import Announcement, Match
+    from .scoring import candidate_features, rank_candidates
+    from .utils import match_candidate_ids
+
+    partners = match_partners(announcement_id)
+    announcement = _open(Announcement.objects.filter(id=announcement_id)).select_related('pet', 'location').first()
+
+    rows = []
+    grown = []
+    floor = None
+    if announcement is not None:
+        side, other = _sides(announcement.status)
+        candidates = _open(Announcement.objects.filter(status=other))
+        ids = match_candidate_ids(announcement, candidates, MATCH_THRESHOLD)
+        ranked = rank_candidates(announcement, candidate_features(candidates, ids), MATCH_THRESHOLD, None)
+
+        floor = _floor(ranked)
+        partner_floors = {}
+        ranked_ids = [ann_id for ann_id, _ in ranked]
+        for start in range(0, len(ranked_ids), MATCH_CHUNK_SIZE):
+            partner_floors.update(Announcement.objects.filter(
+                id__in=ranked_ids[start:start + MATCH_CHUNK_SIZE],
+            ).values_list('id', 'match_floor'))
+        for partner_id, score in ranked:
+            # a partner that was never scored stores its own pairs when it is
+            partner_floor = partner_floors.get(partner_id)
+            reaches_partner = partner_floor is not None and score >= partner_floor
+            if reaches_partner:
+                grown.append(partner_id)
+            if score >= floor or reaches_partner:
+                rows.append(Match(**{f'{side}_id': announcement_id, f'{other}_id': partner_id, 'score': score}))
+
+    with transaction.atomic():
+        Match.objects.filter(lost_id=announcement_id).delete()
+        Match.objects.filter(found_id=announcement_id).delete()
+        Match.objects.bulk_create(rows, batch_size=MATCH_CHUNK_SIZE, ignore_conflicts=True)
+        Announcement.objects.filter(id=announcement_id).update(match_floor=floor)
+        if grown:
+            _raise_floors(grown, other)
+    return _short_of_matches(partners)
+
+
+def _rescore_batch(announcements):
+    """
+    _rescore() for many open announcements at once: they are ranked in one
+    batch, their pairs and floors written together, and each partner that
+    gained pairs has its floor raised once. Returns the former partners that
+    are now short of matches.
+    """
+    from .models import Announcement, Match, TextGram
+
+    ids = [announcement.id for announcement in announcements]
+    partners = set()
+    for start in range(0, len(ids), MATCH_CHUNK_SIZE):
+        chunk = ids[start:start + MATCH_CHUNK_SIZE]
+        partners.update(Match.objects.filter(lost_id__in=chunk).values_list('found_id', flat=True))
+        partners.update(Match.objects.filter(found_id__in=chunk).values_list('lost_id', flat=True))
+
+    rankings = list(_rank_batch(announcements, Announcement, TextGram))
+    floors = {announcement.id: _floor(ranked) for announcement, ranked in rankings}
+    others = list({partner_id for _, ranked in rankings for partner_id, _ in ranked if partner_id not in floors})
+    partner_floors = {}
+    for start in range(0, len(others), MATCH_CHUNK_SIZE):
+        partner_floors.update(Announcement.objects.filter(
+            id__in=others[start:start + MATCH_CHUNK_SIZE],
+        ).values_list('id', 'match_floor'))
+
+    pairs = {}
+    grown = {'lost': set(), 'found': set()}
+    for announcement, ranked in rankings:
+        side, other = _sides(announcement.status)
+        for partner_id, score in ranked:
+            # a pair within the batch is seen from both sides, with both floors known
+            partner_floor = floors[partner_id] if partner_id in floors else partner_floors.get(partner_id)
+            reaches_partner = partner_floor is not None and score >= partner_floor
+            if reaches_partner and partner_id not in floors:
+                grown[other].add(partner_id)
+            if score >= floors[announcement.id] or reaches_partner:
+                key = (announcement.id, partner_id) if side == 'lost' else (partner_id, announcement.id)
+                pairs[key] = score
+
+    with transaction.atomic():
+        for start in range(0, len(ids), MATCH_CHUNK_SIZE):
+            chunk = ids[start:start + MATCH_CHUNK_SIZE]
+            Match.objects.filter(lost_id__in=chunk).delete()
+            Match.objects.filter(found_id__in=chunk).delete()
+        Match.objects.bulk_create(
+            [Match(lost_id=lost_id, found_id=found_id, score=score) for (lost_id, found_id), score in pairs.items()],
+            batch_size=MATCH_CHUNK_SIZE, ignore_conflicts=True,
+        )
+        Announcement.objects.bulk_update(
+            [Announcement(id=ann_id, match_floor=floor) for ann_id, floor in floors.items()],
+            ['match_floor'], batch_size=MATCH_CHUNK_SIZE,
+        )
+        for side, grown_ids in grown.items():
+            if grown_ids:
+                _raise_floors(grown_ids, side)
+    return _short_of_matches(partners - floors.keys())
+
+
+def refresh_matches(announcement_ids):
+    """
+    Rescore ``announcement_ids`` and rewrite their pairs, then rescore any
+    partner they left short of matches.
+    """
+    from .models import Announcement
+
+    queue = list(dict.fromkeys(announcement_ids))
+    done = set()
+    if len(queue) >= MATCH_BATCH_MIN:
+        # e.g. an import: rescore the open ones as one batch, the closed
+        # ones below only lose their pairs
+        announcements = []
+        for start in range(0, len(queue), MATCH_CHUNK_SIZE):
+            announcements.extend(_open(Announcement.objects.filter(
+                id__in=queue[start:start + MATCH_CHUNK_SIZE],
+            )).select_related('pet', 'location'))
+        done.update(announcement.id for announcement in announcements)
+        if announcements:
+            queue.extend(_rescore_batch(announcements))
+
+    while queue:
+        announcement_id = queue.pop()
+        if announcement_id in done:
+            continue
+        done.add(announcement_id)
+        queue.extend(_rescore(announcement_id))
+    return len(done)
+
+
+def refill_partners(announcement_ids):
+    """Rescore those of ``announcement_ids`` left short of matches, e.g. after a delete."""
+    short = _short_of_matches(announcement_ids)
+    if short:
+        request_match_refresh(short)
+
+
+def request_match_refresh(announcement_ids):
+    """
+    Refresh once the current transaction commits, or at the end of the
+    enclosing deferred_match_refresh() block.
+    """
+    pending = getattr(_batch, 'pending', None)
+    if pending is None:
+        announcement_ids = list(announcement_ids)
+        transaction.on_commit(lambda: refresh_matches(announcement_ids))
+    else:
+        pending.update(dict.fromkeys(announcement_ids))
+
+
+@contextmanager
+def deferred_match_refresh():
+    """
+    Refresh each announcement whose matches are requested inside the block
+    once, when the block exits and its transaction commits; an edit saves
+    the pet, the location and the announcement, and each save may ask for a
+    refresh.
+    """
+    if getattr(_batch, 'pending', None) is not None:
+        yield
+        return
+    _batch.pending = pending = {}
+    try:
+        yield
+    finally:
+        _batch.pending = None
+    if pending:
+        transaction.on_commit(lambda: refresh_matches(pending))
+
+
+def rebuild_matches(Announcement, Match, TextGram):
+    """
+    Score every open announcement from scratch, ranking each status in one
+    batch, and return the number of pairs stored.
+    """
+    Match.objects.all().delete()
+    Announcement.objects.filter(match_floor__isnull=False).update(match_floor=None)
+
+    announcements = list(_open(Announcement.objects.all()).select_related('pet', 'location'))
+    floors = {}
+    # every pair shows up in the rankings of both sides with the same score:
+    # the found side only sets floors, the lost side then writes the pairs
+    found = [announcement for announcement in announcements if announcement.status == 'found']
+    for announcement, ranked in _rank_batch(found, Announcement, TextGram):
+        floors[announcement.id] = _floor(ranked)
+
+    stored = 0
+    lost = [announcement for announcement in announcements if announcement.status == 'lost']
+    for announcement, ranked in _rank_batch(lost, Announcement, TextGram):
+        floor = floors[announcement.id] = _floor(ranked)
+        rows = [
+            Match(lost_id=announcement.id, found_id=found_id, score=score)
+            for found_id, score in ranked
+            if score >= floor or score >= floors[found_id]
+        ]
+        stored += len(Match.objects.bulk_create(rows, batch_size=MATCH_CHUNK_SIZE))
+
+    Announcement.objects.bulk_update(
+        [Announcement(id=ann_id, match_floor=floor) for ann_id, floor in floors.items()],
+        ['match_floor'], batch_size=MATCH_CHUNK_SIZE,
+    )
+    return stored
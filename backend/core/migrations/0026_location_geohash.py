@@ -0,0 +1,34 @@
+# Generated by Django 5.2.10 on 2026-10-18 19:41
+
+from django.db import migrations, models
+
+from core.geo import encode_geohash
+
+
+def backfill_geohash(apps, schema_editor):
+    Location = apps.get_model('core', 'Location')
+    batch = []
+    for loc in Location.objects.only('id', 'latitude', 'longitude').iterator(chunk_size=2000):
+        loc.geohash = encode_geohash(loc.latitude, loc.longitude)
+        batch.append(loc)
+        if len(batch) >= 2000:
+            Location.objects.bulk_update(batch, ['geohash'])
+            batch = []
+    if batch:
+        Location.objects.bulk_update(batch, ['geohash'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0025_alter_conversation_announcement_nullable'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='location',
+            name='geohash',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=12),
+        ),
+        migrations.RunPython(backfill_geohash, migrations.RunPython.noop),
+    ]
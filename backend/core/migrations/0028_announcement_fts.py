@@ -0,0 +1,39 @@
+from django.db import migrations
+
+FTS_TABLE = 'core_announcement_fts'
+
+
+def create_fts_index(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+            "pet_name, breed, color, pet_description, description, "
+            "tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+        )
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE} (rowid, pet_name, breed, color, pet_description, description) "
+            "SELECT a.id, p.name, p.breed, p.color, p.description, a.description "
+            "FROM core_announcement a JOIN core_pet p ON p.id = a.pet_id"
+        )
+
+
+def drop_fts_index(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0027_announcement_feed_idx'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_fts_index, drop_fts_index),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.2.10 on 2026-10-18 19:50
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+from core.clusters import rebuild_clusters
+
+
+def populate_clusters(apps, schema_editor):
+    rebuild_clusters(
+        apps.get_model('core', 'Announcement'),
+        apps.get_model('core', 'MapCell'),
+        apps.get_model('core', 'MapCellEntry'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0028_announcement_fts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MapCell',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('precision', models.PositiveSmallIntegerField()),
+                ('geohash', models.CharField(max_length=12)),
+                ('status', models.CharField(max_length=10)),
+                ('pet_type', models.CharField(max_length=10)),
+                ('count', models.IntegerField(default=0)),
+                ('lat_sum', models.FloatField(default=0.0)),
+                ('lng_sum', models.FloatField(default=0.0)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('precision', 'geohash', 'status', 'pet_type'), name='unique_map_cell_bucket')],
+            },
+        ),
+        migrations.CreateModel(
+            name='MapCellEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('geohash', models.CharField(max_length=12)),
+                ('status', models.CharField(max_length=10)),
+                ('pet_type', models.CharField(max_length=10)),
+                ('latitude', models.FloatField()),
+                ('longitude', models.FloatField()),
+                ('announcement', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='map_cell_entry', to='core.announcement')),
+            ],
+        ),
+        migrations.RunPython(populate_clusters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.10 on 2026-10-18 19:57
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0029_map_clusters'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='announcement',
+            index=models.Index(fields=['updated_at', 'id'], name='announcement_updated_idx'),
+        ),
+    ]
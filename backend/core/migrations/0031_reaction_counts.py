@@ -0,0 +1,37 @@
+# Generated by Django 5.2.10 on 2026-10-18 20:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+from core.reactions import rebuild_reaction_counts
+
+
+def populate_reaction_counts(apps, schema_editor):
+    rebuild_reaction_counts(
+        apps.get_model('core', 'Reaction'),
+        apps.get_model('core', 'ReactionCount'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0030_announcement_updated_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReactionCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('like', 'Like'), ('helpful', 'Helpful'), ('sad', 'Sad'), ('laugh', 'Laugh'), ('angry', 'Angry'), ('surprised', 'Surprised'), ('love', 'Love')], max_length=20)),
+                ('count', models.IntegerField(default=0)),
+                ('announcement', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='reaction_counts', to='core.announcement')),
+                ('comment', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='reaction_counts', to='core.comment')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(condition=models.Q(('comment__isnull', False)), fields=('comment', 'kind'), name='unique_reaction_count_per_comment_kind'), models.UniqueConstraint(condition=models.Q(('announcement__isnull', False)), fields=('announcement', 'kind'), name='unique_reaction_count_per_announcement_kind')],
+            },
+        ),
+        migrations.RunPython(populate_reaction_counts, migrations.RunPython.noop),
+    ]
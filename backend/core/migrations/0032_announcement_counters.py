@@ -0,0 +1,40 @@
+# Generated by Django 5.2.10 on 2026-10-18 20:01
+
+from django.db import migrations, models
+
+from core.counters import reconcile_announcement_counters
+
+
+def populate_counters(apps, schema_editor):
+    reconcile_announcement_counters(
+        apps.get_model('core', 'Announcement'),
+        apps.get_model('core', 'PostView'),
+        apps.get_model('core', 'Comment'),
+        apps.get_model('core', 'SavedAnnouncement'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0031_reaction_counts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='announcement',
+            name='comments_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='announcement',
+            name='saves_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='announcement',
+            name='views_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(populate_counters, migrations.RunPython.noop),
+    ]
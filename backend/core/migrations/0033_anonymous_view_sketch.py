@@ -0,0 +1,23 @@
+# Generated by Django 5.2.10 on 2026-10-18 20:04
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0032_announcement_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AnonymousViewSketch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('registers', models.BinaryField()),
+                ('estimate', models.PositiveIntegerField(default=0)),
+                ('announcement', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='anonymous_view_sketch', to='core.announcement')),
+            ],
+        ),
+    ]
@@ -0,0 +1,71 @@
+# Generated by Django 5.2.10 on 2026-10-18 20:04
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0033_anonymous_view_sketch'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedAnnouncement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('original_id', models.PositiveIntegerField(unique=True)),
+                ('status', models.CharField(choices=[('lost', 'Lost'), ('found', 'Found')], max_length=10)),
+                ('is_active', models.BooleanField()),
+                ('is_reunited', models.BooleanField()),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('data', models.JSONField()),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_announcements', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ArchivedComment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('original_id', models.PositiveIntegerField()),
+                ('parent_original_id', models.PositiveIntegerField(blank=True, null=True)),
+                ('text', models.TextField()),
+                ('created_at', models.DateTimeField()),
+                ('archived_announcement', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='comments', to='core.archivedannouncement')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_comments', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedPostView',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('session_key', models.CharField(blank=True, max_length=64, null=True)),
+                ('created_at', models.DateTimeField()),
+                ('archived_announcement', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='post_views', to='core.archivedannouncement')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='archived_views', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ArchivedReaction',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('comment_original_id', models.PositiveIntegerField(blank=True, null=True)),
+                ('kind', models.CharField(choices=[('like', 'Like'), ('helpful', 'Helpful'), ('sad', 'Sad'), ('laugh', 'Laugh'), ('angry', 'Angry'), ('surprised', 'Surprised'), ('love', 'Love')], max_length=20)),
+                ('created_at', models.DateTimeField()),
+                ('archived_announcement', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reactions', to='core.archivedannouncement')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_reactions', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='archivedannouncement',
+            index=models.Index(fields=['owner', '-original_id'], name='archived_owner_idx'),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.10 on 2026-10-18 20:06
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+from core.feeds import rebuild_feeds
+
+
+def populate_feeds(apps, schema_editor):
+    rebuild_feeds(
+        apps.get_model('core', 'Announcement'),
+        apps.get_model('core', 'Profile'),
+        apps.get_model('core', 'NearbyFeedEntry'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0034_announcement_archive'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NearbyFeedEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField()),
+                ('distance_m', models.FloatField()),
+                ('announcement', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='nearby_feed_entries', to='core.announcement')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='nearby_feed', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', '-created_at', '-announcement'], name='nearby_feed_idx')],
+                'constraints': [models.UniqueConstraint(fields=('user', 'announcement'), name='unique_nearby_feed_entry')],
+            },
+        ),
+        migrations.RunPython(populate_feeds, migrations.RunPython.noop),
+    ]
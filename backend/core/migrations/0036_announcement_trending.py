@@ -0,0 +1,39 @@
+# Generated by Django 5.2.10 on 2026-10-18 20:08
+
+import core.trending
+from django.conf import settings
+from django.db import migrations, models
+
+from core.trending import rebuild_trending_scores
+
+
+def populate_trending_scores(apps, schema_editor):
+    rebuild_trending_scores(
+        apps.get_model('core', 'Announcement'),
+        apps.get_model('core', 'PostView'),
+        apps.get_model('core', 'SavedAnnouncement'),
+        apps.get_model('core', 'Reaction'),
+        apps.get_model('core', 'Comment'),
+        apps.get_model('core', 'AnonymousViewSketch'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0035_nearby_feed'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='announcement',
+            name='trending_score',
+            field=models.FloatField(default=core.trending.initial_trending_score, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='announcement',
+            index=models.Index(fields=['-trending_score', '-id'], name='announcement_trending_idx'),
+        ),
+        migrations.RunPython(populate_trending_scores, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.10 on 2026-10-18 20:15
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+from core.trigrams import rebuild_text_grams
+
+
+def populate_text_grams(apps, schema_editor):
+    rebuild_text_grams(apps.get_model('core', 'Announcement'), apps.get_model('core', 'TextGram'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0037_pet_match_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TextGram',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('field', models.CharField(choices=[('breed', 'Breed'), ('description', 'Description')], max_length=12)),
+                ('gram', models.CharField(max_length=3)),
+                ('announcement', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='text_grams', to='core.announcement')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['field', 'gram', 'announcement'], name='text_gram_postings_idx')],
+                'constraints': [models.UniqueConstraint(fields=('announcement', 'field', 'gram'), name='unique_text_gram')],
+            },
+        ),
+        migrations.RunPython(populate_text_grams, migrations.RunPython.noop),
+    ]
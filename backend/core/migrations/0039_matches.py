@@ -0,0 +1,39 @@
+# Generated by Django 5.2.10 on 2026-10-18 20:38
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+from core.matches import rebuild_matches
+
+
+def populate_matches(apps, schema_editor):
+    rebuild_matches(apps.get_model('core', 'Announcement'), apps.get_model('core', 'Match'), apps.get_model('core', 'TextGram'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0038_text_grams'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='announcement',
+            name='match_floor',
+            field=models.FloatField(editable=False, null=True),
+        ),
+        migrations.CreateModel(
+            name='Match',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField()),
+                ('found', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='matches_as_found', to='core.announcement')),
+                ('lost', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='matches_as_lost', to='core.announcement')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['lost', '-score', 'found'], name='match_lost_idx'), models.Index(fields=['found', '-score', 'lost'], name='match_found_idx')],
+                'constraints': [models.UniqueConstraint(fields=('lost', 'found'), name='unique_match')],
+            },
+        ),
+        migrations.RunPython(populate_matches, migrations.RunPython.noop),
+    ]
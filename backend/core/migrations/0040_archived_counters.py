@@ -0,0 +1,40 @@
+# Generated by Django 5.2.10 on 2026-10-18 21:30
+
+from django.db import migrations, models
+
+
+def backfill_counters(apps, schema_editor):
+    # archives made before the columns existed still have the counters in
+    # their rendered snapshot
+    ArchivedAnnouncement = apps.get_model('core', 'ArchivedAnnouncement')
+    batch = []
+    for archive in ArchivedAnnouncement.objects.only('id', 'data').iterator(chunk_size=2000):
+        archive.views_count = archive.data.get('views_count') or 0
+        archive.saves_count = archive.data.get('saves_count') or 0
+        batch.append(archive)
+        if len(batch) >= 2000:
+            ArchivedAnnouncement.objects.bulk_update(batch, ['views_count', 'saves_count'])
+            batch = []
+    if batch:
+        ArchivedAnnouncement.objects.bulk_update(batch, ['views_count', 'saves_count'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0039_matches'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='archivedannouncement',
+            name='saves_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='archivedannouncement',
+            name='views_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.10 on 2026-10-18 22:10
+
+from django.db import migrations
+
+
+def prune_reunited(apps, schema_editor):
+    NearbyFeedEntry = apps.get_model('core', 'NearbyFeedEntry')
+    NearbyFeedEntry.objects.filter(announcement__is_reunited=True).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0040_archived_counters'),
+    ]
+
+    operations = [
+        migrations.RunPython(prune_reunited, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.10 on 2026-10-18 21:42
+
+from django.db import migrations, models
+
+from core.trigrams import rebuild_gram_stats
+
+
+def populate_gram_stats(apps, schema_editor):
+    rebuild_gram_stats(apps.get_model('core', 'TextGram'), apps.get_model('core', 'GramStat'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0041_prune_reunited_feed_entries'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GramStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('field', models.CharField(choices=[('breed', 'Breed'), ('description', 'Description')], max_length=12)),
+                ('gram', models.CharField(max_length=3)),
+                ('documents', models.IntegerField(default=0)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('field', 'gram'), name='unique_gram_stat')],
+            },
+        ),
+        migrations.RunPython(populate_gram_stats, migrations.RunPython.noop),
+    ]
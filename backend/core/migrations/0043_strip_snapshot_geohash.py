@@ -0,0 +1,30 @@
+# Generated by Django 5.2.10 on 2026-10-18 22:40
+
+from django.db import migrations
+
+
+def strip_geohash(apps, schema_editor):
+    # snapshots rendered before LocationSerializer dropped geohash
+    ArchivedAnnouncement = apps.get_model('core', 'ArchivedAnnouncement')
+    batch = []
+    for archive in ArchivedAnnouncement.objects.only('id', 'data').iterator(chunk_size=2000):
+        location = archive.data.get('location')
+        if isinstance(location, dict) and 'geohash' in location:
+            del location['geohash']
+            batch.append(archive)
+        if len(batch) >= 2000:
+            ArchivedAnnouncement.objects.bulk_update(batch, ['data'])
+            batch = []
+    if batch:
+        ArchivedAnnouncement.objects.bulk_update(batch, ['data'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0042_gram_stats'),
+    ]
+
+    operations = [
+        migrations.RunPython(strip_geohash, migrations.RunPython.noop),
+    ]
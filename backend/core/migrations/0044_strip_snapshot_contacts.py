@@ -0,0 +1,32 @@
+# Generated by Django 5.2.10 on 2026-10-18 22:50
+
+from django.db import migrations
+
+CONTACT_FIELDS = ('phone_number', 'email')
+
+
+def strip_contacts(apps, schema_editor):
+    # snapshots taken before the contact fields joined SNAPSHOT_EXCLUDED_FIELDS
+    ArchivedAnnouncement = apps.get_model('core', 'ArchivedAnnouncement')
+    batch = []
+    for archive in ArchivedAnnouncement.objects.only('id', 'data').iterator(chunk_size=2000):
+        if any(field in archive.data for field in CONTACT_FIELDS):
+            for field in CONTACT_FIELDS:
+                archive.data.pop(field, None)
+            batch.append(archive)
+        if len(batch) >= 2000:
+            ArchivedAnnouncement.objects.bulk_update(batch, ['data'])
+            batch = []
+    if batch:
+        ArchivedAnnouncement.objects.bulk_update(batch, ['data'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0043_strip_snapshot_geohash'),
+    ]
+
+    operations = [
+        migrations.RunPython(strip_contacts, migrations.RunPython.noop),
+    ]
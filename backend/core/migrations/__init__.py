@@ -0,0 +1,4 @@
+# Data migrations here rebuild denormalized tables with the helpers in core
+# (rebuild_clusters, rebuild_text_grams, ...). Those helpers take the model
+# classes as arguments so a migration can pass its historical versions from
+# apps.get_model().
@@ -1,10 +1,15 @@
 from django.db import models
-from django.db.models import Q
+from django.db.models import F, Q
 from django.contrib.auth.models import User
 from django.contrib.auth.models import User
-from django.db import models
-from django.db.models.signals import post_save
+from django.db import models, transaction
+from django.core.signals import setting_changed
+from django.db.models.signals import post_delete, post_migrate, post_save, pre_delete, pre_save
 from django.dispatch import receiver
+from django.utils import timezone
+
+from .geo import encode_geohash
+from .trending import initial_trending_score
 
 
 class Profile(models.Model):
@@ -44,6 +49,14 @@ class Pet(models.Model):
     photo = models.ImageField(upload_to='pets/', blank=True, null=True)
     gender = models.CharField(max_length=10, choices=GENDER_CHOICES, blank=True)
 
+    class Meta:
+        indexes = [
+            # candidate lookups of utils.find_matches_for_announcement
+            models.Index(fields=['pet_type'], name='pet_type_idx'),
+            models.Index(fields=['color'], name='pet_color_idx'),
+            models.Index(fields=['breed'], name='pet_breed_idx'),
+        ]
+
     def __str__(self):
         return f"{self.name} ({self.pet_type})"
 
@@ -57,6 +70,15 @@ class Location(models.Model):
     address = models.CharField(max_length=200, blank=True)
     # search radius in meters representing the "last seen area" around this point
     search_radius = models.FloatField(null=True, blank=True)
+    # geohash of the point, kept current on save; indexed for radius lookups
+    geohash = models.CharField(max_length=12, blank=True, db_index=True, editable=False)
+
+    def save(self, *args, **kwargs):
+        self.geohash = encode_geohash(self.latitude, self.longitude)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and ({'latitude', 'longitude'} & set(update_fields)):
+            kwargs['update_fields'] = set(update_fields) | {'geohash'}
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return self.address or f"{self.latitude}, {self.longitude}"
@@ -80,6 +102,42 @@ class Announcement(models.Model):
     description = models.TextField(blank=True)
     is_active = models.BooleanField(default=True)
     is_reunited = models.BooleanField(default=False)
+    # denormalized counters, moved with F() increments by the receivers at the
+    # bottom of this module; manage.py reconcile_announcement_counters fixes drift
+    views_count = models.PositiveIntegerField(default=0, editable=False)
+    comments_count = models.PositiveIntegerField(default=0, editable=False)
+    saves_count = models.PositiveIntegerField(default=0, editable=False)
+    # log-space, time-decayed engagement score (see core.trending), moved by
+    # the same receivers
+    trending_score = models.FloatField(default=initial_trending_score, editable=False)
+    # score down to which this announcement's matches are all stored (see
+    # core.matches); null until it has been matched
+    match_floor = models.FloatField(null=True, editable=False)
+
+    COUNTER_FIELDS = ('views_count', 'comments_count', 'saves_count', 'trending_score', 'match_floor')
+
+    class Meta:
+        indexes = [
+            # keyset pagination of the feed walks (created_at, id) newest first
+            models.Index(fields=['-created_at', '-id'], name='announcement_feed_idx'),
+            # incremental exports scan rows changed after a given updated_at
+            models.Index(fields=['updated_at', 'id'], name='announcement_updated_idx'),
+            # sort=trending walks (trending_score, id) highest first
+            models.Index(fields=['-trending_score', '-id'], name='announcement_trending_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        # a full save of a loaded instance would write back counter values that
+        # may have moved since it was read, so counters (and the match floor,
+        # written by the same kind of receiver) are left out of it
+        if not self._state.adding and kwargs.get('update_fields') is None and not kwargs.get('force_insert'):
+            deferred = self.get_deferred_fields()
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.COUNTER_FIELDS and field.attname not in deferred
+            ]
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return f"{self.pet.name} - {self.status}"
 
@@ -275,6 +333,24 @@ class PostView(models.Model):
         ]
 
 
+class AnonymousViewSketch(models.Model):
+    """
+    HyperLogLog sketch (see core.hll) of the anonymous visitors of an
+    announcement. ``estimate`` is the sketch's current count and is already
+    included in Announcement.views_count.
+    """
+    announcement = models.OneToOneField(
+        Announcement,
+        on_delete=models.CASCADE,
+        related_name="anonymous_view_sketch",
+    )
+    registers = models.BinaryField()
+    estimate = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"~{self.estimate} anonymous views of {self.announcement_id}"
+
+
 class SavedAnnouncement(models.Model):
     user = models.ForeignKey(
         User,
@@ -461,12 +537,510 @@ class Reaction(models.Model):
             models.UniqueConstraint(fields=['user', 'announcement', 'kind'], condition=Q(announcement__isnull=False), name='unique_reaction_per_user_announcement_kind'),
         ]
 
+    def save(self, *args, **kwargs):
+        # the post_save receiver updates ReactionCount; keep both writes in
+        # one transaction
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            return super().delete(*args, **kwargs)
+
     def __str__(self):
         target = f"comment {self.comment_id}" if self.comment_id else f"announcement {self.announcement_id}"
         return f"{self.kind} by {self.user.username} on {target}"
 
 
+class ReactionCount(models.Model):
+    """
+    Number of reactions of one kind on an announcement or a comment, kept in
+    step with Reaction by core.reactions so counts are read without COUNTs.
+    """
+    announcement = models.ForeignKey(Announcement, on_delete=models.CASCADE, related_name='reaction_counts', null=True, blank=True)
+    comment = models.ForeignKey(Comment, on_delete=models.CASCADE, related_name='reaction_counts', null=True, blank=True)
+    kind = models.CharField(max_length=20, choices=Reaction.KIND_CHOICES)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['comment', 'kind'], condition=Q(comment__isnull=False), name='unique_reaction_count_per_comment_kind'),
+            models.UniqueConstraint(fields=['announcement', 'kind'], condition=Q(announcement__isnull=False), name='unique_reaction_count_per_announcement_kind'),
+        ]
+
+    def __str__(self):
+        target = f"comment {self.comment_id}" if self.comment_id else f"announcement {self.announcement_id}"
+        return f"{self.kind} x{self.count} on {target}"
+
+
+class MapCell(models.Model):
+    """
+    Precomputed map cluster bucket: active announcements with a given status
+    and pet type inside one geohash cell, kept up to date by core.clusters.
+    """
+    precision = models.PositiveSmallIntegerField()
+    geohash = models.CharField(max_length=12)
+    status = models.CharField(max_length=10)
+    pet_type = models.CharField(max_length=10)
+    count = models.IntegerField(default=0)
+    lat_sum = models.FloatField(default=0.0)
+    lng_sum = models.FloatField(default=0.0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['precision', 'geohash', 'status', 'pet_type'],
+                name='unique_map_cell_bucket',
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.geohash} {self.status}/{self.pet_type}: {self.count}"
+
+
+class MapCellEntry(models.Model):
+    """What an announcement currently contributes to MapCell rows."""
+    announcement = models.OneToOneField(Announcement, on_delete=models.CASCADE, related_name='map_cell_entry')
+    geohash = models.CharField(max_length=12)
+    status = models.CharField(max_length=10)
+    pet_type = models.CharField(max_length=10)
+    latitude = models.FloatField()
+    longitude = models.FloatField()
+
+    def __str__(self):
+        return f"{self.announcement_id} in {self.geohash}"
+
+
+class NearbyFeedEntry(models.Model):
+    """
+    An announcement in a subscriber's materialized "near me" feed, kept up to
+    date by core.feeds.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='nearby_feed')
+    announcement = models.ForeignKey(Announcement, on_delete=models.CASCADE, related_name='nearby_feed_entries')
+    # copy of Announcement.created_at, the feed order
+    created_at = models.DateTimeField()
+    distance_m = models.FloatField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'announcement'], name='unique_nearby_feed_entry'),
+        ]
+        indexes = [
+            models.Index(fields=['user', '-created_at', '-announcement'], name='nearby_feed_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.announcement_id} in feed of {self.user_id}"
+
+
+class TextGram(models.Model):
+    """
+    One character trigram of an announcement's breed or description, the
+    inverted index behind text similarity in matching (see core.trigrams).
+    """
+    FIELD_BREED = 'breed'
+    FIELD_DESCRIPTION = 'description'
+    FIELD_CHOICES = [
+        (FIELD_BREED, 'Breed'),
+        (FIELD_DESCRIPTION, 'Description'),
+    ]
+
+    announcement = models.ForeignKey(Announcement, on_delete=models.CASCADE, related_name='text_grams')
+    field = models.CharField(max_length=12, choices=FIELD_CHOICES)
+    gram = models.CharField(max_length=3)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['announcement', 'field', 'gram'], name='unique_text_gram'),
+        ]
+        indexes = [
+            # postings list of a gram
+            models.Index(fields=['field', 'gram', 'announcement'], name='text_gram_postings_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.field} {self.gram!r} of {self.announcement_id}"
+
+
+class GramStat(models.Model):
+    """
+    Number of announcements whose breed or description has a trigram, kept
+    up to date by core.trigrams so queries can start from the rarest grams
+    without counting postings.
+    """
+    field = models.CharField(max_length=12, choices=TextGram.FIELD_CHOICES)
+    gram = models.CharField(max_length=3)
+    documents = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['field', 'gram'], name='unique_gram_stat'),
+        ]
+
+    def __str__(self):
+        return f"{self.field} {self.gram!r} in {self.documents}"
+
+
+class Match(models.Model):
+    """
+    A scored pair of an open lost and an open found announcement, kept up to
+    date by core.matches.
+    """
+    lost = models.ForeignKey(Announcement, on_delete=models.CASCADE, related_name='matches_as_lost')
+    found = models.ForeignKey(Announcement, on_delete=models.CASCADE, related_name='matches_as_found')
+    score = models.FloatField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['lost', 'found'], name='unique_match'),
+        ]
+        indexes = [
+            # best matches of one announcement, from either side
+            models.Index(fields=['lost', '-score', 'found'], name='match_lost_idx'),
+            models.Index(fields=['found', '-score', 'lost'], name='match_found_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.lost_id} ~ {self.found_id} ({self.score:.2f})"
+
+
+class ArchivedAnnouncement(models.Model):
+    """
+    Cold copy of a reunited or inactive announcement moved out of the live
+    table by core.archive. ``data`` is the AnnouncementSerializer rendering at
+    archive time; its comments, reactions and views live in the tables below.
+    Saves and anonymous view sketches are not kept, so ``views_count`` and
+    ``saves_count`` hold the counters as they were when it was archived.
+    """
+    original_id = models.PositiveIntegerField(unique=True)
+    owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name='archived_announcements')
+    status = models.CharField(max_length=10, choices=Announcement.STATUS_CHOICES)
+    is_active = models.BooleanField()
+    is_reunited = models.BooleanField()
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+    data = models.JSONField()
+    views_count = models.PositiveIntegerField(default=0)
+    saves_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['owner', '-original_id'], name='archived_owner_idx'),
+        ]
+
+    def __str__(self):
+        return f"Archived announcement {self.original_id}"
+
+
+class ArchivedComment(models.Model):
+    archived_announcement = models.ForeignKey(ArchivedAnnouncement, on_delete=models.CASCADE, related_name='comments')
+    original_id = models.PositiveIntegerField()
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='archived_comments')
+    parent_original_id = models.PositiveIntegerField(null=True, blank=True)
+    text = models.TextField()
+    created_at = models.DateTimeField()
+
+    class Meta:
+        ordering = ["created_at"]
+
+
+class ArchivedReaction(models.Model):
+    archived_announcement = models.ForeignKey(ArchivedAnnouncement, on_delete=models.CASCADE, related_name='reactions')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='archived_reactions')
+    # set for reactions on one of the announcement's comments
+    comment_original_id = models.PositiveIntegerField(null=True, blank=True)
+    kind = models.CharField(max_length=20, choices=Reaction.KIND_CHOICES)
+    created_at = models.DateTimeField()
+
+
+class ArchivedPostView(models.Model):
+    archived_announcement = models.ForeignKey(ArchivedAnnouncement, on_delete=models.CASCADE, related_name='post_views')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='archived_views', null=True, blank=True)
+    session_key = models.CharField(max_length=64, null=True, blank=True)
+    created_at = models.DateTimeField()
+
+
 @receiver(post_save, sender=User)
 def create_profile(sender, instance, created, **kwargs):
     if created:
         Profile.objects.create(user=instance, phone_number="0000000000")
+
+
+@receiver(post_save, sender=Announcement)
+def index_announcement(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    from .search import get_search_backend
+    get_search_backend().index([instance.id])
+
+
+@receiver(post_save, sender=Pet)
+def index_pet_announcements(sender, instance, created, raw=False, **kwargs):
+    if raw or created:
+        return
+    from .search import get_search_backend
+    ids = list(instance.announcements.values_list('id', flat=True))
+    if ids:
+        get_search_backend().index(ids)
+
+
+@receiver(post_delete, sender=Announcement)
+def unindex_announcement(sender, instance, **kwargs):
+    from .search import get_search_backend
+    get_search_backend().remove([instance.id])
+
+
+def invalidate_announcement_responses(sender, raw=False, **kwargs):
+    if raw:
+        return
+    from .response_cache import bump_generation
+    bump_generation()
+
+
+# Anything rendered by AnnouncementSerializer invalidates cached responses.
+# PostView is left out on purpose: views_count may lag until entries expire.
+for _model in (Announcement, Pet, Location, Photo, Reaction, Comment, SavedAnnouncement):
+    post_save.connect(invalidate_announcement_responses, sender=_model, dispatch_uid=f'invalidate-responses-save-{_model.__name__}')
+    post_delete.connect(invalidate_announcement_responses, sender=_model, dispatch_uid=f'invalidate-responses-delete-{_model.__name__}')
+
+
+def touch_related_announcements(sender, instance, raw=False, created=False, **kwargs):
+    """
+    Move ``updated_at`` of the announcements rendering ``instance`` forward,
+    so it works as the validator for conditional GETs.
+    """
+    if raw or created and sender in (Pet, Location):
+        return
+    if sender is Pet:
+        queryset = Announcement.objects.filter(pet_id=instance.id)
+    elif sender is Location:
+        queryset = Announcement.objects.filter(location_id=instance.id)
+    elif getattr(instance, 'announcement_id', None):
+        queryset = Announcement.objects.filter(id=instance.announcement_id)
+    else:
+        return
+    queryset.update(updated_at=timezone.now())
+
+
+for _model in (Pet, Location, Photo, Reaction, Comment, SavedAnnouncement):
+    post_save.connect(touch_related_announcements, sender=_model, dispatch_uid=f'touch-announcements-save-{_model.__name__}')
+    post_delete.connect(touch_related_announcements, sender=_model, dispatch_uid=f'touch-announcements-delete-{_model.__name__}')
+
+
+@receiver(post_save, sender=Announcement)
+def sync_announcement_clusters(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    from .clusters import sync_announcement
+    sync_announcement(instance.id)
+
+
+@receiver(post_save, sender=Pet)
+@receiver(post_save, sender=Location)
+def sync_related_clusters(sender, instance, created, raw=False, **kwargs):
+    if raw or created:
+        return
+    from .clusters import sync_announcement
+    lookup = 'pet_id' if sender is Pet else 'location_id'
+    for ann_id in Announcement.objects.filter(**{lookup: instance.id}).values_list('id', flat=True):
+        sync_announcement(ann_id)
+
+
+@receiver(pre_delete, sender=Announcement)
+def remove_announcement_clusters(sender, instance, **kwargs):
+    from .clusters import remove_announcement
+    remove_announcement(instance.id)
+
+
+@receiver(post_save, sender=Reaction)
+def count_reaction(sender, instance, created, raw=False, **kwargs):
+    if raw or not created:
+        return
+    from .reactions import adjust_reaction_count
+    adjust_reaction_count(instance, 1)
+
+
+@receiver(post_delete, sender=Reaction)
+def uncount_reaction(sender, instance, **kwargs):
+    from .reactions import adjust_reaction_count
+    adjust_reaction_count(instance, -1)
+
+
+ANNOUNCEMENT_COUNTERS = {
+    PostView: 'views_count',
+    Comment: 'comments_count',
+    SavedAnnouncement: 'saves_count',
+}
+
+
+def count_announcement_child(sender, instance, created=True, raw=False, **kwargs):
+    """Move the Announcement counter for ``sender`` by one on insert or delete."""
+    if raw or not created:
+        return
+    field = ANNOUNCEMENT_COUNTERS[sender]
+    queryset = Announcement.objects.filter(id=instance.announcement_id)
+    if kwargs['signal'] is post_delete:
+        queryset.filter(**{f'{field}__gt': 0}).update(**{field: F(field) - 1})
+    else:
+        queryset.update(**{field: F(field) + 1})
+
+
+for _model in ANNOUNCEMENT_COUNTERS:
+    post_save.connect(count_announcement_child, sender=_model, dispatch_uid=f'count-announcement-save-{_model.__name__}')
+    post_delete.connect(count_announcement_child, sender=_model, dispatch_uid=f'count-announcement-delete-{_model.__name__}')
+
+
+TRENDING_EVENTS = {
+    PostView: 'view',
+    Comment: 'comment',
+    SavedAnnouncement: 'save',
+    Reaction: 'reaction',
+}
+
+
+def score_engagement(sender, instance, created=True, raw=False, **kwargs):
+    """Add or take back the trending contribution of an engagement row."""
+    if raw or not created or not instance.announcement_id:
+        return
+    from .trending import add_engagement, remove_engagement
+    kind = TRENDING_EVENTS[sender]
+    if kwargs['signal'] is post_delete:
+        remove_engagement(instance.announcement_id, kind, instance.created_at)
+    else:
+        add_engagement(instance.announcement_id, kind, at=instance.created_at)
+
+
+for _model in TRENDING_EVENTS:
+    post_save.connect(score_engagement, sender=_model, dispatch_uid=f'score-engagement-save-{_model.__name__}')
+    post_delete.connect(score_engagement, sender=_model, dispatch_uid=f'score-engagement-delete-{_model.__name__}')
+
+
+@receiver(post_save, sender=Announcement)
+def sync_announcement_feeds(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    if instance.is_reunited or not instance.is_active:
+        NearbyFeedEntry.objects.filter(announcement_id=instance.id).delete()
+        return
+    from .feeds import sync_announcement_feeds as sync
+    sync([instance.id])
+
+
+@receiver(post_save, sender=Location)
+def sync_location_feeds(sender, instance, created, raw=False, **kwargs):
+    if raw or created:
+        return
+    from .feeds import sync_announcement_feeds as sync
+    sync(Announcement.objects.filter(location_id=instance.id).values_list('id', flat=True))
+
+
+@receiver(post_save, sender=Announcement)
+def index_announcement_grams(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    from .trigrams import index_announcements
+    index_announcements([instance.id])
+
+
+@receiver(pre_delete, sender=Announcement)
+def unindex_announcement_grams(sender, instance, **kwargs):
+    from .trigrams import unindex_announcements
+    unindex_announcements([instance.id])
+
+
+@receiver(post_save, sender=Pet)
+def index_pet_grams(sender, instance, created, raw=False, **kwargs):
+    if raw or created:
+        return
+    from .trigrams import index_announcements
+    ids = list(instance.announcements.values_list('id', flat=True))
+    if ids:
+        index_announcements(ids)
+
+
+@receiver(post_save, sender=Profile)
+def rebuild_profile_feed(sender, instance, created, raw=False, **kwargs):
+    if raw or created:
+        return
+    from .feeds import rebuild_user_feed
+    rebuild_user_feed(instance.user_id)
+
+
+# fields whose change can move an announcement's match scores; saves that
+# leave them alone, like most of the ones touching updated_at, skip the rescore
+MATCH_FIELDS = {
+    Announcement: ('status', 'description', 'is_active', 'is_reunited', 'pet', 'location'),
+    Pet: ('pet_type', 'breed', 'color'),
+    Location: ('latitude', 'longitude'),
+}
+
+
+def _match_values(instance):
+    return tuple(getattr(instance, type(instance)._meta.get_field(name).attname) for name in MATCH_FIELDS[type(instance)])
+
+
+def remember_match_fields(sender, instance, raw=False, update_fields=None, **kwargs):
+    instance._match_values = None
+    if raw or instance._state.adding:
+        return
+    fields = MATCH_FIELDS[sender]
+    if update_fields is not None and not set(fields) & set(update_fields):
+        instance._match_values = _match_values(instance)
+        return
+    instance._match_values = sender.objects.filter(pk=instance.pk).values_list(*fields).first()
+
+
+def match_fields_changed(instance):
+    return getattr(instance, '_match_values', None) != _match_values(instance)
+
+
+for _model in MATCH_FIELDS:
+    pre_save.connect(remember_match_fields, sender=_model, dispatch_uid=f'remember-match-fields-{_model.__name__}')
+
+
+@receiver(post_save, sender=Announcement)
+def refresh_announcement_matches(sender, instance, created, raw=False, **kwargs):
+    if raw or not (created or match_fields_changed(instance)):
+        return
+    from .matches import request_match_refresh
+    request_match_refresh([instance.id])
+
+
+@receiver(post_save, sender=Pet)
+@receiver(post_save, sender=Location)
+def refresh_related_matches(sender, instance, created, raw=False, **kwargs):
+    if raw or created or not match_fields_changed(instance):
+        return
+    from .matches import request_match_refresh
+    lookup = 'pet_id' if sender is Pet else 'location_id'
+    ids = list(Announcement.objects.filter(**{lookup: instance.id}).values_list('id', flat=True))
+    if ids:
+        request_match_refresh(ids)
+
+
+@receiver(pre_delete, sender=Announcement)
+def remember_match_partners(sender, instance, **kwargs):
+    from .matches import match_partners
+    instance._match_partners = match_partners(instance.id)
+
+
+@receiver(post_delete, sender=Announcement)
+def refill_match_partners(sender, instance, **kwargs):
+    from .matches import refill_partners
+    refill_partners(getattr(instance, '_match_partners', ()))
+
+
+@receiver(setting_changed)
+def reset_search_backend_setting(sender, setting, **kwargs):
+    if setting == 'SEARCH_BACKEND':
+        from .search import reset_search_backend
+        reset_search_backend()
+
+
+@receiver(post_migrate)
+def reset_search_backend_after_migrate(sender, **kwargs):
+    # the FTS5 table may exist now
+    from .search import reset_search_backend
+    reset_search_backend()
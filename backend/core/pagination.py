@@ -0,0 +1,83 @@
+import base64
+import json
+from datetime import datetime
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+
+
+def encode_cursor(position):
+    raw = json.dumps(position, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        position = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (TypeError, ValueError):
+        raise NotFound('Invalid cursor')
+    if not isinstance(position, dict):
+        raise NotFound('Invalid cursor')
+    return position
+
+
+def get_page_size(request, default, maximum):
+    try:
+        size = int(request.query_params.get('page_size', default))
+    except (TypeError, ValueError):
+        return default
+    return max(1, min(size, maximum))
+
+
+class AnnouncementCursorPagination(BasePagination):
+    """
+    Keyset pagination over (created_at, id), newest first, or oldest first
+    with ``sort=oldest``.
+
+    The cursor holds the last row's position, so every page is an indexed
+    range scan no matter how deep the client has paged. The response is
+    {"next": <opaque cursor or null>, "results": [...]}; pass ``next`` back
+    as ``cursor`` to get the following page.
+    """
+    page_size = 50
+    max_page_size = 200
+    cursor_query_param = 'cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.page_size = get_page_size(request, self.page_size, self.max_page_size)
+        oldest = request.query_params.get('sort') == 'oldest'
+
+        cursor = request.query_params.get(self.cursor_query_param)
+        if cursor:
+            position = decode_cursor(cursor)
+            try:
+                created_at = datetime.fromisoformat(position['t'])
+                last_id = int(position['id'])
+            except (KeyError, TypeError, ValueError):
+                raise NotFound('Invalid cursor')
+            if oldest:
+                queryset = queryset.filter(
+                    Q(created_at__gt=created_at) | Q(created_at=created_at, id__gt=last_id)
+                )
+            else:
+                queryset = queryset.filter(
+                    Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=last_id)
+                )
+
+        # one extra row tells whether another page exists
+        ordering = ('created_at', 'id') if oldest else ('-created_at', '-id')
+        rows = list(queryset.order_by(*ordering)[:self.page_size + 1])
+        self.has_next = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+
+        self.next_cursor = None
+        if self.has_next:
+            last = rows[-1]
+            self.next_cursor = encode_cursor({'t': last.created_at.isoformat(), 'id': last.id})
+        return rows
+
+    def get_paginated_response(self, data):
+        return Response({'next': self.next_cursor, 'results': data})
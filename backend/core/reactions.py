@@ -0,0 +1,55 @@
+"""Denormalized reaction counters, one ReactionCount row per (target, kind)."""
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import F
+
+
+def _target(reaction):
+    if reaction.announcement_id:
+        return {'announcement_id': reaction.announcement_id}
+    if reaction.comment_id:
+        return {'comment_id': reaction.comment_id}
+    return None
+
+
+def adjust_reaction_count(reaction, delta):
+    from .models import ReactionCount
+
+    target = _target(reaction)
+    if target is None:
+        return
+    with transaction.atomic():
+        if delta > 0:
+            ReactionCount.objects.bulk_create(
+                [ReactionCount(kind=reaction.kind, count=0, **target)],
+                ignore_conflicts=True,
+            )
+        ReactionCount.objects.filter(kind=reaction.kind, **target).update(count=F('count') + delta)
+
+
+def reaction_counts(obj):
+    """
+    Return {kind: count} for an announcement or comment, from the prefetched
+    ``reaction_counts`` when available.
+    """
+    return {row.kind: row.count for row in obj.reaction_counts.all()}
+
+
+def rebuild_reaction_counts(Reaction, ReactionCount):
+    """Recompute every ReactionCount row from the Reaction table."""
+    counts = defaultdict(int)
+    rows = Reaction.objects.values_list('announcement_id', 'comment_id', 'kind')
+    for announcement_id, comment_id, kind in rows.iterator(chunk_size=5000):
+        if announcement_id:
+            counts[('announcement_id', announcement_id, kind)] += 1
+        elif comment_id:
+            counts[('comment_id', comment_id, kind)] += 1
+
+    with transaction.atomic():
+        ReactionCount.objects.all().delete()
+        ReactionCount.objects.bulk_create([
+            ReactionCount(kind=kind, count=count, **{field: target_id})
+            for (field, target_id, kind), count in counts.items()
+        ], batch_size=1000)
+    return sum(counts.values())
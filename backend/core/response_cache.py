@@ -0,0 +1,82 @@
+"""
+Response cache for anonymous announcement reads.
+
+Keys embed a generation number that is bumped whenever announcement data
+changes (see the signal receivers in models.py). Bumping makes every older
+entry unreachable at once, so invalidation needs no key scans and works with
+any Django cache backend; stale entries simply expire.
+"""
+import hashlib
+import time
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.http import parse_http_date_safe
+from rest_framework.response import Response
+
+from .conditional import apply_validators, not_modified_response, sorted_query_params
+
+GENERATION_KEY = 'announcement-responses:generation'
+KEY_PREFIX = 'announcement-responses'
+
+
+def _fresh_generation():
+    # seeded from the clock so a generation lost to cache eviction or a
+    # restart never comes back to a value older entries were stored under
+    return time.time_ns() // 1000
+
+
+def get_generation():
+    generation = cache.get(GENERATION_KEY)
+    if generation is None:
+        cache.add(GENERATION_KEY, _fresh_generation(), None)
+        generation = cache.get(GENERATION_KEY)
+    return generation
+
+
+def bump_generation():
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:
+        cache.add(GENERATION_KEY, _fresh_generation(), None)
+
+
+def response_cache_key(request):
+    params = sorted_query_params(request)
+    digest = hashlib.md5(f"{request.path}?{urlencode(params)}".encode()).hexdigest()
+    return f"{KEY_PREFIX}:{get_generation()}:{digest}"
+
+
+class AnonymousResponseCacheMixin:
+    """
+    Serve GETs from anonymous users out of the response cache, together with
+    the ETag / Last-Modified validators of the original response. Views can
+    override ``on_cache_hit`` for side effects that must still happen.
+    """
+
+    def get(self, request, *args, **kwargs):
+        if request.user.is_authenticated:
+            return super().get(request, *args, **kwargs)
+
+        key = response_cache_key(request)
+        entry = cache.get(key)
+        if entry is not None:
+            self.on_cache_hit(request, *args, **kwargs)
+            not_modified = not_modified_response(request, entry['etag'], entry['last_modified'])
+            if not_modified is not None:
+                return not_modified
+            return apply_validators(Response(entry['data']), entry['etag'], entry['last_modified'])
+
+        response = super().get(request, *args, **kwargs)
+        if response.status_code == 200:
+            entry = {
+                'data': response.data,
+                'etag': response.get('ETag'),
+                'last_modified': parse_http_date_safe(response.get('Last-Modified')),
+            }
+            cache.set(key, entry, getattr(settings, 'ANNOUNCEMENT_RESPONSE_CACHE_SECONDS', 300))
+        return response
+
+    def on_cache_hit(self, request, *args, **kwargs):
+        pass
@@ -0,0 +1,180 @@
+"""Full-text search over announcements: FTS5 ranked with bm25 on SQLite, icontains elsewhere."""
+import re
+import time
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+from django.utils.module_loading import import_string
+
+FTS_TABLE = 'core_announcement_fts'
+
+# bm25 weights, in FTS column order: pet name, breed, color, pet description,
+# announcement description
+FTS_WEIGHTS = (5.0, 3.0, 2.0, 1.0, 1.0)
+
+
+def search_terms(text):
+    return re.findall(r'\w+', (text or '').lower())
+
+
+class BaseSearchBackend:
+    def filter(self, queryset, text):
+        """Restrict an Announcement queryset to documents matching ``text``."""
+        raise NotImplementedError
+
+    def ranked_ids(self, queryset, text, after=None, limit=None):
+        """
+        Return (score, id) pairs from ``queryset`` matching ``text``, most
+        relevant first. Lower scores rank higher; ties go to newer ids.
+        ``after`` is the (score, id) pair a previous page ended on and
+        ``limit`` caps the number of pairs returned.
+        """
+        raise NotImplementedError
+
+    def _newest_ids(self, queryset, after, limit):
+        """Unscored (0.0, id) pairs of ``queryset``, newest first."""
+        if after is not None:
+            queryset = queryset.filter(id__lt=after[1])
+        ids = queryset.order_by('-id').values_list('id', flat=True)
+        return [(0.0, ann_id) for ann_id in (ids[:limit] if limit is not None else ids)]
+
+    def index(self, announcement_ids):
+        pass
+
+    def remove(self, announcement_ids):
+        pass
+
+    def rebuild(self):
+        pass
+
+
+class IcontainsSearchBackend(BaseSearchBackend):
+    """Unindexed fallback: every term must appear in one of the fields."""
+
+    fields = ('pet__name', 'pet__breed', 'pet__color', 'pet__description', 'description')
+
+    def filter(self, queryset, text):
+        for term in search_terms(text):
+            term_q = Q()
+            for field in self.fields:
+                term_q |= Q(**{f'{field}__icontains': term})
+            queryset = queryset.filter(term_q)
+        return queryset
+
+    def ranked_ids(self, queryset, text, after=None, limit=None):
+        return self._newest_ids(self.filter(queryset, text), after, limit)
+
+
+class Fts5SearchBackend(BaseSearchBackend):
+    def match_expression(self, text):
+        # every term is quoted so user input cannot inject FTS operators, and
+        # prefix-matched so "lab" finds "labrador"
+        return ' '.join(f'"{term}"*' for term in search_terms(text))
+
+    def filter(self, queryset, text):
+        expression = self.match_expression(text)
+        if not expression:
+            return queryset
+        return queryset.filter(id__in=RawSQL(
+            f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s',
+            [expression],
+        ))
+
+    def ranked_ids(self, queryset, text, after=None, limit=None):
+        expression = self.match_expression(text)
+        if not expression:
+            return self._newest_ids(queryset, after, limit)
+
+        # the filters, the cursor and the page size all apply in SQL, so
+        # only the page's rows come back however many documents match
+        weights = ', '.join(str(w) for w in FTS_WEIGHTS)
+        allowed_sql, allowed_params = queryset.order_by().values('id').query.sql_with_params()
+        sql = (
+            f'SELECT score, rowid FROM ('
+            f'SELECT bm25({FTS_TABLE}, {weights}) AS score, rowid FROM {FTS_TABLE} '
+            f'WHERE {FTS_TABLE} MATCH %s'
+            f') WHERE rowid IN ({allowed_sql})'
+        )
+        params = [expression, *allowed_params]
+        if after is not None:
+            sql += ' AND (score > %s OR (score = %s AND rowid < %s))'
+            params += [after[0], after[0], after[1]]
+        sql += ' ORDER BY score, rowid DESC'
+        if limit is not None:
+            sql += ' LIMIT %s'
+            params.append(limit)
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return cursor.fetchall()
+
+    def index(self, announcement_ids):
+        from .models import Announcement
+
+        announcement_ids = list(announcement_ids)
+        rows = Announcement.objects.filter(id__in=announcement_ids).values_list(
+            'id', 'pet__name', 'pet__breed', 'pet__color', 'pet__description', 'description',
+        )
+        with connection.cursor() as cursor:
+            self._delete(cursor, announcement_ids)
+            cursor.executemany(
+                f'INSERT INTO {FTS_TABLE} (rowid, pet_name, breed, color, pet_description, description) '
+                f'VALUES (%s, %s, %s, %s, %s, %s)',
+                [(row[0], *(value or '' for value in row[1:])) for row in rows],
+            )
+
+    def remove(self, announcement_ids):
+        with connection.cursor() as cursor:
+            self._delete(cursor, list(announcement_ids))
+
+    def rebuild(self):
+        from .models import Announcement
+
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE}')
+        ids = list(Announcement.objects.values_list('id', flat=True))
+        for start in range(0, len(ids), 500):
+            self.index(ids[start:start + 500])
+
+    def _delete(self, cursor, announcement_ids):
+        for start in range(0, len(announcement_ids), 500):
+            chunk = announcement_ids[start:start + 500]
+            placeholders = ', '.join(['%s'] * len(chunk))
+            cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid IN ({placeholders})', chunk)
+
+
+def fts5_available():
+    return connection.vendor == 'sqlite' and FTS_TABLE in connection.introspection.table_names()
+
+
+_backend = None
+_fallback_checked_at = None
+# how often a process that fell back to icontains looks for the FTS5 table
+# again, e.g. when it started before migration 0028 ran elsewhere
+FTS_RECHECK_SECONDS = 60
+
+
+def get_search_backend():
+    global _backend, _fallback_checked_at
+    if _backend is not None and _fallback_checked_at is not None:
+        if time.monotonic() - _fallback_checked_at >= FTS_RECHECK_SECONDS:
+            _backend = None
+    if _backend is None:
+        _fallback_checked_at = None
+        path = getattr(settings, 'SEARCH_BACKEND', None)
+        if path:
+            _backend = import_string(path)()
+        elif fts5_available():
+            _backend = Fts5SearchBackend()
+        else:
+            _backend = IcontainsSearchBackend()
+            _fallback_checked_at = time.monotonic()
+    return _backend
+
+
+def reset_search_backend():
+    """Forget the chosen backend, so the next get_search_backend() picks again."""
+    global _backend, _fallback_checked_at
+    _backend = None
+    _fallback_checked_at = None
@@ -9,15 +9,109 @@ from .models import (
     Photo,
 )
 from .models import Reaction
+from .reactions import reaction_counts
 from django.contrib.auth.models import User
 from .utils import get_coordinates
 
+# Named projections for the ``view`` query parameter; dotted names select
+# sub-fields of nested serializers. ``full`` means every field.
+ANNOUNCEMENT_VIEWS = {
+    'pin': [
+        'id', 'status',
+        'pet.name', 'pet.pet_type',
+        'location.latitude', 'location.longitude',
+    ],
+    'card': [
+        'id', 'status', 'description', 'created_at', 'is_active', 'is_reunited',
+        'is_saved', 'distance_m',
+        'pet.name', 'pet.pet_type', 'pet.breed', 'pet.color', 'pet.gender', 'pet.photo',
+        'location.address', 'location.latitude', 'location.longitude',
+    ],
+    'full': None,
+}
+
+
+def requested_fields(params):
+    """
+    Return the announcement fields asked for with ``fields=a,b,pet.name`` or
+    ``view=card|pin|full``, or None when everything should be serialized.
+    """
+    fields = params.get('fields')
+    if fields:
+        return [name.strip() for name in fields.split(',') if name.strip()]
+    return ANNOUNCEMENT_VIEWS.get(params.get('view'))
+
+
+def field_selection(requested):
+    """
+    Group requested field names by top-level field: name -> list of nested
+    sub-fields, or None when the field is wanted whole.
+    """
+    selection = {}
+    for name in requested:
+        head, _, rest = name.partition('.')
+        if not rest or selection.get(head, []) is None:
+            selection[head] = None
+        else:
+            selection.setdefault(head, []).append(rest)
+    return selection
+
+
+def user_announcement_state(user, ids, saved_ids=None):
+    """
+    AnnouncementSerializer context with ``user``'s saves and reactions on
+    announcements ``ids``, read in one query each instead of once per
+    announcement. Callers that already know the saved ids can pass them.
+    """
+    if not user.is_authenticated:
+        return {}
+    if saved_ids is None:
+        saved_ids = set(SavedAnnouncement.objects.filter(
+            user=user, announcement_id__in=ids,
+        ).values_list('announcement_id', flat=True))
+    user_reactions = {}
+    # the serializer shows the oldest of the user's reactions, as .first() did
+    for announcement_id, kind in Reaction.objects.filter(
+        user=user, announcement_id__in=ids,
+    ).order_by('id').values_list('announcement_id', 'kind'):
+        user_reactions.setdefault(announcement_id, kind)
+    return {'saved_ids': saved_ids, 'user_reactions': user_reactions}
+
+
+class SparseFieldsMixin:
+    """
+    Serializer mixin accepting ``fields=[...]`` to keep only those fields.
+    Dropped fields are removed before serialization, so their
+    SerializerMethodField getters never run.
+    """
+
+    def __init__(self, *args, **kwargs):
+        requested = kwargs.pop('fields', None)
+        super().__init__(*args, **kwargs)
+        if requested is None:
+            return
+
+        selection = field_selection(requested)
+        for name in list(self.fields):
+            if name not in selection:
+                self.fields.pop(name)
+                continue
+            field = self.fields[name]
+            if selection[name] and isinstance(field, SparseFieldsMixin):
+                nested = field.__class__(*field._args, fields=selection[name], **field._kwargs)
+                if nested.fields:
+                    self.fields[name] = nested
+                else:
+                    # none of the requested sub-fields exist
+                    self.fields.pop(name)
+
+
 class UserSerializer(serializers.ModelSerializer):
     class Meta:
         model = User
         fields = ['id', 'username', 'first_name', 'last_name', 'email']
 
-class PetSerializer(serializers.ModelSerializer):
+class PetSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     photo = serializers.SerializerMethodField()
 
     class Meta:
@@ -35,14 +129,15 @@ class PetSerializer(serializers.ModelSerializer):
 
         return obj.photo.url
 
-class LocationSerializer(serializers.ModelSerializer):
+class LocationSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     latitude = serializers.FloatField(required=False)
     longitude = serializers.FloatField(required=False)
     search_radius = serializers.FloatField(required=False, allow_null=True)
 
     class Meta:
         model = Location
-        fields = '__all__'
+        # geohash is an index column for radius lookups, not part of the API
+        exclude = ['geohash']
 class PhotoSerializer(serializers.ModelSerializer):
     file = serializers.SerializerMethodField()
 
@@ -59,16 +154,15 @@ class PhotoSerializer(serializers.ModelSerializer):
         return obj.file.url
 
 
-class AnnouncementSerializer(serializers.ModelSerializer):
+class AnnouncementSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     pet = PetSerializer()
     photos = PhotoSerializer(many=True, read_only=True)
 
     location = LocationSerializer()
     owner = serializers.PrimaryKeyRelatedField(read_only=True)
-    views_count = serializers.SerializerMethodField()
     is_saved = serializers.SerializerMethodField()
-    comments_count = serializers.SerializerMethodField()
     reactions = serializers.SerializerMethodField()
+    distance_m = serializers.SerializerMethodField()
 
     phone_number = serializers.SerializerMethodField()
 
@@ -105,7 +199,9 @@ class AnnouncementSerializer(serializers.ModelSerializer):
             'views_count',
             'is_saved',
             'comments_count',
+            'saves_count',
             'reactions',
+            'distance_m',
         ]
 
     def create(self, validated_data):
@@ -251,48 +347,46 @@ class AnnouncementSerializer(serializers.ModelSerializer):
         instance.save()
         return instance
 
-    def get_views_count(self, obj):
-        annotated = getattr(obj, "views_count_annotated", None)
-        if annotated is not None:
-            return annotated
-        return obj.post_views.count()
-
     def get_is_saved(self, obj):
         request = self.context.get("request")
         if not request or not request.user.is_authenticated:
             return False
+        saved_ids = self.context.get("saved_ids")
+        if saved_ids is not None:
+            return obj.id in saved_ids
         return SavedAnnouncement.objects.filter(
             user=request.user,
             announcement=obj,
         ).exists()
 
-    def get_comments_count(self, obj):
-        annotated = getattr(obj, "comments_count_annotated", None)
-        if annotated is not None:
-            return annotated
-        return obj.comments.count()
+    def get_distance_m(self, obj):
+        distance = getattr(obj, 'distance_m', None)
+        if distance is None:
+            return None
+        return round(distance, 1)
 
     def get_reactions(self, obj):
         request = self.context.get('request')
-        qs = getattr(obj, 'reactions', None)
-        if qs is None:
-            qs = Reaction.objects.filter(announcement=obj)
+        counts = reaction_counts(obj)
 
         kinds = []
         for kind, label in Reaction.KIND_CHOICES:
-            count = qs.filter(kind=kind).count()
             kinds.append({
                 'kind': kind,
                 'label': label,
                 'icon': Reaction.ICONS.get(kind, ''),
-                'count': count,
+                'count': counts.get(kind, 0),
             })
 
         user_reaction = None
         if request and request.user.is_authenticated:
-            r = qs.filter(user=request.user).first()
-            if r:
-                user_reaction = r.kind
+            user_reactions = self.context.get('user_reactions')
+            if user_reactions is not None:
+                user_reaction = user_reactions.get(obj.id)
+            else:
+                r = obj.reactions.filter(user=request.user).first()
+                if r:
+                    user_reaction = r.kind
 
         return {'kinds': kinds, 'user_reaction': user_reaction}
 
@@ -337,16 +431,19 @@ class CommentSerializer(serializers.ModelSerializer):
             return []
 
     def get_reactions(self, obj):
-        qs = Reaction.objects.filter(comment=obj)
+        stored = reaction_counts(obj)
         counts = {}
         for kind, label in Reaction.KIND_CHOICES:
-            c = qs.filter(kind=kind).count()
-            counts[kind] = { 'label': label, 'icon': Reaction.ICONS.get(kind, ''), 'count': c }
+            counts[kind] = { 'label': label, 'icon': Reaction.ICONS.get(kind, ''), 'count': stored.get(kind, 0) }
 
         request = self.context.get('request')
         user_reactions = []
         if request and request.user.is_authenticated:
-            user_reactions = list(qs.filter(user=request.user).values_list('kind', flat=True))
+            viewer_reactions = getattr(obj, 'viewer_reactions', None)
+            if viewer_reactions is not None:
+                user_reactions = [r.kind for r in viewer_reactions]
+            else:
+                user_reactions = list(obj.reactions.filter(user=request.user).values_list('kind', flat=True))
 
         return { 'counts': counts, 'user_reaction': user_reactions }
 
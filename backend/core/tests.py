@@ -1,2 +1,130 @@
-from django.test import TestCase
+import random
+from datetime import timedelta
 
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from .models import Announcement, Location, Pet, Photo, Reaction, SavedAnnouncement
+from .scoring import candidate_features, rank_candidates
+from .utils import find_matches_for_announcement, match_candidate_ids
+
+
+def create_announcement(owner, index, status='lost'):
+    pet = Pet.objects.create(name=f'Pet {index}', pet_type='dog', breed='husky', color='black')
+    location = Location.objects.create(latitude=50.0 + index / 1000, longitude=30.0)
+    return Announcement.objects.create(pet=pet, owner=owner, location=location, status=status, description='Seen near the park')
+
+
+@override_settings(POST_VIEW_BUFFER_ENABLED=False)
+class AnnouncementQueryCountTests(TestCase):
+    """
+    Serializing a page costs the same number of queries whatever its size:
+    saves, reactions, photos and relations are read once per page.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('reader', password='secret')
+        cls.owner = User.objects.create_user('owner', password='secret')
+        cls.announcements = [create_announcement(cls.owner, i) for i in range(20)]
+        cls.mine = [create_announcement(cls.user, 100 + i, status='found') for i in range(20)]
+        for ann in cls.announcements + cls.mine:
+            Photo.objects.create(announcement=ann, file='photos/a.jpg')
+            Reaction.objects.create(user=cls.user, announcement=ann, kind=Reaction.KIND_LIKE)
+            Reaction.objects.create(user=cls.owner, announcement=ann, kind=Reaction.KIND_SAD)
+            SavedAnnouncement.objects.create(user=cls.user, announcement=ann)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def assertConstantQueries(self, num, urls):
+        for url in urls:
+            with self.subTest(url=url), self.assertNumQueries(num):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+
+    def test_list(self):
+        self.assertConstantQueries(7, [
+            '/api/announcements/?page_size=2',
+            '/api/announcements/?page_size=20',
+        ])
+
+    def test_detail(self):
+        # one announcement with little attached and one with much more
+        busy = self.announcements[0]
+        for i in range(10):
+            Photo.objects.create(announcement=busy, file=f'photos/{i}.jpg')
+        for kind, _ in Reaction.KIND_CHOICES[2:]:
+            Reaction.objects.create(user=self.user, announcement=busy, kind=kind)
+        self.assertConstantQueries(11, [
+            f'/api/announcements/{self.announcements[1].id}/',
+            f'/api/announcements/{busy.id}/',
+        ])
+
+    def test_saved(self):
+        SavedAnnouncement.objects.filter(user=self.user).exclude(
+            announcement__in=self.announcements[:2],
+        ).delete()
+        self.assertConstantQueries(4, ['/api/users/me/saved/'])
+        for ann in self.announcements[2:]:
+            SavedAnnouncement.objects.create(user=self.user, announcement=ann)
+        self.assertConstantQueries(4, ['/api/users/me/saved/'])
+
+    def test_my_announcements(self):
+        Announcement.objects.filter(id__in=[ann.id for ann in self.mine[2:]]).update(owner=self.owner)
+        self.assertConstantQueries(5, ['/api/announcements/me/'])
+        Announcement.objects.filter(id__in=[ann.id for ann in self.mine[2:]]).update(owner=self.user)
+        self.assertConstantQueries(5, ['/api/announcements/me/'])
+
+
+class MatchCandidateTests(TestCase):
+    """
+    The candidate pre-filter gives the same matches as scoring every row of
+    the other status.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        rng = random.Random(7)
+        owner = User.objects.create_user('owner', password='secret')
+        now = timezone.now()
+        for i in range(80):
+            pet_type = rng.choice(['dog', 'cat', ''])
+            pet = Pet.objects.create(
+                name=f'Pet {i}', pet_type=pet_type,
+                breed=rng.choice(['husky', 'labrador', 'siamese', 'husky mix', '']),
+                color=rng.choice(['black', 'white', 'black and white', '']),
+            )
+            # about half of them within the distance cutoff of each other
+            location = Location.objects.create(latitude=50.0 + rng.uniform(-0.2, 0.2), longitude=30.0 + rng.uniform(-0.2, 0.2))
+            ann = Announcement.objects.create(
+                pet=pet, owner=owner, location=location, status=rng.choice(['lost', 'found']),
+                description=rng.choice(['Seen near the park', 'Lost near the river at night', 'Friendly, red collar', '']),
+            )
+            Announcement.objects.filter(id=ann.id).update(created_at=now - timedelta(days=rng.uniform(0, 90)))
+        cls.announcements = list(Announcement.objects.select_related('pet', 'location').order_by('id'))
+
+    def candidates(self, announcement):
+        status = 'lost' if announcement.status == 'found' else 'found'
+        return Announcement.objects.filter(status=status).exclude(id=announcement.id)
+
+    def test_top_matches_equal_scoring_everything(self):
+        for announcement in self.announcements:
+            candidates = self.candidates(announcement)
+            everything = candidate_features(candidates, candidates.values_list('id', flat=True))
+            for limit in (1, 3, 10):
+                with self.subTest(announcement=announcement.id, limit=limit):
+                    expected = rank_candidates(announcement, everything, 0.25, limit)
+                    found = find_matches_for_announcement(announcement, threshold=0.25, limit=limit)
+                    self.assertEqual([(c.id, score) for c, score in found], expected)
+
+    def test_candidates_cover_every_match(self):
+        for announcement in self.announcements:
+            candidates = self.candidates(announcement)
+            everything = candidate_features(candidates, candidates.values_list('id', flat=True))
+            expected = {ann_id for ann_id, _ in rank_candidates(announcement, everything, 0.25, None)}
+            with self.subTest(announcement=announcement.id):
+                self.assertLessEqual(expected, match_candidate_ids(announcement, candidates, 0.25))
@@ -0,0 +1,106 @@
+"""Time-decayed trending score for announcements, stored in log space."""
+import math
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.db.models import F, FloatField, Value
+from django.db.models.functions import Exp, Greatest, Least, Ln
+from django.utils import timezone
+
+TRENDING_EPOCH = datetime(2024, 1, 1, tzinfo=dt_timezone.utc)
+
+# changing these or the half-life invalidates stored scores; run
+# manage.py rebuild_trending_scores afterwards
+TRENDING_WEIGHTS = {
+    'post': 3.0,
+    'view': 1.0,
+    'reaction': 2.0,
+    'comment': 3.0,
+    'save': 4.0,
+}
+
+# keeps log(1 - x) finite when removing an event leaves (almost) nothing
+_MIN_REMAINDER = 1e-12
+
+
+def _tau_seconds():
+    return getattr(settings, 'TRENDING_HALF_LIFE_HOURS', 24) * 3600 / math.log(2)
+
+
+def event_score(weight, at=None):
+    """
+    Log-space contribution of an event of ``weight`` happening at ``at``,
+    undecayed and measured against TRENDING_EPOCH. Decay shifts every score
+    by the same amount, so stored scores order like decayed ones.
+    """
+    at = at or timezone.now()
+    return math.log(weight) + (at - TRENDING_EPOCH).total_seconds() / _tau_seconds()
+
+
+def initial_trending_score():
+    """Score of a new announcement: its own post event, happening now."""
+    return event_score(TRENDING_WEIGHTS['post'])
+
+
+def _logaddexp(a, b):
+    high, low = max(a, b), min(a, b)
+    return high + math.log1p(math.exp(low - high))
+
+
+def add_engagement(announcement_id, kind, count=1, at=None):
+    """Add ``count`` events of ``kind`` to the announcement's score atomically."""
+    from .models import Announcement
+
+    if count <= 0:
+        return
+    event = Value(event_score(TRENDING_WEIGHTS[kind] * count, at), output_field=FloatField())
+    high = Greatest(F('trending_score'), event)
+    low = Least(F('trending_score'), event)
+    Announcement.objects.filter(id=announcement_id).update(
+        trending_score=high + Ln(Value(1.0) + Exp(low - high)),
+    )
+
+
+def remove_engagement(announcement_id, kind, at):
+    """Take back an event recorded at ``at``, e.g. an unsave or a removed reaction."""
+    from .models import Announcement
+
+    event = Value(event_score(TRENDING_WEIGHTS[kind], at), output_field=FloatField())
+    remainder = Greatest(Value(1.0) - Exp(event - F('trending_score')), Value(_MIN_REMAINDER))
+    Announcement.objects.filter(id=announcement_id).update(
+        trending_score=F('trending_score') + Ln(remainder),
+    )
+
+
+def rebuild_trending_scores(Announcement, PostView, SavedAnnouncement, Reaction, Comment, AnonymousViewSketch=None):
+    """
+    Recompute every trending score from the stored events and return the
+    number of announcements written. Sketched anonymous views carry no
+    timestamps and are counted as of the announcement's creation.
+    """
+    scores = {}
+    created = {}
+    for ann_id, created_at in Announcement.objects.values_list('id', 'created_at').iterator():
+        scores[ann_id] = event_score(TRENDING_WEIGHTS['post'], created_at)
+        created[ann_id] = created_at
+
+    def add(kind, rows):
+        weight = TRENDING_WEIGHTS[kind]
+        for ann_id, at in rows.iterator():
+            if ann_id in scores:
+                scores[ann_id] = _logaddexp(scores[ann_id], event_score(weight, at))
+
+    add('view', PostView.objects.values_list('announcement_id', 'created_at'))
+    add('save', SavedAnnouncement.objects.values_list('announcement_id', 'created_at'))
+    add('comment', Comment.objects.values_list('announcement_id', 'created_at'))
+    add('reaction', Reaction.objects.filter(announcement__isnull=False).values_list('announcement_id', 'created_at'))
+    if AnonymousViewSketch is not None:
+        for ann_id, estimate in AnonymousViewSketch.objects.filter(estimate__gt=0).values_list('announcement_id', 'estimate'):
+            if ann_id in scores:
+                scores[ann_id] = _logaddexp(
+                    scores[ann_id], event_score(TRENDING_WEIGHTS['view'] * estimate, created[ann_id]),
+                )
+
+    rows = [Announcement(id=ann_id, trending_score=score) for ann_id, score in scores.items()]
+    Announcement.objects.bulk_update(rows, ['trending_score'], batch_size=500)
+    return len(rows)
@@ -0,0 +1,242 @@
+"""Character trigram index (TextGram) over announcement breed and description text."""
+import math
+import re
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import Count, F, Q
+
+GRAM_FIELDS = ('breed', 'description')
+GRAM_CHUNK_SIZE = 500
+
+
+def trigrams(text):
+    # words padded as pg_trgm does, two spaces in front and one behind
+    grams = set()
+    for word in re.findall(r'\w+', (text or '').lower()):
+        padded = f'  {word} '
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def jaccard(shared, size_a, size_b):
+    if not shared:
+        return 0.0
+    return shared / (size_a + size_b - shared)
+
+
+def _gram_rows(TextGram, rows):
+    for ann_id, breed, description in rows:
+        for field, text in zip(GRAM_FIELDS, (breed, description)):
+            for gram in trigrams(text):
+                yield TextGram(announcement_id=ann_id, field=field, gram=gram)
+
+
+def _count_documents(GramStat, added, removed):
+    """
+    Move the GramStat document counts by the (field, gram) pairs in
+    ``added`` and ``removed``, one pair per announcement gaining or losing
+    the gram.
+    """
+    delta = Counter(added)
+    delta.subtract(removed)
+    by_delta = {}
+    for (field, gram), change in delta.items():
+        if change:
+            by_delta.setdefault((field, change), []).append(gram)
+    if not by_delta:
+        return
+    with transaction.atomic():
+        GramStat.objects.bulk_create(
+            [GramStat(field=field, gram=gram, documents=0)
+             for (field, change), grams in by_delta.items() if change > 0 for gram in grams],
+            batch_size=1000, ignore_conflicts=True,
+        )
+        for (field, change), grams in by_delta.items():
+            for start in range(0, len(grams), GRAM_CHUNK_SIZE):
+                stats = GramStat.objects.filter(field=field, gram__in=grams[start:start + GRAM_CHUNK_SIZE])
+                stats.update(documents=F('documents') + change)
+                if change < 0:
+                    stats.filter(documents__lte=0).delete()
+
+
+def index_announcements(announcement_ids):
+    """Bring the stored grams of ``announcement_ids`` in line with their text."""
+    from .models import Announcement, GramStat, TextGram
+
+    announcement_ids = list(announcement_ids)
+    for start in range(0, len(announcement_ids), GRAM_CHUNK_SIZE):
+        chunk = announcement_ids[start:start + GRAM_CHUNK_SIZE]
+        rows = Announcement.objects.filter(id__in=chunk).values_list('id', 'pet__breed', 'description')
+        wanted = {(gram.announcement_id, gram.field, gram.gram): gram for gram in _gram_rows(TextGram, rows)}
+        existing = {
+            (ann_id, field, gram): gram_id
+            for gram_id, ann_id, field, gram in TextGram.objects.filter(
+                announcement_id__in=chunk,
+            ).values_list('id', 'announcement_id', 'field', 'gram')
+        }
+        stale = {key: gram_id for key, gram_id in existing.items() if key not in wanted}
+        missing = {key: gram for key, gram in wanted.items() if key not in existing}
+        stale_ids = list(stale.values())
+        with transaction.atomic():
+            for offset in range(0, len(stale_ids), GRAM_CHUNK_SIZE):
+                TextGram.objects.filter(id__in=stale_ids[offset:offset + GRAM_CHUNK_SIZE]).delete()
+            TextGram.objects.bulk_create(missing.values(), batch_size=1000, ignore_conflicts=True)
+            _count_documents(
+                GramStat,
+                ((field, gram) for _, field, gram in missing),
+                ((field, gram) for _, field, gram in stale),
+            )
+
+
+def unindex_announcements(announcement_ids):
+    """Drop the stored grams of ``announcement_ids``, e.g. before they are deleted."""
+    from .models import GramStat, TextGram
+
+    grams = TextGram.objects.filter(announcement_id__in=list(announcement_ids))
+    removed = list(grams.values_list('field', 'gram'))
+    if not removed:
+        return
+    with transaction.atomic():
+        grams.delete()
+        _count_documents(GramStat, (), removed)
+
+
+def rebuild_gram_stats(TextGram, GramStat):
+    """Recount the documents of every gram from the stored grams."""
+    GramStat.objects.all().delete()
+    counts = TextGram.objects.order_by().values_list('field', 'gram').annotate(n=Count('id'))
+    GramStat.objects.bulk_create(
+        (GramStat(field=field, gram=gram, documents=n) for field, gram, n in counts.iterator()),
+        batch_size=1000,
+    )
+
+
+def rebuild_text_grams(Announcement, TextGram, GramStat=None):
+    """
+    Rebuild the whole gram index and return the number of grams stored.
+    Given the GramStat model, the document counts are recomputed too.
+    """
+    TextGram.objects.all().delete()
+    rows = Announcement.objects.values_list('id', 'pet__breed', 'description').iterator(chunk_size=GRAM_CHUNK_SIZE)
+    stored = 0
+    batch = []
+    for gram in _gram_rows(TextGram, rows):
+        batch.append(gram)
+        if len(batch) >= 1000:
+            stored += len(TextGram.objects.bulk_create(batch))
+            batch = []
+    stored += len(TextGram.objects.bulk_create(batch))
+    if GramStat is not None:
+        rebuild_gram_stats(TextGram, GramStat)
+    return stored
+
+
+def gram_postings(TextGram, announcement_ids):
+    """
+    In-memory postings of the announcements ``announcement_ids``, for
+    scoring many texts against the same set. Returns {field: (postings,
+    totals)}: postings maps each gram to the positions, in sorted id order,
+    of the announcements having it, and totals holds each one's gram count.
+    """
+    import numpy as np
+
+    announcement_ids = sorted(announcement_ids)
+    position = {ann_id: i for i, ann_id in enumerate(announcement_ids)}
+    index = {}
+    for field in GRAM_FIELDS:
+        postings = {}
+        totals = np.zeros(len(announcement_ids), dtype=np.int64)
+        for start in range(0, len(announcement_ids), GRAM_CHUNK_SIZE):
+            rows = TextGram.objects.filter(
+                field=field,
+                announcement_id__in=announcement_ids[start:start + GRAM_CHUNK_SIZE],
+            ).values_list('gram', 'announcement_id')
+            for gram, ann_id in rows:
+                postings.setdefault(gram, []).append(position[ann_id])
+        postings = {gram: np.array(positions, dtype=np.int64) for gram, positions in postings.items()}
+        for positions in postings.values():
+            totals[positions] += 1
+        index[field] = (postings, totals)
+    return index
+
+
+def postings_similarities(index, field, text):
+    """Jaccard similarity of ``text`` to ``field`` of every announcement in a gram_postings() index."""
+    import numpy as np
+
+    postings, totals = index[field]
+    grams = trigrams(text)
+    hits = [postings[gram] for gram in grams if gram in postings]
+    if not hits:
+        return np.zeros(len(totals))
+    shared = np.bincount(np.concatenate(hits), minlength=len(totals))
+    # same division as jaccard(): shared / (|A| + |B| - shared)
+    return np.where(shared > 0, shared / np.maximum(len(grams) + totals - shared, 1), 0.0)
+
+
+def similarities(texts, announcement_ids):
+    """
+    Jaccard similarity of each text in ``texts`` ({field: text}) to the same
+    field of every announcement in ``announcement_ids``. Returns
+    {field: {announcement_id: similarity}}; announcements sharing no gram
+    with the text are left out, their similarity is 0.
+    """
+    from .models import TextGram
+
+    query_grams = {field: trigrams(text) for field, text in texts.items()}
+    results = {field: {} for field in texts}
+    shared_q = Q()
+    for field, grams in query_grams.items():
+        if grams:
+            shared_q |= Q(field=field, gram__in=grams)
+    if not shared_q:
+        return results
+
+    announcement_ids = list(announcement_ids)
+    for start in range(0, len(announcement_ids), GRAM_CHUNK_SIZE):
+        rows = TextGram.objects.filter(
+            field__in=[field for field, grams in query_grams.items() if grams],
+            announcement_id__in=announcement_ids[start:start + GRAM_CHUNK_SIZE],
+        ).values('announcement_id', 'field').annotate(
+            total=Count('id'),
+            shared=Count('id', filter=shared_q),
+        ).filter(shared__gt=0)
+        for row in rows:
+            field = row['field']
+            results[field][row['announcement_id']] = jaccard(row['shared'], len(query_grams[field]), row['total'])
+    return results
+
+
+def similar_announcements(field, text, min_similarity=0.0, queryset=None, limit=None):
+    """
+    (similarity, id) pairs of announcements, optionally within
+    ``queryset``, whose ``field`` shares grams with ``text`` and reaches
+    ``min_similarity``; most similar first, ties by id, at most ``limit``.
+    """
+    from .models import GramStat, TextGram
+
+    grams = trigrams(text)
+    if not grams:
+        return []
+
+    # J(A, B) >= t needs |A & B| >= t * |A|, so a hit has at least one of
+    # any len(A) - ceil(t * |A|) + 1 of the query's grams: reading the
+    # postings of that many of the rarest grams finds every hit
+    min_shared = max(1, math.ceil(min_similarity * len(grams) - 1e-9))
+    if min_shared > len(grams):
+        return []
+    frequency = dict(GramStat.objects.filter(field=field, gram__in=grams).values_list('gram', 'documents'))
+    prefix = sorted(grams, key=lambda gram: (frequency.get(gram, 0), gram))[:len(grams) - min_shared + 1]
+
+    probe = TextGram.objects.filter(field=field, gram__in=prefix)
+    if queryset is not None:
+        probe = probe.filter(announcement__in=queryset)
+    candidate_ids = set(probe.values_list('announcement_id', flat=True))
+
+    scores = similarities({field: text}, candidate_ids)[field]
+    hits = sorted(
+        ((similarity, ann_id) for ann_id, similarity in scores.items() if similarity >= min_similarity),
+        key=lambda hit: (-hit[0], hit[1]),
+    )
+    return hits[:limit] if limit is not None else hits
@@ -7,8 +7,15 @@ from . import chat_views
 
 urlpatterns = [
     path('announcements/', AnnouncementList.as_view(), name='announcement-list'),
+    path('announcements/facets/', views.announcement_facets, name='announcement-facets'),
+    path('announcements/clusters/', views.announcement_clusters, name='announcement-clusters'),
+    path('announcements/markers/', views.announcement_markers, name='announcement-markers'),
+    path('announcements/batch/', views.announcement_batch, name='announcement-batch'),
+    path('announcements/export/', views.announcement_export, name='announcement-export'),
     path('announcements/<int:pk>/', AnnouncementDetail.as_view(), name='announcement-detail'),
+    path('announcements/<int:announcement_id>/matches/', views.announcement_matches, name='announcement-matches'),
         path('users/<int:user_id>/', views.public_user, name='public-user'),
+        path('users/<int:user_id>/archive/', views.user_archived_announcements, name='user-archived-announcements'),
         path('announcements/<int:announcement_id>/comments/', views.AnnouncementCommentList.as_view(), name='announcement-comments'),
         path('comments/<int:pk>/', views.CommentDetail.as_view(), name='comment-detail'),
         path('announcements/<int:announcement_id>/reactions/', views.toggle_reaction, name='announcement-reactions'),
@@ -27,6 +34,7 @@ path("chat/start_direct/", chat_views.start_direct_conversation, name="chat-star
 path("chat/messages/", chat_views.send_message_http, name="chat-send-message"),
 path("announcements/<int:announcement_id>/save/", views.toggle_save_announcement, name="announcement-save"),
 path("users/me/saved/", views.my_saved_announcements, name="my-saved-announcements"),
+path("users/me/feed/", views.my_nearby_feed, name="my-nearby-feed"),
 path("notifications/", views.notifications_list, name="notifications-list"),
 path("notifications/read/", views.notifications_read, name="notifications-read"),
 
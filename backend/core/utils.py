@@ -13,6 +13,29 @@ def get_coordinates(address):
     return None, None
 
 
+def cached_coordinates(address):
+    """
+    get_coordinates() behind the Django cache, keyed by the normalized
+    address. Failed lookups are cached too so a bad address in a feed is
+    only sent to Nominatim once.
+    """
+    import hashlib
+
+    from django.conf import settings
+    from django.core.cache import cache
+
+    normalized = ' '.join((address or '').lower().split())
+    if not normalized:
+        return None, None
+    key = f"geocode:{hashlib.md5(normalized.encode()).hexdigest()}"
+    cached = cache.get(key)
+    if cached is not None:
+        return tuple(cached)
+    coordinates = get_coordinates(address)
+    cache.set(key, list(coordinates), getattr(settings, 'GEOCODE_CACHE_SECONDS', 7 * 24 * 3600))
+    return coordinates
+
+
 def check_and_assign_badges(user):
     """
     Evaluate badge criteria for the given user and assign any missing badges.
@@ -22,6 +45,7 @@ def check_and_assign_badges(user):
         Badge,
         UserBadge,
         Announcement,
+        ArchivedAnnouncement,
         Comment,
         SavedAnnouncement,
     )
@@ -51,7 +75,10 @@ def check_and_assign_badges(user):
     for name, meta in badges.items():
         Badge.objects.get_or_create(name=name, defaults={'description': meta['description'], 'icon': meta['icon']})
 
-    reunions = Announcement.objects.filter(owner=user, is_reunited=True).count()
+    reunions = (
+        Announcement.objects.filter(owner=user, is_reunited=True).count()
+        + ArchivedAnnouncement.objects.filter(owner=user, is_reunited=True).count()
+    )
     comments_count = Comment.objects.filter(user=user).count()
     saves_count = SavedAnnouncement.objects.filter(user=user).count()
     total_users = user.__class__.objects.count()
@@ -80,8 +107,9 @@ def check_and_assign_badges(user):
 
 
 from math import radians, cos, sin, asin, sqrt
-from difflib import SequenceMatcher
-from datetime import datetime
+from datetime import datetime, timedelta
+
+from .trigrams import jaccard, similar_announcements, similarities, trigrams
 
 
 def haversine_meters(lat1, lon1, lat2, lon2):
@@ -98,75 +126,215 @@ def haversine_meters(lat1, lon1, lat2, lon2):
 
 
 def text_similarity(a, b):
+    """Jaccard similarity of the character trigrams of ``a`` and ``b`` (see core.trigrams)."""
     try:
         if not a or not b:
             return 0.0
-        return SequenceMatcher(None, a.lower(), b.lower()).ratio()
+        grams_a, grams_b = trigrams(a), trigrams(b)
+        return jaccard(len(grams_a & grams_b), len(grams_a), len(grams_b))
     except Exception:
         return 0.0
 
 
-def find_matches_for_announcement(announcement, threshold=0.25, limit=10):
+MATCH_WEIGHTS = {
+    'distance': 0.35,
+    'pet_type': 0.2,
+    'breed': 0.15,
+    'color': 0.1,
+    'date': 0.1,
+    'description': 0.1,
+}
+# candidates farther apart than this get no distance points, and none for
+# the date when posted this many days apart or more
+MATCH_DISTANCE_CUTOFF_M = 10000.0
+MATCH_DATE_WINDOW_DAYS = 30
+# candidates are loaded and scored this many at a time
+MATCH_CHUNK_SIZE = 500
+# slack for float rounding when comparing score bounds with the threshold
+MATCH_SCORE_EPSILON = 1e-9
+
+
+def match_score(announcement, c, breed_sim=None, desc_sim=None):
     """
-    Return a list of candidate announcements (opposite status) with computed score.
-    Lower threshold is more permissive. Result is list of tuples (candidate, score).
+    Similarity score of candidate ``c`` for ``announcement``, from 0 to 1.
+    Breed and description similarities are computed from the text unless
+    given, e.g. read from the trigram index.
     """
-    from .models import Announcement
+    score = 0.0
 
-    if not announcement.location:
-        return []
+    if c.location and announcement.location:
+        d = haversine_meters(announcement.location.latitude, announcement.location.longitude, c.location.latitude, c.location.longitude)
+        if d is None:
+            dist_score = 0.0
+        else:
+            dist_score = max(0.0, 1 - (d / MATCH_DISTANCE_CUTOFF_M))
+    else:
+        dist_score = 0.0
+    score += MATCH_WEIGHTS['distance'] * dist_score
 
-    candidates = Announcement.objects.filter(status='lost' if announcement.status == 'found' else 'found').exclude(id=announcement.id).select_related('pet', 'location', 'owner')
+    try:
+        if announcement.pet.pet_type and c.pet.pet_type and announcement.pet.pet_type == c.pet.pet_type:
+            score += MATCH_WEIGHTS['pet_type']
+    except Exception:
+        pass
 
-    results = []
-    for c in candidates:
-        score = 0.0
+    try:
+        if breed_sim is None:
+            breed_sim = text_similarity(announcement.pet.breed or '', c.pet.breed or '')
+        score += MATCH_WEIGHTS['breed'] * breed_sim
+    except Exception:
+        pass
 
-        if c.location and announcement.location:
-            d = haversine_meters(announcement.location.latitude, announcement.location.longitude, c.location.latitude, c.location.longitude)
-            if d is None:
-                dist_score = 0.0
-            else:
-                dist_score = max(0.0, 1 - (d / 10000.0))
-        else:
-            dist_score = 0.0
-        score += 0.35 * dist_score
+    try:
+        a_color = (announcement.pet.color or '').lower()
+        c_color = (c.pet.color or '').lower()
+        if a_color and c_color and (a_color in c_color or c_color in a_color):
+            score += MATCH_WEIGHTS['color']
+    except Exception:
+        pass
 
-        try:
-            if announcement.pet.pet_type and c.pet.pet_type and announcement.pet.pet_type == c.pet.pet_type:
-                score += 0.2
-        except Exception:
-            pass
+    try:
+        # whole days between the posts, the same from either side
+        days = abs(announcement.created_at - c.created_at).days
+        date_score = max(0.0, 1 - (days / float(MATCH_DATE_WINDOW_DAYS)))
+        score += MATCH_WEIGHTS['date'] * date_score
+    except Exception:
+        pass
 
-        try:
-            breed_sim = text_similarity(announcement.pet.breed or '', c.pet.breed or '')
-            score += 0.15 * breed_sim
-        except Exception:
-            pass
-
-        try:
-            a_color = (announcement.pet.color or '').lower()
-            c_color = (c.pet.color or '').lower()
-            if a_color and c_color and (a_color in c_color or c_color in a_color):
-                score += 0.1
-        except Exception:
-            pass
-
-        try:
-            days = abs((announcement.created_at - c.created_at).days)
-            date_score = max(0.0, 1 - (days / 30.0))
-            score += 0.1 * date_score
-        except Exception:
-            pass
-
-        try:
+    try:
+        if desc_sim is None:
             desc_sim = text_similarity(announcement.description or '', c.description or '')
-            score += 0.1 * desc_sim
-        except Exception:
-            pass
+        score += MATCH_WEIGHTS['description'] * desc_sim
+    except Exception:
+        pass
+
+    return score
+
+
+def _text_only_ids(announcement, candidates, threshold):
+    """
+    Ids of the rows in ``candidates`` that can reach ``threshold`` on breed,
+    color and description alone, i.e. without distance, date or pet type
+    points.
+
+    A row matches the color or it does not; the rest of the threshold has
+    to come from breed and description. Each of those has to make up for
+    what the other cannot, and as their points are a weighted mean of the
+    two similarities, at least one of them has to reach the rest over
+    their total weight. The breed and description lookups are trigram
+    index probes with those minimum similarities.
+    """
+    from .models import Pet
+
+    color = (announcement.pet.color or '').lower()
+    texts = {'breed': announcement.pet.breed or '', 'description': announcement.description or ''}
+    names = [name for name, text in texts.items() if trigrams(text)]
+    total = sum(MATCH_WEIGHTS[name] for name in names)
+
+    cases = [(candidates, threshold)]
+    if color:
+        colors = [
+            value for value in Pet.objects.exclude(color='').values_list('color', flat=True).distinct()
+            if value.lower() in color or color in value.lower()
+        ]
+        if colors:
+            cases.append((candidates.filter(pet__color__in=colors), threshold - MATCH_WEIGHTS['color']))
+
+    ids = set()
+    for narrowed, rest in cases:
+        if rest <= MATCH_SCORE_EPSILON:
+            ids.update(narrowed.values_list('id', flat=True))
+            continue
+        if total < rest - MATCH_SCORE_EPSILON:
+            continue
+        needed = {
+            name: max(0.0, (rest - (total - MATCH_WEIGHTS[name])) / MATCH_WEIGHTS[name] - MATCH_SCORE_EPSILON)
+            for name in names
+        }
+        mean = rest / total - MATCH_SCORE_EPSILON
+        demanding = max(names, key=needed.get)
+        if needed[demanding] > 0:
+            # the most demanding probe goes first, the others only score its hits
+            hits = [ann_id for _, ann_id in similar_announcements(demanding, texts[demanding], needed[demanding], queryset=narrowed)]
+            scores = similarities({name: texts[name] for name in names}, hits)
+            ids.update(
+                ann_id for ann_id in hits
+                if all(scores[name].get(ann_id, 0.0) >= needed[name] for name in names)
+                and max(scores[name].get(ann_id, 0.0) for name in names) >= mean
+            )
+        else:
+            for name in names:
+                ids.update(ann_id for _, ann_id in similar_announcements(name, texts[name], mean, queryset=narrowed))
+    return ids
+
+
+def match_candidate_ids(announcement, candidates, threshold, limit=None):
+    """
+    Ids of the rows in ``candidates`` that can score at least ``threshold``,
+    or, given ``limit``, that can be among the best ``limit`` of those.
+
+    The location arm is bounded by the geohash index: every row within
+    MATCH_DISTANCE_CUTOFF_M. A row farther away gets no distance points, so
+    it is a contender only if its breed, color and description make up the
+    rest, less the pet type and date points it can still get; those rows
+    come from trigram index probes. Given a limit, the nearby rows and the
+    recent ones of the same pet type are scored first and the threshold of
+    the probes rises to the limit-th best score among them.
+    """
+    from .geo import ids_within_radius
+    from .scoring import candidate_features, rank_candidates
+
+    ids = set()
+    location = announcement.location
+    if location.latitude is not None and location.longitude is not None:
+        ids.update(ids_within_radius(candidates, location.latitude, location.longitude, MATCH_DISTANCE_CUTOFF_M))
+
+    # (rows, points they still need besides breed, color and description)
+    arms = [(candidates, threshold)]
+    if announcement.created_at is not None:
+        window = timedelta(days=MATCH_DATE_WINDOW_DAYS)
+        recent = candidates.filter(
+            created_at__gt=announcement.created_at - window,
+            created_at__lt=announcement.created_at + window,
+        )
+        arms.append((recent, threshold - MATCH_WEIGHTS['date']))
+    if announcement.pet.pet_type:
+        arms.extend(
+            (narrowed.filter(pet__pet_type=announcement.pet.pet_type), rest - MATCH_WEIGHTS['pet_type'])
+            for narrowed, rest in list(arms)
+        )
+
+    if limit is not None:
+        if announcement.created_at is not None and announcement.pet.pet_type:
+            ids.update(recent.filter(pet__pet_type=announcement.pet.pet_type).values_list('id', flat=True))
+        ranked = rank_candidates(announcement, candidate_features(candidates, ids), threshold, limit)
+        if len(ranked) == limit:
+            raised = ranked[-1][1] - threshold
+            arms = [(narrowed, rest + raised) for narrowed, rest in arms]
+
+    for narrowed, rest in arms:
+        ids.update(_text_only_ids(announcement, narrowed, rest))
+    return ids
+
+
+def find_matches_for_announcement(announcement, threshold=0.25, limit=10):
+    """
+    Return a list of candidate announcements (opposite status) with computed score.
+    Lower threshold is more permissive. Result is list of tuples (candidate, score).
+    Candidates that cannot reach the threshold are ruled out in the database
+    (see match_candidate_ids), the rest are scored in one vectorized pass
+    (see core.scoring) and only the returned ones are loaded; equal scores
+    keep id order.
+    """
+    from .models import Announcement
+    from .scoring import candidate_features, rank_candidates
+
+    if not announcement.location:
+        return []
 
-        if score >= threshold:
-            results.append((c, score))
+    candidates = Announcement.objects.filter(status='lost' if announcement.status == 'found' else 'found').exclude(id=announcement.id)
+    ids = match_candidate_ids(announcement, candidates, threshold, limit)
+    ranked = rank_candidates(announcement, candidate_features(candidates, ids), threshold, limit)
 
-    results.sort(key=lambda x: x[1], reverse=True)
-    return results[:limit]
\ No newline at end of file
+    by_id = candidates.filter(id__in=[ann_id for ann_id, _ in ranked]).select_related('pet', 'location', 'owner').in_bulk()
+    return [(by_id[ann_id], score) for ann_id, score in ranked]
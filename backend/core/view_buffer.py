@@ -0,0 +1,240 @@
+"""Write-behind buffer for post view tracking."""
+import atexit
+import hashlib
+import logging
+import re
+import secrets
+import threading
+from collections import Counter
+
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F, Value
+from django.db.models.functions import Greatest
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_pending = set()
+_wakeup = threading.Event()
+_flusher = None
+
+
+def buffering_enabled():
+    return getattr(settings, 'POST_VIEW_BUFFER_ENABLED', True)
+
+
+VISITOR_COOKIE = 'visitor_id'
+VISITOR_COOKIE_MAX_AGE = 365 * 24 * 60 * 60
+_visitor_id = re.compile(r'[0-9a-f]{32}')
+
+
+def _visitor_cookie(request):
+    value = request.COOKIES.get(VISITOR_COOKIE, '')
+    return value if _visitor_id.fullmatch(value) else None
+
+
+def visitor_key(request):
+    """
+    Dedupe key for an anonymous viewer: the session key when the client
+    has a session, otherwise its first-party visitor cookie (see
+    set_visitor_cookie). A hash of address and user agent is used only for
+    a client with neither, so reading an announcement never has to create
+    a session.
+    """
+    if request.session.session_key:
+        return request.session.session_key
+    visitor = _visitor_cookie(request)
+    if visitor:
+        return 'visitor:' + visitor
+    meta = request.META
+    raw = f"{meta.get('REMOTE_ADDR', '')}|{meta.get('HTTP_USER_AGENT', '')}"
+    return 'anon:' + hashlib.sha256(raw.encode()).hexdigest()[:40]
+
+
+def set_visitor_cookie(request, response):
+    """Give an anonymous client without a session or visitor cookie a visitor id for its next views."""
+    if request.user.is_authenticated or request.session.session_key or _visitor_cookie(request):
+        return response
+    response.set_cookie(
+        VISITOR_COOKIE, secrets.token_hex(16), max_age=VISITOR_COOKIE_MAX_AGE,
+        secure=request.is_secure(), httponly=True, samesite='Lax',
+    )
+    return response
+
+
+def record_view(announcement_id, user_id=None, session_key=None):
+    event = (int(announcement_id), user_id, None if user_id else session_key)
+    if not buffering_enabled():
+        write_views([event])
+        return
+    with _lock:
+        _pending.add(event)
+        backlog = len(_pending)
+    _ensure_flusher()
+    if backlog >= getattr(settings, 'POST_VIEW_BUFFER_MAX', 500):
+        _wakeup.set()
+
+
+def flush():
+    """
+    Write every buffered view; returns how much views_count grew in total.
+    Views still buffered when a process dies are lost, which
+    reconcile_announcement_counters makes up for.
+    """
+    with _lock:
+        events = list(_pending)
+        _pending.clear()
+    if not events:
+        return 0
+    return write_views(events)
+
+
+def sketch_enabled():
+    return getattr(settings, 'ANONYMOUS_VIEW_SKETCH_ENABLED', True)
+
+
+def write_views(events):
+    """Store view events; returns how much views_count grew in total."""
+    # anonymous visitors only move a HyperLogLog sketch, exact PostView rows
+    # are kept for authenticated users
+    if sketch_enabled():
+        anonymous = [event for event in events if event[2]]
+        events = [event for event in events if not event[2]]
+        added = _sketch_views(anonymous)
+    else:
+        added = 0
+    return added + _insert_views(events)
+
+
+def _sketch_views(events):
+    if not events:
+        return 0
+    keys_by_announcement = {}
+    for ann_id, _user_id, key in events:
+        keys_by_announcement.setdefault(ann_id, []).append(key)
+
+    attempts = 3
+    for attempt in range(attempts):
+        try:
+            return _merge_sketches(keys_by_announcement)
+        except IntegrityError:
+            # another process created the first sketch of one of these
+            # announcements meanwhile; merging again reads and updates it
+            if attempt == attempts - 1:
+                raise
+    return 0
+
+
+def _merge_sketches(keys_by_announcement):
+    from .hll import HyperLogLog
+    from .models import Announcement, AnonymousViewSketch
+    from .trending import add_engagement
+
+    added = 0
+    with transaction.atomic():
+        existing_announcements = set(Announcement.objects.filter(
+            id__in=keys_by_announcement,
+        ).values_list('id', flat=True))
+        sketches = {
+            sketch.announcement_id: sketch
+            for sketch in AnonymousViewSketch.objects.select_for_update().filter(
+                announcement_id__in=existing_announcements,
+            )
+        }
+        for ann_id in existing_announcements:
+            sketch = sketches.get(ann_id)
+            hll = HyperLogLog(bytes(sketch.registers) if sketch else None)
+            changed = False
+            for key in keys_by_announcement[ann_id]:
+                changed = hll.add(key) or changed
+            if not changed:
+                continue
+            estimate = hll.estimate()
+            if sketch is None:
+                previous = 0
+                AnonymousViewSketch.objects.create(announcement_id=ann_id, registers=hll.to_bytes(), estimate=estimate)
+            else:
+                previous = sketch.estimate
+                AnonymousViewSketch.objects.filter(id=sketch.id).update(registers=hll.to_bytes(), estimate=estimate)
+            if estimate != previous:
+                Announcement.objects.filter(id=ann_id).update(
+                    views_count=Greatest(F('views_count') + (estimate - previous), Value(0)),
+                )
+                add_engagement(ann_id, 'view', estimate - previous)
+                added += estimate - previous
+    return added
+
+
+def _insert_views(events):
+    from .models import Announcement, PostView
+    from .trending import add_engagement
+
+    if not events:
+        return 0
+    announcement_ids = {event[0] for event in events}
+    user_ids = {event[1] for event in events if event[1]}
+    session_keys = {event[2] for event in events if event[2]}
+
+    seen = set()
+    if user_ids:
+        seen.update(
+            (ann_id, user_id, None)
+            for ann_id, user_id in PostView.objects.filter(
+                announcement_id__in=announcement_ids, user_id__in=user_ids,
+            ).values_list('announcement_id', 'user_id')
+        )
+    if session_keys:
+        seen.update(
+            (ann_id, None, key)
+            for ann_id, key in PostView.objects.filter(
+                announcement_id__in=announcement_ids, session_key__in=session_keys,
+            ).values_list('announcement_id', 'session_key')
+        )
+    existing_announcements = set(Announcement.objects.filter(
+        id__in=announcement_ids,
+    ).values_list('id', flat=True))
+
+    new_events = [
+        event for event in events
+        if event not in seen and event[0] in existing_announcements
+    ]
+    if not new_events:
+        return 0
+    PostView.objects.bulk_create([
+        PostView(announcement_id=ann_id, user_id=user_id, session_key=key)
+        for ann_id, user_id, key in new_events
+    ], ignore_conflicts=True)
+
+    # bulk_create skips the counter receivers, so views_count and the
+    # trending score move here
+    per_announcement = Counter(event[0] for event in new_events)
+    for ann_id, views in per_announcement.items():
+        Announcement.objects.filter(id=ann_id).update(views_count=F('views_count') + views)
+        add_engagement(ann_id, 'view', views)
+    return len(new_events)
+
+
+def _run():
+    interval = getattr(settings, 'POST_VIEW_FLUSH_SECONDS', 5)
+    while True:
+        _wakeup.wait(interval)
+        _wakeup.clear()
+        try:
+            flush()
+        except Exception:
+            logger.exception("Failed to flush buffered post views")
+        finally:
+            connection.close()
+
+
+def _ensure_flusher():
+    global _flusher
+    if _flusher is not None:
+        return
+    with _lock:
+        if _flusher is not None:
+            return
+        _flusher = threading.Thread(target=_run, name='post-view-flusher', daemon=True)
+        _flusher.start()
+        atexit.register(flush)
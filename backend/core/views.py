@@ -1,24 +1,42 @@
+import hashlib
+import math
+import struct
+from urllib.parse import urlencode
+
+from django.conf import settings
 from django.contrib.auth.models import User
-from django.db.models import Count
+from django.core.cache import cache
+from django.http import HttpResponse, StreamingHttpResponse
+from django.db.models import Count, Prefetch, Q, Sum
+from django.db.models.functions import Lower
+from django.utils.dateparse import parse_date
 from rest_framework import generics
-from .models import Announcement, Notification, PostView, SavedAnnouncement
+from .models import Announcement, Location, Notification, Pet, SavedAnnouncement
 from .serializers import (
     AnnouncementSerializer,
     NotificationSerializer,
     SavedAnnouncementSerializer,
+    field_selection,
+    requested_fields,
+    user_announcement_state,
 )
 from .models import Reaction
+from .conditional import announcement_validators, apply_validators, not_modified_response
+from .reactions import reaction_counts
+from .pagination import AnnouncementCursorPagination, decode_cursor, encode_cursor, get_page_size
+from .response_cache import AnonymousResponseCacheMixin, get_generation
+from .search import get_search_backend, search_terms
 from rest_framework import permissions
 from .models import Comment
 from .serializers import CommentSerializer
 from rest_framework.decorators import api_view, permission_classes
-from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.permissions import AllowAny, IsAdminUser, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework import status
 import logging
 import re  # Import regex
 from rest_framework.permissions import IsAuthenticated
-from rest_framework.exceptions import PermissionDenied
+from rest_framework.exceptions import NotFound, PermissionDenied
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
@@ -41,60 +59,326 @@ def expand_data(data):
     return result
 
 
-class AnnouncementList(generics.ListCreateAPIView):
-    def get_queryset(self):
-        queryset = Announcement.objects.select_related(
+def filter_announcements(queryset, params, apply_radius=True, apply_search=True):
+    """Apply the listing filters accepted by AnnouncementList to ``queryset``."""
+    status = params.get('status')
+    pet_type = params.get('pet_type')
+    owner = params.get('owner')
+    search = params.get('search')
+
+    if status:
+        queryset = queryset.filter(status=status)
+
+    if owner:
+        try:
+            queryset = queryset.filter(owner_id=int(owner))
+        except ValueError:
+            queryset = queryset.none()
+
+    if pet_type:
+        queryset = queryset.filter(pet__pet_type__iexact=pet_type)
+
+    if params.get('gender'):
+        queryset = queryset.filter(pet__gender=params['gender'])
+    if params.get('breed'):
+        queryset = queryset.filter(pet__breed__icontains=params['breed'].strip())
+    if params.get('color'):
+        queryset = queryset.filter(pet__color__icontains=params['color'].strip())
+
+    # created_at day range, inclusive; an unparsable date matches nothing
+    for param, lookup in (('date_from', 'created_at__date__gte'), ('date_to', 'created_at__date__lte')):
+        if params.get(param):
+            try:
+                day = parse_date(params[param])
+            except ValueError:
+                day = None
+            queryset = queryset.filter(**{lookup: day}) if day else queryset.none()
+
+    if search and apply_search:
+        queryset = get_search_backend().filter(queryset, search)
+
+    if not apply_radius:
+        return queryset
+
+    try:
+        lat = params.get('lat') or params.get('latitude')
+        lng = params.get('lng') or params.get('longitude')
+        radius = params.get('radius')
+        if lat and lng and radius:
+            try:
+                from .geo import ids_within_radius
+                ids = ids_within_radius(queryset, float(lat), float(lng), float(radius))
+                queryset = queryset.filter(id__in=ids)
+            except ValueError:
+                pass
+    except Exception:
+        pass
+
+    return queryset
+
+
+def normalized_filter_params(params):
+    """
+    Return the listing filters in ``params`` as a sorted tuple of pairs, with
+    aliases and formatting folded so equivalent requests compare equal.
+    """
+    normalized = {}
+    if params.get('status'):
+        normalized['status'] = params['status']
+    if params.get('pet_type'):
+        normalized['pet_type'] = params['pet_type'].lower()
+    if params.get('owner'):
+        normalized['owner'] = params['owner'].strip()
+    if params.get('gender'):
+        normalized['gender'] = params['gender']
+    for key in ('breed', 'color'):
+        if params.get(key):
+            normalized[key] = params[key].strip().lower()
+    for key in ('date_from', 'date_to'):
+        if params.get(key):
+            normalized[key] = params[key]
+    if params.get('search'):
+        normalized['search'] = ' '.join(search_terms(params['search']))
+    lat = params.get('lat') or params.get('latitude')
+    lng = params.get('lng') or params.get('longitude')
+    radius = params.get('radius')
+    if lat and lng and radius:
+        try:
+            normalized['lat'] = f"{float(lat):.5f}"
+            normalized['lng'] = f"{float(lng):.5f}"
+            normalized['radius'] = f"{float(radius):.0f}"
+        except ValueError:
+            pass
+    return tuple(sorted(normalized.items()))
+
+
+ANNOUNCEMENT_COLUMNS = {
+    'owner', 'status', 'description', 'created_at', 'updated_at', 'is_active', 'is_reunited',
+    'views_count', 'comments_count', 'saves_count',
+}
+
+
+def with_announcement_relations(queryset, fields=None):
+    """
+    Join and prefetch what AnnouncementSerializer needs. With a ``fields``
+    selection (see serializers.requested_fields) only the relations and
+    columns behind those fields are loaded.
+    """
+    if fields is None:
+        return queryset.select_related(
             "pet",
             "location",
             "owner",
             "owner__profile",
         ).prefetch_related(
             "photos",
-        ).annotate(
-            views_count_annotated=Count("post_views", distinct=True)
+            "reaction_counts",
         )
 
-        status = self.request.query_params.get('status')
-        pet_type = self.request.query_params.get('pet_type')
-        search = self.request.query_params.get('search')
+    selection = field_selection(fields)
+    columns = ['id'] + [name for name in selection if name in ANNOUNCEMENT_COLUMNS]
+    related = []
+    for relation, model in (('pet', Pet), ('location', Location)):
+        if relation not in selection:
+            continue
+        model_fields = [f.name for f in model._meta.concrete_fields]
+        wanted = [name for name in selection[relation] or model_fields if name in model_fields]
+        # unknown sub-fields are ignored (the serializer drops the relation too)
+        if not wanted:
+            continue
+        related.append(relation)
+        columns += [f'{relation}__{name}' for name in wanted]
+    if 'phone_number' in selection or 'email' in selection:
+        related += ['owner', 'owner__profile']
+        columns += ['owner__email', 'owner__profile__phone_number']
+
+    queryset = queryset.select_related(*related).only(*columns)
+    if 'photos' in selection:
+        queryset = queryset.prefetch_related('photos')
+    if 'reactions' in selection:
+        queryset = queryset.prefetch_related('reaction_counts')
+    return queryset
+
+
+def load_announcements(ids, fields=None):
+    """Fetch announcements with their relations, in the order of ``ids``."""
+    by_id = {
+        ann.id: ann
+        for ann in with_announcement_relations(Announcement.objects.filter(id__in=ids), fields)
+    }
+    return [by_id[ann_id] for ann_id in ids if ann_id in by_id]
 
-        if status:
-            queryset = queryset.filter(status=status)
 
-        if pet_type:
-            queryset = queryset.filter(pet__pet_type__iexact=pet_type)
+class AnnouncementFieldsMixin:
+    """
+    Honours ``fields=`` / ``view=`` on GET: the serializer drops the other
+    fields and the queryset loads only what the remaining ones read.
+    """
+
+    def requested_fields(self):
+        if self.request.method != 'GET':
+            return None
+        return requested_fields(self.request.query_params)
+
+    def get_serializer(self, *args, **kwargs):
+        fields = self.requested_fields()
+        if fields is not None:
+            kwargs['fields'] = fields
+        return super().get_serializer(*args, **kwargs)
+
 
-        if search:
-            queryset = queryset.filter(pet__name__icontains=search)
+class AnnouncementList(AnonymousResponseCacheMixin, AnnouncementFieldsMixin, generics.ListCreateAPIView):
+    pagination_class = AnnouncementCursorPagination
+
+    def get_queryset(self):
+        return filter_announcements(Announcement.objects.all(), self.request.query_params)
+
+    def list(self, request, *args, **kwargs):
+        params = request.query_params
+        if params.get('sort') == 'distance' or params.get('nearest'):
+            return self._list_by_distance(request)
+        if params.get('sort') == 'trending':
+            return self._list_by_trending(request)
+        if params.get('search') and params.get('sort', 'relevance') == 'relevance':
+            return self._list_by_relevance(request)
+
+        # the page is picked on the bare table so the keyset scan stays on
+        # the index; relations and counts are loaded for that page only
+        page = self.paginate_queryset(self.get_queryset())
+        return self._page_response(request, [ann.id for ann in page], self.paginator.next_cursor)
+
+    def _page_response(self, request, ids, next_cursor, distances=None):
+        """
+        Render a page of announcements ``ids``. Validators are checked first,
+        so a matching conditional GET is answered with 304 before anything
+        is loaded or serialized.
+        """
+        user_state = user_announcement_state(request.user, ids)
+        etag, last_modified = announcement_validators(request, ids, extra=next_cursor or '', user_state=user_state)
+        not_modified = not_modified_response(request, etag, last_modified)
+        if not_modified is not None:
+            return not_modified
+
+        announcements = load_announcements(ids, self.requested_fields())
+        if distances is not None:
+            for ann in announcements:
+                ann.distance_m = distances[ann.id]
+        context = {**self.get_serializer_context(), **user_state}
+        serializer = self.get_serializer(announcements, many=True, context=context)
+        response = Response({'next': next_cursor, 'results': serializer.data})
+        return apply_validators(response, etag, last_modified)
+
+    def _list_by_trending(self, request):
+        """
+        Highest time-decayed engagement first (see core.trending). The
+        stored score orders the same as its decayed value, so this is a
+        keyset scan of the (trending_score, id) index like the default feed.
+        """
+        params = request.query_params
+        paginator = self.paginator
+        limit = get_page_size(request, paginator.page_size, paginator.max_page_size)
+
+        queryset = self.get_queryset()
+        if params.get('cursor'):
+            position = decode_cursor(params['cursor'])
+            try:
+                score, last_id = float(position['s']), int(position['id'])
+            except (KeyError, TypeError, ValueError):
+                raise NotFound('Invalid cursor')
+            queryset = queryset.filter(
+                Q(trending_score__lt=score) | Q(trending_score=score, id__lt=last_id)
+            )
 
+        # one extra row tells whether another page exists
+        rows = list(queryset.order_by('-trending_score', '-id').values_list('trending_score', 'id')[:limit + 1])
+        page = rows[:limit]
+        next_cursor = None
+        if len(rows) > limit:
+            last_score, last_id = page[-1]
+            next_cursor = encode_cursor({'s': last_score, 'id': last_id})
+
+        return self._page_response(request, [ann_id for _, ann_id in page], next_cursor)
+
+    def _list_by_relevance(self, request):
+        """
+        Search results ranked by the search backend, best match first. Pass
+        ``sort=newest`` to get matches in feed order instead.
+        """
+        params = request.query_params
+        paginator = self.paginator
+        limit = get_page_size(request, paginator.page_size, paginator.max_page_size)
+
+        after = None
+        if params.get('cursor'):
+            position = decode_cursor(params['cursor'])
+            try:
+                after = (float(position['s']), int(position['id']))
+            except (KeyError, TypeError, ValueError):
+                raise NotFound('Invalid cursor')
+
+        queryset = filter_announcements(Announcement.objects.all(), params, apply_search=False)
+        # one extra row tells whether another page exists
+        ranked = get_search_backend().ranked_ids(queryset, params['search'], after=after, limit=limit + 1)
+        page = ranked[:limit]
+        next_cursor = None
+        if len(ranked) > limit:
+            last_score, last_id = page[-1]
+            next_cursor = encode_cursor({'s': last_score, 'id': last_id})
+
+        return self._page_response(request, [ann_id for _, ann_id in page], next_cursor)
+
+    def _list_by_distance(self, request):
+        """
+        Nearest-first listing: ``nearest=k`` limits the page to k results,
+        ``radius`` bounds the search and ``cursor`` (the ``next`` value of the
+        previous page) continues from the last returned distance.
+        """
+        params = request.query_params
+        paginator = self.paginator
         try:
-            lat = self.request.query_params.get('lat') or self.request.query_params.get('latitude')
-            lng = self.request.query_params.get('lng') or self.request.query_params.get('longitude')
-            radius = self.request.query_params.get('radius')
-            if lat and lng and radius:
-                try:
-                    latf = float(lat)
-                    lngf = float(lng)
-                    rf = float(radius)
-                    from .utils import haversine_meters
-                    ids = []
-                    for ann in list(queryset):
-                        if not ann.location:
-                            continue
-                        if ann.location.latitude is None or ann.location.longitude is None:
-                            continue
-                        d = haversine_meters(latf, lngf, ann.location.latitude, ann.location.longitude)
-                        if d is None:
-                            continue
-                        if d <= rf:
-                            ids.append(ann.id)
-                    queryset = queryset.filter(id__in=ids)
-                except ValueError:
-                    pass
-        except Exception:
-            pass
+            lat = float(params.get('lat') or params.get('latitude'))
+            lng = float(params.get('lng') or params.get('longitude'))
+        except (TypeError, ValueError):
+            return Response({'error': 'lat and lng are required for distance sorting'}, status=status.HTTP_400_BAD_REQUEST)
+        # nan and inf parse as floats but break the geohash cell math
+        if not (math.isfinite(lat) and math.isfinite(lng) and abs(lat) <= 90 and abs(lng) <= 180):
+            return Response({'error': 'lat must be within [-90, 90] and lng within [-180, 180]'}, status=status.HTTP_400_BAD_REQUEST)
 
-        return queryset
+        try:
+            if params.get('nearest'):
+                limit = max(1, min(int(params['nearest']), paginator.max_page_size))
+            else:
+                limit = get_page_size(request, paginator.page_size, paginator.max_page_size)
+            max_radius = float(params['radius']) if params.get('radius') else None
+        except ValueError:
+            return Response({'error': 'Invalid nearest or radius parameter'}, status=status.HTTP_400_BAD_REQUEST)
+        if max_radius is not None and not (math.isfinite(max_radius) and max_radius >= 0):
+            return Response({'error': 'radius must be a non-negative number'}, status=status.HTTP_400_BAD_REQUEST)
+
+        after = None
+        if params.get('cursor'):
+            position = decode_cursor(params['cursor'])
+            try:
+                after = (float(position['d']), int(position['id']))
+            except (KeyError, TypeError, ValueError):
+                raise NotFound('Invalid cursor')
+            if not (math.isfinite(after[0]) and after[0] >= 0):
+                return Response({'error': 'Invalid cursor'}, status=status.HTTP_400_BAD_REQUEST)
+
+        from .geo import nearest_ids
+        queryset = filter_announcements(Announcement.objects.all(), params, apply_radius=False)
+        # one extra hit tells whether another page exists
+        hits = nearest_ids(queryset, lat, lng, limit + 1, after=after, max_radius=max_radius)
+        has_next = len(hits) > limit
+        hits = hits[:limit]
+
+        next_cursor = None
+        if has_next:
+            last_distance, last_id = hits[-1]
+            next_cursor = encode_cursor({'d': last_distance, 'id': last_id})
+
+        distances = {ann_id: d for d, ann_id in hits}
+        return self._page_response(request, [ann_id for _, ann_id in hits], next_cursor, distances)
 
     queryset = Announcement.objects.all()
     serializer_class = AnnouncementSerializer
@@ -115,11 +399,13 @@ class AnnouncementList(generics.ListCreateAPIView):
         try:
             created_ann = serializer.instance
             if getattr(created_ann, 'status', None) == 'found':
-                from .utils import find_matches_for_announcement
+                from .matches import matches_per_announcement, stored_matches
                 from .serializers import AnnouncementSerializer as AnnSerializer
 
-                matches = find_matches_for_announcement(created_ann)
-                match_announcements = [m[0] for m in matches]
+                # the post_save receiver has stored the new post's matches
+                matches = stored_matches(created_ann.id, created_ann.status, matches_per_announcement())
+                by_id = Announcement.objects.filter(id__in=[m[0] for m in matches]).select_related('pet', 'location', 'owner').in_bulk()
+                match_announcements = [by_id[m[0]] for m in matches if m[0] in by_id]
                 matches_data = AnnSerializer(match_announcements, many=True, context={'request': request}).data
 
                 for candidate in match_announcements:
@@ -201,30 +487,53 @@ class AnnouncementList(generics.ListCreateAPIView):
 
 
 
-class AnnouncementDetail(generics.RetrieveUpdateDestroyAPIView):
-    queryset = Announcement.objects.select_related(
-        "pet",
-        "location",
-        "owner",
-        "owner__profile",
-    ).prefetch_related(
-        "photos",
-    ).annotate(
-        views_count_annotated=Count("post_views", distinct=True)
-    )
+class AnnouncementDetail(AnonymousResponseCacheMixin, AnnouncementFieldsMixin, generics.RetrieveUpdateDestroyAPIView):
+    queryset = with_announcement_relations(Announcement.objects.all())
     serializer_class = AnnouncementSerializer
     permission_classes = [AllowAny]
 
+    def get_queryset(self):
+        fields = self.requested_fields()
+        if fields is None:
+            return super().get_queryset()
+        return with_announcement_relations(Announcement.objects.all(), fields)
+
     def get_permissions(self):
         if self.request.method == "GET":
             return [AllowAny()]
         return [IsAuthenticated()]
 
     def retrieve(self, request, *args, **kwargs):
+        ids = [int(kwargs['pk'])]
+        user_state = user_announcement_state(request.user, ids)
+        etag, last_modified = announcement_validators(request, ids, user_state=user_state, detail=True)
+        if etag is None:
+            # not in the live table; it may have been archived
+            from .archive import archived_snapshot
+            from .models import ArchivedAnnouncement
+
+            archive = ArchivedAnnouncement.objects.filter(original_id=ids[0]).first()
+            if archive is not None:
+                return Response(archived_snapshot(archive))
+        not_modified = not_modified_response(request, etag, last_modified)
+        if not_modified is not None:
+            self._track_view(request, kwargs['pk'])
+            return not_modified
+
         instance = self.get_object()
-        self._track_view(request, instance)
-        serializer = self.get_serializer(instance)
-        return Response(serializer.data)
+        self._track_view(request, instance.id)
+        serializer = self.get_serializer(instance, context={**self.get_serializer_context(), **user_state})
+        return apply_validators(Response(serializer.data), etag, last_modified)
+
+    def on_cache_hit(self, request, *args, **kwargs):
+        self._track_view(request, kwargs['pk'])
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if request.method == 'GET':
+            from .view_buffer import set_visitor_cookie
+            set_visitor_cookie(request, response)
+        return response
 
     def update(self, request, *args, **kwargs):
         partial = kwargs.pop('partial', False)
@@ -243,28 +552,271 @@ class AnnouncementDetail(generics.RetrieveUpdateDestroyAPIView):
     def perform_update(self, serializer):
         if self.request.user != self.get_object().owner:
             raise PermissionDenied("You cannot edit this announcement.")
-        serializer.save()
+        from .matches import deferred_match_refresh
+
+        with deferred_match_refresh():
+            serializer.save()
 
     def perform_destroy(self, instance):
         if self.request.user != instance.owner:
             raise PermissionDenied("You cannot delete this announcement.")
         instance.delete()
 
-    def _track_view(self, request, announcement):
+    def _track_view(self, request, announcement_id):
+        # buffered and written in bulk later, so a detail GET does no writes
+        from .view_buffer import record_view, visitor_key
+
         if request.user.is_authenticated:
-            PostView.objects.get_or_create(
-                announcement=announcement,
-                user=request.user,
-            )
+            record_view(announcement_id, user_id=request.user.id)
             return
+        record_view(announcement_id, session_key=visitor_key(request))
 
-        if not request.session.session_key:
-            request.session.create()
 
-        PostView.objects.get_or_create(
-            announcement=announcement,
-            session_key=request.session.session_key,
-        )
+FACETS_CACHE_PREFIX = 'announcement-facets'
+FACET_COLORS_LIMIT = 20
+
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def announcement_facets(request):
+    """
+    Counts per status, pet type, gender, reunited flag and color for the
+    listing filters in the query string. The choice facets are computed in a
+    single conditional aggregate; results are cached briefly per filter set.
+    """
+    filters = normalized_filter_params(request.query_params)
+    cache_key = f"{FACETS_CACHE_PREFIX}:{get_generation()}:{hashlib.md5(urlencode(filters).encode()).hexdigest()}"
+    facets = cache.get(cache_key)
+    if facets is not None:
+        return Response(facets)
+
+    queryset = filter_announcements(Announcement.objects.all(), request.query_params)
+
+    facet_fields = {
+        'status': ('status', Announcement.STATUS_CHOICES),
+        'pet_type': ('pet__pet_type', Pet.PET_TYPES),
+        'gender': ('pet__gender', Pet.GENDER_CHOICES),
+    }
+    aggregates = {'total': Count('id')}
+    for facet, (field, choices) in facet_fields.items():
+        for value, _ in choices:
+            aggregates[f'{facet}__{value}'] = Count('id', filter=Q(**{field: value}))
+    aggregates['is_reunited__true'] = Count('id', filter=Q(is_reunited=True))
+    aggregates['is_reunited__false'] = Count('id', filter=Q(is_reunited=False))
+    counts = queryset.aggregate(**aggregates)
+
+    facets = {'total': counts['total']}
+    for facet, (_, choices) in facet_fields.items():
+        facets[facet] = {value: counts[f'{facet}__{value}'] for value, _ in choices}
+    facets['is_reunited'] = {
+        'true': counts['is_reunited__true'],
+        'false': counts['is_reunited__false'],
+    }
+    colors = (
+        queryset.exclude(pet__color='')
+        .annotate(color=Lower('pet__color'))
+        .values('color')
+        .annotate(count=Count('id'))
+        .order_by('-count', 'color')[:FACET_COLORS_LIMIT]
+    )
+    facets['color'] = {row['color']: row['count'] for row in colors}
+
+    cache.set(cache_key, facets, getattr(settings, 'ANNOUNCEMENT_FACETS_CACHE_SECONDS', 30))
+    return Response(facets)
+
+
+def parse_bbox(value):
+    """
+    (west, south, east, north) from a ``bbox`` parameter. Raises ValueError
+    unless it holds four finite numbers; nan and inf parse as floats but
+    break the geohash cell math.
+    """
+    west, south, east, north = [float(v) for v in value.split(',')]
+    if not all(math.isfinite(v) for v in (west, south, east, north)):
+        raise ValueError('bbox values must be finite')
+    return west, south, east, north
+
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def announcement_clusters(request):
+    """
+    Map clusters for ``bbox=west,south,east,north`` at ``zoom``. Each cluster
+    has a count, centroid and status / pet type breakdown, read from the
+    precomputed MapCell buckets.
+    """
+    try:
+        west, south, east, north = parse_bbox(request.query_params.get('bbox', ''))
+        zoom = int(request.query_params.get('zoom', 0))
+    except ValueError:
+        return Response({'error': 'bbox=west,south,east,north and an integer zoom are required'}, status=status.HTTP_400_BAD_REQUEST)
+
+    from .clusters import clusters_in_box
+    precision, clusters = clusters_in_box(south, north, west, east, zoom)
+    return Response({'zoom': zoom, 'precision': precision, 'clusters': clusters})
+
+
+MARKER_STATUSES = [value for value, _ in Announcement.STATUS_CHOICES]
+MARKER_PET_TYPES = [value for value, _ in Pet.PET_TYPES]
+
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def announcement_markers(request):
+    """
+    Map markers for active announcements in ``bbox=west,south,east,north`` as
+    parallel arrays: ids, lat, lng, status and pet_type codes (indexes into
+    the ``legend`` lists) and created_at as epoch seconds. The listing filters
+    apply as well. Rows are read with values_list, no model instances.
+
+    ``encoding=binary`` returns the same columns packed little-endian: uint32
+    count, then uint32 ids, float32 lat, float32 lng, uint8 status, uint8
+    pet_type and uint32 created_at, each ``count`` long.
+    """
+    try:
+        west, south, east, north = parse_bbox(request.query_params.get('bbox', ''))
+    except ValueError:
+        return Response({'error': 'bbox=west,south,east,north is required'}, status=status.HTTP_400_BAD_REQUEST)
+
+    from .geo import box_prefixes, geohash_prefix_q
+
+    queryset = filter_announcements(Announcement.objects.filter(is_active=True), request.query_params, apply_radius=False)
+    queryset = queryset.filter(location__latitude__gte=south, location__latitude__lte=north)
+    if west <= east:
+        queryset = queryset.filter(location__longitude__gte=west, location__longitude__lte=east)
+        prefixes = box_prefixes(south, north, west, east)
+    else:
+        queryset = queryset.filter(Q(location__longitude__gte=west) | Q(location__longitude__lte=east))
+        prefixes = box_prefixes(south, north, west, east + 360.0)
+    if prefixes is not None:
+        queryset = queryset.filter(geohash_prefix_q(prefixes))
+
+    status_codes = {value: code for code, value in enumerate(MARKER_STATUSES)}
+    pet_type_codes = {value: code for code, value in enumerate(MARKER_PET_TYPES)}
+    ids, lats, lngs, statuses, pet_types, created = [], [], [], [], [], []
+    rows = queryset.values_list(
+        'id', 'location__latitude', 'location__longitude', 'status', 'pet__pet_type', 'created_at',
+    )
+    for ann_id, lat, lng, ann_status, pet_type, created_at in rows.iterator(chunk_size=5000):
+        ids.append(ann_id)
+        lats.append(round(lat, 5))
+        lngs.append(round(lng, 5))
+        statuses.append(status_codes.get(ann_status, 255))
+        pet_types.append(pet_type_codes.get(pet_type, 255))
+        created.append(int(created_at.timestamp()))
+
+    if request.query_params.get('encoding') == 'binary':
+        count = len(ids)
+        body = b''.join([
+            struct.pack('<I', count),
+            struct.pack(f'<{count}I', *ids),
+            struct.pack(f'<{count}f', *lats),
+            struct.pack(f'<{count}f', *lngs),
+            struct.pack(f'<{count}B', *statuses),
+            struct.pack(f'<{count}B', *pet_types),
+            struct.pack(f'<{count}I', *created),
+        ])
+        return HttpResponse(body, content_type='application/octet-stream')
+
+    return Response({
+        'legend': {'status': MARKER_STATUSES, 'pet_type': MARKER_PET_TYPES},
+        'ids': ids,
+        'lat': lats,
+        'lng': lngs,
+        'status': statuses,
+        'pet_type': pet_types,
+        'created_at': created,
+    })
+
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def announcement_batch(request):
+    """
+    Several announcements by ``ids=1,2,3`` in one response, in the requested
+    order, with one query plan for the whole batch. Unlike the detail view it
+    does not record post views. Ids that do not exist are listed in
+    ``missing``.
+    """
+    try:
+        ids = [int(v) for v in request.query_params.get('ids', '').split(',') if v.strip()]
+    except ValueError:
+        return Response({'error': 'ids must be a comma separated list of integers'}, status=status.HTTP_400_BAD_REQUEST)
+    ids = list(dict.fromkeys(ids))
+    max_size = getattr(settings, 'ANNOUNCEMENT_BATCH_MAX_SIZE', 100)
+    if len(ids) > max_size:
+        return Response({'error': f'At most {max_size} ids per batch'}, status=status.HTTP_400_BAD_REQUEST)
+
+    fields = requested_fields(request.query_params)
+    announcements = load_announcements(ids, fields)
+    context = {'request': request, **user_announcement_state(request.user, ids)}
+    serializer_kwargs = {'fields': fields} if fields is not None else {}
+    serializer = AnnouncementSerializer(announcements, many=True, context=context, **serializer_kwargs)
+    found = {ann.id for ann in announcements}
+    return Response({
+        'results': serializer.data,
+        'missing': [ann_id for ann_id in ids if ann_id not in found],
+    })
+
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def announcement_matches(request, announcement_id):
+    """
+    Best matches of an announcement, read from the match table (see
+    core.matches), highest ``match_score`` first. Closed announcements have
+    none.
+    """
+    from .matches import matches_per_announcement, stored_matches
+
+    announcement = get_object_or_404(Announcement.objects.only('id', 'status'), id=announcement_id)
+    page_size = get_page_size(request, default=matches_per_announcement(), maximum=matches_per_announcement())
+    scores = dict(stored_matches(announcement.id, announcement.status, page_size))
+
+    ids = list(scores)
+    fields = requested_fields(request.query_params)
+    announcements = load_announcements(ids, fields)
+    context = {'request': request, **user_announcement_state(request.user, ids)}
+    serializer_kwargs = {'fields': fields} if fields is not None else {}
+    serializer = AnnouncementSerializer(announcements, many=True, context=context, **serializer_kwargs)
+    results = [
+        {**data, 'match_score': scores[ann.id]}
+        for ann, data in zip(announcements, serializer.data)
+    ]
+    return Response({'results': results})
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def announcement_export(request):
+    """
+    Stream every announcement as NDJSON (default) or CSV with
+    ``encoding=csv``. ``updated_since`` (ISO date or datetime) limits the dump
+    to rows changed after it; the ``X-Export-Started`` header is the value to
+    pass on the next incremental pull.
+    """
+    from django.utils import timezone
+
+    from .export import EXPORT_FORMATS, export_lines, parse_updated_since
+
+    output_format = request.query_params.get('encoding', 'ndjson')
+    if output_format not in EXPORT_FORMATS:
+        return Response({'error': f"encoding must be one of {', '.join(EXPORT_FORMATS)}"}, status=status.HTTP_400_BAD_REQUEST)
+    updated_since = request.query_params.get('updated_since')
+    if updated_since:
+        try:
+            updated_since = parse_updated_since(updated_since)
+        except ValueError as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+    else:
+        updated_since = None
+
+    started = timezone.now()
+    content_type = 'text/csv; charset=utf-8' if output_format == 'csv' else 'application/x-ndjson; charset=utf-8'
+    response = StreamingHttpResponse(export_lines(output_format, updated_since), content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="announcements.{output_format}"'
+    response['X-Export-Started'] = started.isoformat()
+    return response
 
 
 class AnnouncementCommentList(generics.ListCreateAPIView):
@@ -277,7 +829,16 @@ class AnnouncementCommentList(generics.ListCreateAPIView):
 
     def get_queryset(self):
         announcement_id = self.kwargs.get('announcement_id')
-        return Comment.objects.filter(announcement_id=announcement_id).select_related('user', 'user__profile')
+        queryset = Comment.objects.filter(announcement_id=announcement_id).select_related(
+            'user', 'user__profile',
+        ).prefetch_related('reaction_counts')
+        if self.request.user.is_authenticated:
+            queryset = queryset.prefetch_related(Prefetch(
+                'reactions',
+                queryset=Reaction.objects.filter(user=self.request.user).order_by('id'),
+                to_attr='viewer_reactions',
+            ))
+        return queryset
 
     def perform_create(self, serializer):
         announcement_id = self.kwargs.get('announcement_id')
@@ -353,12 +914,12 @@ def register_user(request):
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def my_announcements(request):
-    announcements = Announcement.objects.filter(owner=request.user)
+    announcements = list(with_announcement_relations(Announcement.objects.filter(owner=request.user)))
 
     serializer = AnnouncementSerializer(
         announcements,
         many=True,
-        context={'request': request}
+        context={'request': request, **user_announcement_state(request.user, [ann.id for ann in announcements])}
     )
 
     return Response(serializer.data)
@@ -429,11 +990,10 @@ def toggle_reaction(request, announcement_id):
             check_and_assign_badges(announcement.owner)
         except Exception:
             pass
-    from .models import Reaction as ReactionModel
-    qs = ReactionModel.objects.filter(announcement=announcement)
-    counts = {k: qs.filter(kind=k).count() for k, _ in ReactionModel.KIND_CHOICES}
+    stored = reaction_counts(announcement)
+    counts = {k: stored.get(k, 0) for k, _ in Reaction.KIND_CHOICES}
     user_reaction = None
-    ur = qs.filter(user=request.user).first()
+    ur = Reaction.objects.filter(announcement=announcement, user=request.user).order_by('id').first()
     if ur:
         user_reaction = ur.kind
 
@@ -470,13 +1030,62 @@ def toggle_comment_reaction(request, comment_id):
             except Exception:
                 pass
 
-    qs = Reaction.objects.filter(comment=comment)
-    counts = {k: qs.filter(kind=k).count() for k, _ in Reaction.KIND_CHOICES}
-    user_reactions = list(qs.filter(user=request.user).values_list('kind', flat=True))
+    stored = reaction_counts(comment)
+    counts = {k: stored.get(k, 0) for k, _ in Reaction.KIND_CHOICES}
+    user_reactions = list(Reaction.objects.filter(comment=comment, user=request.user).values_list('kind', flat=True))
 
     return Response({'counts': counts, 'user_reaction': user_reactions, 'created': created})
 
 
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def my_nearby_feed(request):
+    """
+    Recent announcements near the user's alert point, newest first, read from
+    the materialized feed with keyset pagination (``cursor`` / ``page_size``).
+    """
+    from django.utils.dateparse import parse_datetime
+
+    from .feeds import feed_cutoff
+    from .models import NearbyFeedEntry
+
+    page_size = get_page_size(request, default=50, maximum=200)
+    # entries that aged out stay until prune_feeds() runs
+    entries = NearbyFeedEntry.objects.filter(user=request.user, created_at__gte=feed_cutoff())
+    cursor = request.query_params.get('cursor')
+    if cursor:
+        position = decode_cursor(cursor)
+        try:
+            created_at = parse_datetime(position['t'])
+            announcement_id = int(position['id'])
+        except (KeyError, TypeError, ValueError):
+            raise NotFound('Invalid cursor')
+        if created_at is None:
+            raise NotFound('Invalid cursor')
+        entries = entries.filter(
+            Q(created_at__lt=created_at) | Q(created_at=created_at, announcement_id__lt=announcement_id),
+        )
+    rows = list(entries.order_by('-created_at', '-announcement_id').values_list(
+        'announcement_id', 'created_at', 'distance_m',
+    )[:page_size + 1])
+
+    next_cursor = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        next_cursor = encode_cursor({'t': rows[-1][1].isoformat(), 'id': rows[-1][0]})
+
+    ids = [row[0] for row in rows]
+    fields = requested_fields(request.query_params)
+    announcements = load_announcements(ids, fields)
+    distances = {row[0]: row[2] for row in rows}
+    for ann in announcements:
+        ann.distance_m = distances[ann.id]
+    context = {'request': request, **user_announcement_state(request.user, ids)}
+    serializer_kwargs = {'fields': fields} if fields is not None else {}
+    serializer = AnnouncementSerializer(announcements, many=True, context=context, **serializer_kwargs)
+    return Response({'next': next_cursor, 'results': serializer.data})
+
+
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
 def my_saved_announcements(request):
@@ -485,11 +1094,16 @@ def my_saved_announcements(request):
         "announcement__location",
         "announcement__owner",
         "announcement__owner__profile",
+    ).prefetch_related(
+        "announcement__photos",
+        "announcement__reaction_counts",
     )
+    saved = list(saved)
+    ids = [item.announcement_id for item in saved]
     serializer = SavedAnnouncementSerializer(
         saved,
         many=True,
-        context={"request": request},
+        context={"request": request, **user_announcement_state(request.user, ids, saved_ids=set(ids))},
     )
     return Response(serializer.data)
 
@@ -722,21 +1336,31 @@ def public_user(request, user_id):
         badges = []
 
     try:
-        from .models import Announcement, PostView, SavedAnnouncement, ConversationParticipant, ChatMessage
+        from .models import Announcement, ArchivedAnnouncement, ConversationParticipant, ChatMessage
 
         ann_qs = Announcement.objects.filter(owner=user)
-        announcements_count = ann_qs.count()
+        # history counts include archived announcements
+        archived = ArchivedAnnouncement.objects.filter(owner=user).aggregate(
+            total=Count('id'),
+            reunited=Count('id', filter=Q(is_reunited=True)),
+            lost=Count('id', filter=Q(status='lost')),
+            found=Count('id', filter=Q(status='found')),
+            views=Sum('views_count'),
+            saves=Sum('saves_count'),
+        )
+        announcements_count = ann_qs.count() + archived['total']
         active_announcements_count = ann_qs.filter(is_active=True).count()
-        reunited_count = ann_qs.filter(is_reunited=True).count()
-        lost_count = ann_qs.filter(status='lost').count()
-        found_count = ann_qs.filter(status='found').count()
+        reunited_count = ann_qs.filter(is_reunited=True).count() + archived['reunited']
+        lost_count = ann_qs.filter(status='lost').count() + archived['lost']
+        found_count = ann_qs.filter(status='found').count() + archived['found']
 
-        views_count = PostView.objects.filter(announcement__owner=user).count()
+        counters = ann_qs.aggregate(views=Sum('views_count'), saves=Sum('saves_count'))
+        views_count = (counters['views'] or 0) + (archived['views'] or 0)
 
         conversations_count = ConversationParticipant.objects.filter(user=user).values('conversation').distinct().count()
 
         messages_sent = ChatMessage.objects.filter(sender=user).count()
-        saved_count = SavedAnnouncement.objects.filter(announcement__owner=user).count()
+        saved_count = (counters['saves'] or 0) + (archived['saves'] or 0)
 
         stats = {
             'announcements_count': announcements_count,
@@ -777,6 +1401,34 @@ def public_user(request, user_id):
         "presence": presence,
     })
 
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def user_archived_announcements(request, user_id):
+    """
+    A user's archived announcements, newest first, with keyset pagination on
+    the original announcement id (``cursor`` / ``page_size``).
+    """
+    from .archive import archived_snapshot
+    from .models import ArchivedAnnouncement
+
+    user = get_object_or_404(User, id=user_id)
+    page_size = get_page_size(request, default=20, maximum=100)
+    queryset = ArchivedAnnouncement.objects.filter(owner=user).order_by('-original_id')
+    cursor = request.query_params.get('cursor')
+    if cursor:
+        position = decode_cursor(cursor)
+        try:
+            queryset = queryset.filter(original_id__lt=int(position['id']))
+        except (KeyError, TypeError, ValueError):
+            raise NotFound('Invalid cursor')
+    archives = list(queryset[:page_size + 1])
+    next_cursor = None
+    if len(archives) > page_size:
+        archives = archives[:page_size]
+        next_cursor = encode_cursor({'id': archives[-1].original_id})
+    return Response({'next': next_cursor, 'results': [archived_snapshot(archive) for archive in archives]})
+
+
 from geopy.geocoders import Nominatim
 
 @api_view(['GET'])
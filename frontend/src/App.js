@@ -1,7 +1,7 @@
 import React, { useEffect, useState } from 'react';
 import {
-    getAnnouncement,
     getAnnouncements,
+    getBatchedAnnouncement,
     getChatConversations,
     getCurrentUser,
     getNotifications,
@@ -86,7 +86,7 @@ function App() {
             const id = parseInt(annMatch[1], 10);
             if (!isNaN(id)) {
                 try {
-                    const res = await getAnnouncement(id);
+                    const res = await getBatchedAnnouncement(id);
                     setSelectedAnnouncement(res.data);
                     setView('details');
                 } catch (err) {
@@ -145,7 +145,7 @@ function App() {
             const id = e.detail;
             if (!id) return;
             try {
-                const res = await getAnnouncement(id);
+                const res = await getBatchedAnnouncement(id);
                 setSelectedAnnouncement(res.data);
                 navigateTo('details', { announcement: res.data });
             } catch (err) {
@@ -398,7 +398,7 @@ function App() {
 
                                                     if (item.related_announcement) {
                                                         try {
-                                                            const res = await getAnnouncement(item.related_announcement);
+                                                            const res = await getBatchedAnnouncement(item.related_announcement);
                                                             setSelectedAnnouncement(res.data);
                                                             navigateTo('details', { announcement: res.data });
                                                         } catch (err) {
@@ -540,7 +540,7 @@ function App() {
                         initialConversationId={activeConversationId}
                         onOpenAnnouncement={async (announcementId) => {
                             try {
-                                const res = await getAnnouncement(announcementId);
+                                const res = await getBatchedAnnouncement(announcementId);
                                 setSelectedAnnouncement(res.data);
                                 navigateTo('details', { announcement: res.data });
                             } catch (err) {
@@ -1,4 +1,4 @@
-import React, { useEffect, useState, useMemo, useCallback } from 'react';
+import React, { useEffect, useState, useMemo, useCallback, useRef } from 'react';
 import { getAnnouncements } from '../services/api';
 import { useToast } from './ToastContext';
 import '../styles/base.css';
@@ -14,6 +14,8 @@ L.Icon.Default.mergeOptions({
     shadowUrl: require('leaflet/dist/images/marker-shadow.png'),
 });
 
+const PAGE_SIZE = 18;
+
 const AnnouncementList = ({ onSelect }) => {
     const { showToast } = useToast();
 
@@ -26,16 +28,18 @@ const AnnouncementList = ({ onSelect }) => {
     const [genderFilter, setGenderFilter] = useState('all');
     const [breedFilter, setBreedFilter] = useState('');
     const [colorFilter, setColorFilter] = useState('');
-    const [sizeFilter, setSizeFilter] = useState('all');
+    const [debouncedBreed, setDebouncedBreed] = useState('');
+    const [debouncedColor, setDebouncedColor] = useState('');
     const [searchTerm, setSearchTerm] = useState('');
     const [debouncedSearch, setDebouncedSearch] = useState('');
     const [dateFrom, setDateFrom] = useState('');
     const [dateTo, setDateTo] = useState('');
     const [sortBy, setSortBy] = useState('newest');
-    const [currentPage, setCurrentPage] = useState(1);
     const [isLoading, setIsLoading] = useState(false);
-
-    const itemsPerPage = 9;
+    const [nextCursor, setNextCursor] = useState(null);
+    // bumped on every new first-page request, so a slow response for
+    // filters that have since changed is dropped
+    const requestId = useRef(0);
 
     const MapPicker = ({ onPick }) => {
         useMapEvents({
@@ -49,107 +53,78 @@ const AnnouncementList = ({ onSelect }) => {
     };
 
     useEffect(() => {
-        const t = setTimeout(() => setDebouncedSearch(searchTerm.trim()), 250);
+        const t = setTimeout(() => {
+            setDebouncedSearch(searchTerm.trim());
+            setDebouncedBreed(breedFilter.trim());
+            setDebouncedColor(colorFilter.trim());
+        }, 250);
         return () => clearTimeout(t);
-    }, [searchTerm]);
+    }, [searchTerm, breedFilter, colorFilter]);
+
+    // every filter and the sort order are applied by the server; the list
+    // only holds the pages fetched so far
+    const queryParams = useMemo(() => {
+        const params = { page_size: PAGE_SIZE, sort: sortBy };
+        if (statusFilter !== 'all') params.status = statusFilter;
+        if (typeFilter !== 'all') params.pet_type = typeFilter;
+        if (genderFilter !== 'all') params.gender = genderFilter;
+        if (debouncedBreed) params.breed = debouncedBreed;
+        if (debouncedColor) params.color = debouncedColor;
+        if (debouncedSearch) params.search = debouncedSearch;
+        if (dateFrom) params.date_from = dateFrom;
+        if (dateTo) params.date_to = dateTo;
+        if (searchCenter && searchRadius) {
+            params.lat = searchCenter.lat;
+            params.lng = searchCenter.lng;
+            params.radius = searchRadius; 
+        }
+        return params;
+    }, [statusFilter, typeFilter, genderFilter, debouncedBreed, debouncedColor, debouncedSearch, dateFrom, dateTo, sortBy, searchCenter, searchRadius]);
 
-    const loadAnnouncements = useCallback(async (params = {}) => {
+    const loadAnnouncements = useCallback(async (params, cursor = null) => {
+        const current = cursor ? requestId.current : ++requestId.current;
         setIsLoading(true);
         try {
-            const res = await getAnnouncements(params);
-            setAnnouncements(res.data || []);
+            const res = await getAnnouncements(params, cursor);
+            if (current !== requestId.current) return;
+            setAnnouncements((prev) => (cursor ? [...prev, ...(res.data || [])] : res.data || []));
+            setNextCursor(res.next || null);
         } catch (err) {
             console.error('Error loading announcements:', err);
             showToast && showToast('Failed to load announcements', 'error');
         } finally {
-            setIsLoading(false);
+            if (current === requestId.current) setIsLoading(false);
         }
     }, [showToast]);
 
     useEffect(() => {
-        loadAnnouncements();
-    }, [loadAnnouncements]);
+        setNextCursor(null);
+        loadAnnouncements(queryParams);
+    }, [queryParams, loadAnnouncements]);
 
-    useEffect(() => {
-        const params = {};
-        if (searchCenter && searchRadius) {
-            params.lat = searchCenter.lat;
-            params.lng = searchCenter.lng;
-            params.radius = searchRadius; 
-        }
-        loadAnnouncements(params);
-    }, [searchCenter, searchRadius, loadAnnouncements]);
-
-    const filtered = useMemo(() => {
-        return announcements
-            .filter(a => {
-                const statusMatch = statusFilter === 'all' || a.status === statusFilter;
-                const typeMatch = typeFilter === 'all' || a.pet.pet_type === typeFilter;
-                const genderMatch = genderFilter === 'all' || a.pet.gender === genderFilter;
-                const sizeMatch = sizeFilter === 'all' || (a.pet.size || 'medium') === sizeFilter;
-                const breedMatch = !breedFilter || (a.pet.breed || '').toLowerCase().includes(breedFilter.toLowerCase());
-                const colorMatch = !colorFilter || (a.pet.color || '').toLowerCase().includes(colorFilter.toLowerCase());
-                const dateFromMatch = !dateFrom || new Date(a.created_at) >= new Date(dateFrom);
-                const dateToMatch = !dateTo || new Date(a.created_at) <= new Date(dateTo);
-
-                const s = debouncedSearch.toLowerCase();
-                const searchMatch =
-                    !s ||
-                    (a.pet.name || '').toLowerCase().includes(s) ||
-                    (a.pet.breed || '').toLowerCase().includes(s) ||
-                    (a.pet.color || '').toLowerCase().includes(s) ||
-                    (a.description || '').toLowerCase().includes(s) ||
-                    (a.location?.address || '').toLowerCase().includes(s);
-
-                return (
-                    statusMatch && typeMatch && genderMatch && sizeMatch && breedMatch && colorMatch && dateFromMatch && dateToMatch && searchMatch
-                );
-            })
-            .sort((a, b) => {
-                if (sortBy === 'newest') return new Date(b.created_at) - new Date(a.created_at);
-                if (sortBy === 'oldest') return new Date(a.created_at) - new Date(b.created_at);
-                return 0;
-            });
-    }, [announcements, statusFilter, typeFilter, genderFilter, sizeFilter, breedFilter, colorFilter, dateFrom, dateTo, debouncedSearch, sortBy]);
-
-    const totalPages = Math.max(1, Math.ceil(filtered.length / itemsPerPage));
-
-    useEffect(() => setCurrentPage(1), [statusFilter, typeFilter, genderFilter, breedFilter, colorFilter, sizeFilter, debouncedSearch, dateFrom, dateTo, sortBy]);
-
-    const paginated = filtered.slice((currentPage - 1) * itemsPerPage, currentPage * itemsPerPage);
-
-    const pagesToShow = useMemo(() => {
-        const maxButtons = 5;
-        let start = Math.max(1, currentPage - Math.floor(maxButtons / 2));
-        const end = Math.min(totalPages, start + maxButtons - 1);
-        start = Math.max(1, end - maxButtons + 1);
-        return Array.from({ length: end - start + 1 }, (_, i) => start + i);
-    }, [currentPage, totalPages]);
+    const loadMore = () => {
+        if (nextCursor && !isLoading) loadAnnouncements(queryParams, nextCursor);
+    };
 
     const mapCenter = useMemo(() => {
         if (searchCenter?.lat && searchCenter?.lng) {
             return [searchCenter.lat, searchCenter.lng];
         }
 
-        const firstWithCoords = filtered.find((pet) => pet.location?.latitude && pet.location?.longitude);
+        const firstWithCoords = announcements.find((pet) => pet.location?.latitude && pet.location?.longitude);
         if (firstWithCoords) {
             return [firstWithCoords.location.latitude, firstWithCoords.location.longitude];
         }
 
-        const fallbackFromAll = announcements.find((pet) => pet.location?.latitude && pet.location?.longitude);
-        if (fallbackFromAll) {
-            return [fallbackFromAll.location.latitude, fallbackFromAll.location.longitude];
-        }
-
         return [50.45, 30.52];
-    }, [searchCenter, filtered, announcements]);
+    }, [searchCenter, announcements]);
 
     const mapZoom = useMemo(() => {
         if (searchCenter?.lat && searchCenter?.lng) {
             return 12;
         }
-        return filtered.some((pet) => pet.location?.latitude && pet.location?.longitude) ? 11 : 6;
-    }, [searchCenter, filtered]);
+        return announcements.some((pet) => pet.location?.latitude && pet.location?.longitude) ? 11 : 6;
+    }, [searchCenter, announcements]);
 
     const clearFilters = () => {
         setStatusFilter('all');
@@ -157,7 +132,6 @@ const AnnouncementList = ({ onSelect }) => {
         setGenderFilter('all');
         setBreedFilter('');
         setColorFilter('');
-        setSizeFilter('all');
         setSearchTerm('');
         setDateFrom('');
         setDateTo('');
@@ -180,7 +154,7 @@ const AnnouncementList = ({ onSelect }) => {
                 <div className="filters-top">
                     <input
                         type="text"
-                        placeholder="Search by name, breed, color, description or location..."
+                        placeholder="Search by name, breed, color or description..."
                         className="distance-select top-search"
                         value={searchTerm}
                         onChange={(e) => setSearchTerm(e.target.value)}
@@ -209,15 +183,10 @@ const AnnouncementList = ({ onSelect }) => {
                             <input placeholder="Breed" value={breedFilter} onChange={e => setBreedFilter(e.target.value)} className="distance-select" />
                             <input placeholder="Color" value={colorFilter} onChange={e => setColorFilter(e.target.value)} className="distance-select" />
 
-                            <select value={sizeFilter} onChange={e => setSizeFilter(e.target.value)} className="distance-select">
-                                <option value="all">Any size</option>
-                                <option value="small">Small</option>
-                                <option value="medium">Medium</option>
-                                <option value="large">Large</option>
-                            </select>
 
                             <select value={sortBy} onChange={e => setSortBy(e.target.value)} className="distance-select">
                                 <option value="newest">Newest first</option>
+                                <option value="relevance">Best match</option>
                                 <option value="oldest">Oldest first</option>
                             </select>
 
@@ -273,7 +242,7 @@ const AnnouncementList = ({ onSelect }) => {
                                 <Circle center={[searchCenter.lat, searchCenter.lng]} radius={Number(searchRadius)} pathOptions={{ color: '#ff6b4a', fillOpacity: 0.08 }} />
                             )}
 
-                            {filtered.map(pet => (
+                            {announcements.map(pet => (
                                 <Marker
                                     key={pet.id}
                                     position={[pet.location?.latitude || 51.505, pet.location?.longitude || -0.09]}
@@ -292,16 +261,15 @@ const AnnouncementList = ({ onSelect }) => {
                     </div>
 
                     <div className="results-topbar">
-                        <div className="results-meta">{filtered.length} results</div>
                         <div className="results-meta">
-                            Page {currentPage} / {totalPages}
+                            {announcements.length} {nextCursor ? 'shown, more available' : 'results'}
                         </div>
                         {isLoading ? <div className="results-meta">Loading...</div> : null}
                     </div>
 
                     <div className="results-grid">
-                        {paginated.map((pet, index) => (
-                            <div key={pet.id} className="result-card" onClick={() => onSelect(pet)} style={{ animationDelay: `${index * 0.08}s` }}>
+                        {announcements.map((pet, index) => (
+                            <div key={pet.id} className="result-card" onClick={() => onSelect(pet)} style={{ animationDelay: `${(index % PAGE_SIZE) * 0.08}s` }}>
                                 <div className="result-thumbnail">
                                     {pet.pet.photo ? (<img src={pet.pet.photo} alt={pet.pet.name} />) : (pet.pet.pet_type === 'cat' ? '🐈' : '🐕')}
                                 </div>
@@ -325,40 +293,16 @@ const AnnouncementList = ({ onSelect }) => {
                             </div>
                         ))}
 
-                        {filtered.length === 0 && !isLoading && (
+                        {announcements.length === 0 && !isLoading && (
                             <p className="empty-state">No pets match your filters.</p>
                         )}
 
                     </div>
 
-                    {totalPages > 1 && (
+                    {nextCursor && (
                         <div className="pagination-wrap">
-                            <button
-                                className="pagination-btn nav"
-                                disabled={currentPage === 1}
-                                onClick={() => setCurrentPage((p) => Math.max(1, p - 1))}
-                            >
-                                Previous
-                            </button>
-
-                            <div className="pagination-pages">
-                                {pagesToShow.map((page) => (
-                                    <button
-                                        key={page}
-                                        className={`pagination-btn page ${currentPage === page ? 'active' : ''}`}
-                                        onClick={() => setCurrentPage(page)}
-                                    >
-                                        {page}
-                                    </button>
-                                ))}
-                            </div>
-
-                            <button
-                                className="pagination-btn nav"
-                                disabled={currentPage === totalPages}
-                                onClick={() => setCurrentPage((p) => Math.min(totalPages, p + 1))}
-                            >
-                                Next
+                            <button className="pagination-btn nav" disabled={isLoading} onClick={loadMore}>
+                                {isLoading ? 'Loading...' : 'Load more'}
                             </button>
                         </div>
                     )}
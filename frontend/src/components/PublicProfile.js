@@ -6,6 +6,7 @@ import '../styles/profile.css';
 const PublicProfile = ({ userId }) => {
     const [user, setUser] = useState(null);
     const [announcements, setAnnouncements] = useState([]);
+    const [nextCursor, setNextCursor] = useState(null);
 
     const { showToast } = useToast();
 
@@ -19,16 +20,27 @@ const PublicProfile = ({ userId }) => {
             }
 
             try {
-                const res2 = await getAnnouncements();
-                const items = res2.data || [];
-                setAnnouncements(items.filter((a) => a.owner === userId));
+                const res2 = await getAnnouncements({ owner: userId });
+                setAnnouncements(res2.data || []);
+                setNextCursor(res2.next);
             } catch (err) {
                 setAnnouncements([]);
+                setNextCursor(null);
             }
         };
         load();
     }, [userId]);
 
+    const loadMore = async () => {
+        try {
+            const res = await getAnnouncements({ owner: userId }, nextCursor);
+            setAnnouncements((prev) => [...prev, ...(res.data || [])]);
+            setNextCursor(res.next);
+        } catch (err) {
+            showToast && showToast('Could not load more announcements', 'error');
+        }
+    };
+
     if (!user) return <div className="profile-page"><p>Loading user...</p></div>;
 
     return (
@@ -149,6 +161,11 @@ const PublicProfile = ({ userId }) => {
                                     ))}
                                 </div>
                             )}
+                            {nextCursor && (
+                                <button className="btn btn-secondary" style={{ marginTop: '1rem' }} onClick={loadMore}>
+                                    Load more
+                                </button>
+                            )}
                         </div>
                     </div>
                 </div>
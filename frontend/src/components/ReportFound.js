@@ -21,6 +21,7 @@ const ReportFound = ({ onRefresh, onCancel }) => {
     const [isLoadingContact, setIsLoadingContact] = useState(true);
     const [activeTab, setActiveTab] = useState('new');
     const [lostPets, setLostPets] = useState([]);
+    const [lostPetsCursor, setLostPetsCursor] = useState(null);
     const [preview, setPreview] = useState(null);
     const [additionalPreviews, setAdditionalPreviews] = useState([]);
     const [position, setPosition] = useState([50.4501, 30.5234]);
@@ -152,15 +153,24 @@ const ReportFound = ({ onRefresh, onCancel }) => {
 
     useEffect(() => {
         if (activeTab === 'match') {
-            getAnnouncements()
+            getAnnouncements({ status: 'lost' })
                 .then((res) => {
-                    const lost = res.data.filter((ann) => ann.status === 'lost');
-                    setLostPets(lost);
+                    setLostPets(res.data);
+                    setLostPetsCursor(res.next);
                 })
                 .catch((err) => console.error('Error fetching lost pets:', err));
         }
     }, [activeTab]);
 
+    const loadMoreLostPets = () => {
+        getAnnouncements({ status: 'lost' }, lostPetsCursor)
+            .then((res) => {
+                setLostPets((prev) => [...prev, ...res.data]);
+                setLostPetsCursor(res.next);
+            })
+            .catch((err) => console.error('Error fetching lost pets:', err));
+    };
+
     useEffect(() => {
         const loadContactData = async () => {
             try {
@@ -633,6 +643,15 @@ const ReportFound = ({ onRefresh, onCancel }) => {
                                     ))}
                                 </div>
                             )}
+
+                            {lostPetsCursor && (
+                                <button
+                                    onClick={loadMoreLostPets}
+                                    style={{ display: 'block', margin: '1.5rem auto 0', color: '#FF6B4A', textDecoration: 'underline', background: 'none', border: 'none', cursor: 'pointer' }}
+                                >
+                                    Show more lost pets
+                                </button>
+                            )}
                         </div>
                     )}
                 </div>
@@ -32,8 +32,23 @@ API.interceptors.response.use(
     }
 );
 
-export const getAnnouncements = (params = {}) => API.get('announcements/', { params });
+// The feed is cursor-paginated: this returns one page as `data` and the
+// cursor of the following one as `next` (null on the last page).
+export const getAnnouncements = async (params = {}, cursor = null) => {
+    const res = await API.get('announcements/', { params: cursor ? { ...params, cursor } : params });
+    return { ...res, data: res.data.results || [], next: res.data.next };
+};
 export const getAnnouncement = (id) => API.get(`announcements/${id}/`);
+export const getAnnouncementsBatch = (ids) => API.get('announcements/batch/', { params: { ids: ids.join(',') } });
+// One announcement through the batch endpoint, for opening the details page:
+// unlike getAnnouncement it records no post view, so the page's own fetch
+// is the only one that counts.
+export const getBatchedAnnouncement = async (id) => {
+    const res = await getAnnouncementsBatch([id]);
+    const announcement = (res.data.results || [])[0];
+    if (!announcement) throw new Error(`Announcement ${id} not found`);
+    return { ...res, data: announcement };
+};
 export const getMyAnnouncements = () => API.get('announcements/me/');
 export const createAnnouncement = (data) => API.post('announcements/', data);
 export const deleteAnnouncement = (id) => API.delete(`announcements/${id}/`);